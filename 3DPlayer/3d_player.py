@@ -8,6 +8,7 @@ import tkinter  # @UnusedImport
 import tkinter.ttk
 import time
 import threading
+import queue
 import traceback  # @UnusedImport
 import functools
 import idlelib.tooltip
@@ -15,7 +16,6 @@ import idlelib.tooltip
 # import sdl2.video  # @UnusedImport
 import pysrt
 import serial  # @UnusedImport
-import json
 import datetime
 
 import argparse
@@ -27,8 +27,14 @@ import emitter_settings
 import display_settings
 import start_video
 import thanks
+import seek_engine
+import serial_sync_scheduler
+import flip_phase_pll
 from software_sync_background_mode import SoftwareSyncBackgroundModeGLWindow
 
+GSTREAMER_VIRTUAL_EVENT = "<<GStreamerEvent>>"
+ACTIVE_VIDEO_UPDATE_INTERVAL_MS = 100  # progress bar and mouse position refresh while a video is open
+
 
 class TopWindow:
     def __init__(self, command_line_arguments):
@@ -40,20 +46,30 @@ class TopWindow:
         self.last_mouse_position = None
 
         self.pageflipglsink = None
+        self.pageflipglsink_request_queue = None
+        self.active_video_update_after_id = None
+        self.seek_engine = None
         self.subtitle3dsink = None
         self.__software_sync_background_mode = None
         self.serial_sync_enabled = True
-        self.serial_sync_active = False
-        self.serial_sync_period_s = None
-        self.serial_sync_next_time = None
-        self.serial_sync_next_eye = emitter_settings.SYNC_SIGNAL_LEFT
-        self.serial_sync_last_flip_time = None
+        self.serial_sync_pll = flip_phase_pll.FlipPhasePLL()
+        self.serial_sync_locked = False
+        self.detected_refresh_rate = None  # measured by the pageflip sink when target framerate is auto
+        # only guards the flip phase pll, the scheduler thread never takes it
         self.serial_sync_lock = threading.Lock()
-        self.serial_sync_running = True
-        self.serial_sync_thread = threading.Thread(target=self._serial_sync_worker)
-        self.serial_sync_thread.daemon = True
-        self.serial_sync_thread.name = "serial-sync"
-        self.serial_sync_thread.start()
+        self.serial_sync_scheduler = serial_sync_scheduler.SerialSyncScheduler(
+            self._serial_sync_send
+        )
+        self.serial_sync_scheduler.start()
+        # gstreamer threads report to the tkinter main loop through this queue, bus messages are queued and requests from the sink only wake it
+        self.gstreamer_events = queue.SimpleQueue()
+        self.gstreamer_event_ready = threading.Event()
+        self.gstreamer_event_running = True
+        self.gstreamer_event_thread = threading.Thread(
+            target=self._gstreamer_event_worker
+        )
+        self.gstreamer_event_thread.daemon = True
+        self.gstreamer_event_thread.name = "gstreamer-events"
 
         # set base path
         self.internal_base_path = os.path.dirname(os.path.abspath(__file__))
@@ -77,6 +93,8 @@ class TopWindow:
         window.geometry("+300+0")
         # window.geometry("+2000+0")
         window.update_idletasks()
+        window.bind(GSTREAMER_VIRTUAL_EVENT, self.on_gstreamer_event)
+        self.gstreamer_event_thread.start()
         self._offsetx = -self.window.winfo_rootx()
         self._offsety = -self.window.winfo_rooty()
 
@@ -500,6 +518,9 @@ class TopWindow:
         if self.video_progress_frame is not None:
             self.video_progress_frame.destroy()
             self.video_progress_frame = None
+        if self.seek_engine is not None:
+            self.seek_engine.stop()
+            self.seek_engine = None
         if self.player is not None:
             self.player.set_state(Gst.State.NULL)
             self.player.run_dispose()
@@ -510,6 +531,10 @@ class TopWindow:
             self.emitter_serial.pageflipglsink = None
         if self.pageflipglsink is not None:
             self.pageflipglsink.set_property("close", True)
+        self.pageflipglsink_request_queue = None
+        if self.active_video_update_after_id is not None:
+            self.window.after_cancel(self.active_video_update_after_id)
+            self.active_video_update_after_id = None
         self._serial_sync_reset()
         self.set_menu_on_top(True, False, False, False)
         # Gst.deinit()
@@ -517,9 +542,17 @@ class TopWindow:
 
     def toggle_software_sync_background_mode(self, event=None):
         if self.__software_sync_background_mode is None:
+            target_framerate = self.display_settings_dialog.target_framerate_variable.get()
+            if target_framerate == "auto":
+                # software sync mode doesn't measure the refresh rate itself so it reuses the last detected one
+                target_framerate = (
+                    str(self.detected_refresh_rate)
+                    if self.detected_refresh_rate is not None
+                    else "0"
+                )
             self.__software_sync_background_mode = SoftwareSyncBackgroundModeGLWindow(
                 self.on_synced_flip,
-                self.display_settings_dialog.target_framerate_variable.get(),
+                target_framerate,
             )
             self.__software_sync_background_mode.start()
             print("Started Software Sync Background Mode")
@@ -534,13 +567,16 @@ class TopWindow:
         if self.__software_sync_background_mode is not None:
             self.__software_sync_background_mode.stop()
             print("Stopped Software Sync Background Mode")
-        self.serial_sync_running = False
         self._serial_sync_reset()
+        self.serial_sync_scheduler.stop()
         self.close = True
         self.set_menu_on_top(True, False, False, False)
         if self.emitter_serial:
             self.emitter_serial.close()
         self.display_settings_dialog.autosave_active_settings()
+        self.gstreamer_event_running = False
+        self.gstreamer_event_ready.set()
+        self.window.quit()
         return "break"
 
     def stop_or_close_player(self, event=None):  # @UnusedVariable
@@ -557,36 +593,31 @@ class TopWindow:
             self.player.set_state(Gst.State.PLAYING)
         return "break"
 
-    def perform_seek(self, seek_command, event=None):  # @UnusedVariable
-        query_position = self.player.query_position(Gst.Format.TIME)[1]
+    def perform_seek(
+        self, seek_command, event=None, wait_for_release=False
+    ):  # @UnusedVariable
+        # wait_for_release is used for seeks from held keys in the player window which send seek_release when the key goes up
+        if self.seek_engine is None:
+            return
+        if seek_command == "seek_release":
+            self.seek_engine.release()
+            return
+        # relative seeks continue from the pending target so repeated presses add up while the player catches up
+        query_position = self.seek_engine.position()
         query_duration = self.player.query_duration(Gst.Format.TIME)[1]
         seek_position = None
-        seek_flags = Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT
         if "seek_percent" in seek_command:
             seek_position = query_duration // 10 * int(seek_command.split("_")[2])
-            seek_flags |= Gst.SeekFlags.SNAP_BEFORE
         elif "seek_forward_big" == seek_command:
             seek_position = query_position + Gst.SECOND * 60
-            seek_flags |= Gst.SeekFlags.SNAP_AFTER
         elif "seek_forward_small" == seek_command:
             seek_position = query_position + Gst.SECOND * 5
-            seek_flags |= Gst.SeekFlags.SNAP_AFTER
         elif "seek_backward_big" == seek_command:
             seek_position = query_position - Gst.SECOND * 60
-            seek_flags |= Gst.SeekFlags.SNAP_BEFORE
         elif "seek_backward_small" == seek_command:
             seek_position = query_position - Gst.SECOND * 5
-            seek_flags |= Gst.SeekFlags.SNAP_BEFORE
         if seek_position is not None:
-            # https://gstreamer.freedesktop.org/documentation/gstreamer/gstsegment.html?gi-language=python#GstSeekFlags
-            # 'ACCURATE', 'FLUSH', 'KEY_UNIT', 'NONE', 'SEGMENT', 'SKIP', 'SNAP_AFTER', 'SNAP_BEFORE', 'SNAP_NEAREST', 'TRICKMODE', 'TRICKMODE_KEY_UNITS', 'TRICKMODE_NO_AUDIO'
-            self.player.seek_simple(
-                Gst.Format.TIME,
-                # Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT, # use these flags for fast seeking that isn't accurate
-                Gst.SeekFlags.FLUSH
-                | Gst.SeekFlags.ACCURATE,  # use these flags for slower but accurate seeking
-                max(seek_position, 0),
-            )
+            self.seek_engine.seek(seek_position, wait_for_release)
 
     def click_open_emitter_settings_button(self, event=None):  # @UnusedVariable
         if self.emitter_settings_dialog and self.emitter_settings_dialog.top:
@@ -681,36 +712,211 @@ class TopWindow:
         ):
             now = time.monotonic()
             with self.serial_sync_lock:
-                self.serial_sync_active = True
-                if self.serial_sync_period_s is None:
-                    self.serial_sync_period_s = self._serial_sync_target_period()
-                if self.serial_sync_last_flip_time is not None:
-                    measured = now - self.serial_sync_last_flip_time
-                    if measured > 0:
-                        if measured >= (self.serial_sync_period_s * 0.5) and measured <= (self.serial_sync_period_s * 1.5):
-                            self.serial_sync_period_s = (self.serial_sync_period_s * 9.0 + measured) / 10.0
-                self.serial_sync_last_flip_time = now
-
-                if self.serial_sync_next_time is None:
-                    self.serial_sync_next_time = now
-                    self.serial_sync_next_eye = synced_signal_left_or_right
-                else:
-                    err = now - self.serial_sync_next_time
-                    if abs(err) > (self.serial_sync_period_s * 0.5):
-                        self.serial_sync_next_time = now
-                        self.serial_sync_next_eye = synced_signal_left_or_right
-                    else:
-                        self.serial_sync_next_time += err * 0.25
-                        if self.serial_sync_next_eye != synced_signal_left_or_right:
-                            self.serial_sync_next_eye = synced_signal_left_or_right
+                if self.serial_sync_pll.period is None:
+                    self.serial_sync_pll.reset(self._serial_sync_target_period())
+                # the command for this flip is scheduled at the pll's estimate of it rather than the jittery callback time
+                flip_time = self.serial_sync_pll.update(now)
+                schedule = serial_sync_scheduler.SerialSyncSchedule(
+                    flip_time, self.serial_sync_pll.period, synced_signal_left_or_right
+                )
+                locked = self.serial_sync_pll.locked
+                lock_changed = locked != self.serial_sync_locked
+                self.serial_sync_locked = locked
+            self.serial_sync_scheduler.set_schedule(schedule)
+            if lock_changed:
+                print(
+                    f"Serial sync {'locked' if locked else 'unlocked'} at {1 / schedule.period:.3f}hz {self.serial_sync_pll.summary()}"
+                )
 
     def on_gstreamer_synced_flip(self, plugin, synced_signal_left_or_right):
         if self.player is not None and self.video_open:
             self.on_synced_flip(synced_signal_left_or_right)
 
+    def on_gstreamer_refresh_rate_detected(
+        self, plugin, refresh_rate, confidence
+    ):  # @UnusedVariable
+        # called on the render thread, the serial sync pll takes the measured period without losing its phase
+        print(
+            f"Detected display refresh rate {refresh_rate:.3f}hz (confidence {confidence:.2f})"
+        )
+        with self.serial_sync_lock:
+            self.detected_refresh_rate = refresh_rate
+            self.serial_sync_pll.set_period(1.0 / refresh_rate)
+
+    def on_gstreamer_request_queued(self, plugin):  # @UnusedVariable
+        # called on the render thread so only wake the main loop, requests are handled there
+        self.gstreamer_event_ready.set()
+
+    def on_gstreamer_bus_message(self, bus, message):  # @UnusedVariable
+        # sync handler called on whichever gstreamer thread posted the message, nothing else reads this bus so every message is dropped here
+        if message.type == Gst.MessageType.ERROR:
+            error, debug = message.parse_error()
+            self.gstreamer_events.put((message.type, f"{error.message} {debug}"))
+            self.gstreamer_event_ready.set()
+        elif message.type == Gst.MessageType.EOS:
+            self.gstreamer_events.put((message.type, None))
+            self.gstreamer_event_ready.set()
+        elif message.type == Gst.MessageType.ASYNC_DONE:
+            # flushing seeks finish with async done, the seek engine holds newer seeks back until then
+            self.gstreamer_events.put((message.type, None))
+            self.gstreamer_event_ready.set()
+        return Gst.BusSyncReply.DROP
+
+    def on_gstreamer_subtitle(
+        self, plugin, start, duration, text
+    ):  # @UnusedVariable
+        # called on the subtitle streaming thread, push-subtitle only queues the subtitle for the render thread
+        if self.pageflipglsink is not None:
+            self.pageflipglsink.emit("push-subtitle", start, duration, text, "")
+
+    def _gstreamer_event_worker(self):
+        # tkinter calls made from other threads block until the main loop services them, so gstreamer threads wake this thread instead of calling tkinter themselves
+        while True:
+            self.gstreamer_event_ready.wait()
+            self.gstreamer_event_ready.clear()
+            if not self.gstreamer_event_running:
+                return
+            try:
+                self.window.event_generate(GSTREAMER_VIRTUAL_EVENT, when="tail")
+            except (RuntimeError, tkinter.TclError):
+                return
+
+    def on_gstreamer_event(self, event=None):  # @UnusedVariable
+        while True:
+            try:
+                message_type, message_details = self.gstreamer_events.get_nowait()
+            except queue.Empty:
+                break
+            if message_type == Gst.MessageType.ERROR:
+                print(f"GStreamer error {message_details}")
+            elif message_type == Gst.MessageType.EOS:
+                if self.player is not None and self.video_open:
+                    self.update_video_progress()
+            elif message_type == Gst.MessageType.ASYNC_DONE:
+                if self.seek_engine is not None:
+                    self.seek_engine.seek_done()
+        if self.player is not None and self.video_open:
+            self.handle_pageflipglsink_requests()
+
+    def update_active_video(self):
+        self.active_video_update_after_id = None
+        if self.player is None or not self.video_open:
+            return
+        self.update_video_progress()
+        self.notify_player_if_mouse_moved()
+        self.active_video_update_after_id = self.window.after(
+            ACTIVE_VIDEO_UPDATE_INTERVAL_MS, self.update_active_video
+        )
+
+    def handle_pageflipglsink_requests(self):
+        while self.pageflipglsink_request_queue is not None:
+            try:
+                request = self.pageflipglsink_request_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.handle_pageflipglsink_request(request)
+
+    def handle_pageflipglsink_request(self, request):
+        if request.action == "toggle_paused":
+            self.toggle_paused()
+        elif request.action == "toggle_sensor_logging":
+            if (
+                self.emitter_serial is not None
+                and self.emitter_settings_dialog is not None
+            ):
+                self.emitter_settings_dialog.click_opt_enable_stream_readings_to_serial_toggle()
+        elif request.action == "seek":
+            self.perform_seek(request.value, wait_for_release=True)
+        elif request.action == "close":
+            self.stop_player()
+        elif request.action == "subtitle_offset":
+            if self.subtitle3dsink is not None:
+                self.subtitle3dsink.set_property(
+                    "ts-offset", int(float(request.value) * Gst.SECOND)
+                )
+        elif request.action == "set_menu_on_top":
+            if request.value:
+                self.set_menu_on_top(True, True, False, False)
+            else:
+                self.set_menu_on_top(False, False, True, True)
+        elif request.action == "calibration":
+            (
+                calibration_target_field,
+                calibration_decrease_or_increase_or_set,
+                calibration_adjustment_amount,
+            ) = request.value
+            calibration_target_field_map = {
+                "calibration_mode": (
+                    "display",
+                    self.display_settings_dialog.calibration_mode_variable,
+                ),
+                "whitebox_vertical_position": (
+                    "display",
+                    self.display_settings_dialog.whitebox_vertical_position_variable,
+                ),
+                "whitebox_horizontal_position": (
+                    "display",
+                    self.display_settings_dialog.whitebox_horizontal_position_variable,
+                ),
+                "whitebox_horizontal_spacing": (
+                    "display",
+                    self.display_settings_dialog.whitebox_horizontal_spacing_variable,
+                ),
+                "blackbox_border": (
+                    "display",
+                    self.display_settings_dialog.blackbox_border_variable,
+                ),
+                "whitebox_size": (
+                    "display",
+                    self.display_settings_dialog.whitebox_size_variable,
+                ),
+            }
+            if self.emitter_settings_dialog is not None:
+                calibration_target_field_map["frame_delay"] = (
+                    "emitter",
+                    self.emitter_settings_dialog.setting_ir_frame_delay_variable,
+                )
+                calibration_target_field_map["frame_duration"] = (
+                    "emitter",
+                    self.emitter_settings_dialog.setting_ir_frame_duration_variable,
+                )
+
+            if calibration_target_field not in calibration_target_field_map:
+                return
+            emitter_or_display, target = calibration_target_field_map[
+                calibration_target_field
+            ]
+            if calibration_decrease_or_increase_or_set == "increase":
+                set_to = str(int(target.get()) + int(calibration_adjustment_amount))
+            elif calibration_decrease_or_increase_or_set == "decrease":
+                set_to = str(int(target.get()) - int(calibration_adjustment_amount))
+            elif calibration_decrease_or_increase_or_set == "set":
+                set_to = calibration_adjustment_amount
+            else:
+                return
+            target.set(set_to)
+            if (
+                emitter_or_display == "emitter"
+                and self.emitter_serial is not None
+            ):
+                self.emitter_settings_dialog.click_update_settings_on_emitter()
+            if emitter_or_display == "display":
+                self.display_settings_dialog.click_apply_settings_to_active_video()
+            if calibration_target_field != "calibration_mode":
+                self.pageflipglsink.emit(
+                    "push-subtitle",
+                    Gst.CLOCK_TIME_NONE,
+                    Gst.SECOND,
+                    f"{calibration_target_field} {target.get()} {'connect emitter!' if emitter_or_display == 'emitter' and self.emitter_serial is None else ''}",
+                    "setting",
+                )
+
     def _serial_sync_target_period(self):
+        target_framerate = self.display_settings_dialog.target_framerate_variable.get()
+        if target_framerate == "auto" and self.detected_refresh_rate is not None:
+            return 1.0 / self.detected_refresh_rate
         try:
-            target = float(self.display_settings_dialog.target_framerate_variable.get())
+            target = float(target_framerate)
             if target > 0:
                 return 1.0 / target
         except Exception:
@@ -719,57 +925,21 @@ class TopWindow:
 
     def _serial_sync_reset(self):
         with self.serial_sync_lock:
-            self.serial_sync_active = False
-            self.serial_sync_period_s = None
-            self.serial_sync_next_time = None
-            self.serial_sync_last_flip_time = None
-            self.serial_sync_next_eye = emitter_settings.SYNC_SIGNAL_LEFT
-
-    def _serial_sync_worker(self):
-        while self.serial_sync_running:
-            if not self.serial_sync_enabled:
-                time.sleep(0.01)
-                continue
-            if (
-                self.emitter_serial is None
-                or self.emitter_serial.ir_drive_mode != emitter_settings.IR_DRIVE_MODE_SERIAL
-            ):
-                time.sleep(0.01)
-                continue
-
-            with self.serial_sync_lock:
-                active = self.serial_sync_active
-                next_time = self.serial_sync_next_time
-                next_eye = self.serial_sync_next_eye
-                period = self.serial_sync_period_s or self._serial_sync_target_period()
-                self.serial_sync_period_s = period
+            self.serial_sync_pll = flip_phase_pll.FlipPhasePLL()
+            self.serial_sync_locked = False
+        self.serial_sync_scheduler.set_schedule(None)
 
-            if not active or next_time is None:
-                time.sleep(0.005)
-                continue
-
-            now = time.monotonic()
-            if now < next_time:
-                time.sleep(min(0.001, next_time - now))
-                continue
-
-            if next_eye == emitter_settings.SYNC_SIGNAL_LEFT:
-                command = emitter_settings.SERIAL_DRIVE_MODE_LEFT_COMMAND
-            else:
-                command = emitter_settings.SERIAL_DRIVE_MODE_RIGHT_COMMAND
-            self.emitter_serial.line_reader.async_command(command)
-
-            with self.serial_sync_lock:
-                self.serial_sync_next_eye = (
-                    emitter_settings.SYNC_SIGNAL_RIGHT
-                    if next_eye == emitter_settings.SYNC_SIGNAL_LEFT
-                    else emitter_settings.SYNC_SIGNAL_LEFT
-                )
-                self.serial_sync_next_time = next_time + period
-                now = time.monotonic()
-                if now - self.serial_sync_next_time > period:
-                    steps = int((now - self.serial_sync_next_time) // period) + 1
-                    self.serial_sync_next_time += steps * period
+    def _serial_sync_send(self, eye):
+        # called on the serial sync scheduler thread at each deadline
+        emitter_serial = self.emitter_serial
+        if (
+            not self.serial_sync_enabled
+            or emitter_serial is None
+            or emitter_serial.ir_drive_mode != emitter_settings.IR_DRIVE_MODE_SERIAL
+        ):
+            return False
+        emitter_serial.line_reader.drive_mode_eye_command(eye)
+        return True
 
     def start_video(self, playback_parameters):
 
@@ -837,14 +1007,24 @@ class TopWindow:
             ":", "|"
         )
 
+        subtitle_prerender_cues = None
         if subtitle_file_name:
             show_subtitles = True
             subtitle_file_path = os.path.realpath(subtitle_file_name)
-            if subtitle_offset != "0":
+            try:
                 subs = pysrt.open(subtitle_file_path)
-                subs.shift(seconds=float(subtitle_offset))
-                subtitle_file_path = f"{subtitle_file_path}.shifted"
-                subs.save(subtitle_file_path, encoding="utf-8-sig")
+            except Exception:
+                # only srt files can be prerendered, other formats are still rendered as they are played
+                subs = None
+            if subs is not None:
+                subtitle_prerender_cues = [
+                    (
+                        sub.start.ordinal * Gst.MSECOND,
+                        sub.end.ordinal * Gst.MSECOND,
+                        sub.text,
+                    )
+                    for sub in subs
+                ]
             subtitle_file_path = "file:///" + subtitle_file_path.replace(
                 "\\", "/"
             ).replace(":", "|")
@@ -947,6 +1127,7 @@ class TopWindow:
         self.player = Gst.ElementFactory.make("playbin3", "Playbin")
 
         self.player.set_property("uri", video_file_path)
+        self.player.get_bus().set_sync_handler(self.on_gstreamer_bus_message)
         # self.player.set_property("current-audio", -1)  # -1 is the first audio stream
         # self.player.set_property('current-audio', 2) # -1 is the first audio stream
 
@@ -957,6 +1138,15 @@ class TopWindow:
             print("Unable to find/initialize GStreamer plugin GSTPageflipGLSink.")
             return
         self.pageflipglsink.connect("synced-flip", self.on_gstreamer_synced_flip)
+        self.pageflipglsink.connect(
+            "refresh-rate-detected", self.on_gstreamer_refresh_rate_detected
+        )
+        self.pageflipglsink.connect(
+            "request-queued", self.on_gstreamer_request_queued
+        )
+        self.pageflipglsink_request_queue = self.pageflipglsink.get_property(
+            "request-queue"
+        )
         if self.emitter_serial is not None:
             self.emitter_serial.pageflipglsink = self.pageflipglsink
 
@@ -1083,6 +1273,11 @@ class TopWindow:
             self.subtitle3dsink = Gst.ElementFactory.make(
                 "gstsubtitle3dsink", "Subtitle3DSink"
             )
+            self.subtitle3dsink.connect("subtitle", self.on_gstreamer_subtitle)
+            # the offset is applied live, the subtitle sink renders cues early or late by the offset and the pageflip sink shifts their timestamps to match
+            self.subtitle3dsink.set_property(
+                "ts-offset", int(float(subtitle_offset) * Gst.SECOND)
+            )
             # self.subtitle3dsink = Gst.ElementFactory.make('fakesink', 'Subtitle3DSink')
             # self.subtitle3dsink.set_property('dump', 1)
             # self.subtitle3dsink.set_property('silent', 1)
@@ -1130,6 +1325,10 @@ class TopWindow:
 
         self.pageflipglsink.set_property("subtitle-font", subtitle_font)
         self.pageflipglsink.set_property("subtitle-size", subtitle_size)
+        self.pageflipglsink.set_property("subtitle-offset", subtitle_offset)
+        self.pageflipglsink.set_property(
+            "subtitle-prerender-cues", subtitle_prerender_cues
+        )
         self.pageflipglsink.set_property("subtitle-depth", subtitle_depth)
         self.pageflipglsink.set_property(
             "subtitle-vertical-offset", subtitle_vertical_offset
@@ -1160,6 +1359,13 @@ class TopWindow:
             failed_to_start = True
 
         if not failed_to_start:
+            self.seek_engine = seek_engine.SeekEngine(
+                self.player,
+                os.path.realpath(video_file_name),
+                os.path.join(self.base_path, "keyframe_index_cache"),
+                self.window,
+            )
+            self.seek_engine.start()
             video_duration = self.player.query_duration(Gst.Format.TIME).duration
             self.pageflipglsink.set_property("video-duration", video_duration)
 
@@ -1186,6 +1392,12 @@ class TopWindow:
                 fill="x", expand=1, pady=5, padx=5, anchor="n", side=tkinter.LEFT
             )
             self.video_progress_bar.bind("<Button-1>", self.seek_from_video_progress)
+            self.video_progress_bar.bind(
+                "<B1-Motion>", self.seek_from_video_progress
+            )  # dragging scrubs with fast seeks
+            self.video_progress_bar.bind(
+                "<ButtonRelease-1>", self.release_video_progress
+            )
             self.video_duration_label = tkinter.Label(
                 self.video_progress_frame,
                 text=str(datetime.timedelta(seconds=video_duration // 1000000000)),
@@ -1203,6 +1415,7 @@ class TopWindow:
             self.__play_pause_button.config(state="normal")
             self.__forward_small_button.config(state="normal")
             self.__forward_big_button.config(state="normal")
+            self.update_active_video()
 
         if generate_dot_graph_file:
             Gst.debug_bin_to_dot_file(
@@ -1229,14 +1442,16 @@ class TopWindow:
         seek_target_timestamp = (
             click_x_progress_position / click_x_progress_width * video_duration
         )
-        # 'ACCURATE', 'FLUSH', 'KEY_UNIT', 'NONE', 'SEGMENT', 'SKIP', 'SNAP_AFTER', 'SNAP_BEFORE', 'SNAP_NEAREST', 'TRICKMODE', 'TRICKMODE_KEY_UNITS', 'TRICKMODE_NO_AUDIO'
-        self.player.seek_simple(
-            Gst.Format.TIME,
-            # Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT, # use these flags for fast seeking that isn't accurate
-            Gst.SeekFlags.FLUSH
-            | Gst.SeekFlags.ACCURATE,  # use these flags for slower but accurate seeking
-            max(min(seek_target_timestamp, video_duration), 0),
-        )
+        if self.seek_engine is not None:
+            self.seek_engine.seek(
+                max(min(seek_target_timestamp, video_duration), 0),
+                wait_for_release=True,
+            )
+        return "break"  # don't let the window move with the drag
+
+    def release_video_progress(self, event=None):  # @UnusedVariable
+        if self.seek_engine is not None:
+            self.seek_engine.release()
 
     def click_stop_video_button(self, event=None):  # @UnusedVariable
         self.stop_player()
@@ -1281,167 +1496,7 @@ def main():
 
     top_window = TopWindow(parsed_arguments)
     try:
-        # window.mainloop()
-        while not top_window.close:
-            if top_window.player is not None and top_window.video_open:
-
-                top_window.update_video_progress()
-                pageflipglsink_requests = top_window.pageflipglsink.get_property(
-                    "requests"
-                )
-                if pageflipglsink_requests:
-                    ignore_duplicate_actions = (
-                        set()
-                    )  # we always seem to get two or more signals for one keyboard press
-                    top_window.pageflipglsink.set_property("requests", "")
-                    for r in pageflipglsink_requests.split(","):
-                        if (
-                            "toggle_paused" in r
-                            and "toggle_paused" not in ignore_duplicate_actions
-                        ):
-                            ignore_duplicate_actions.add("toggle_paused")
-                            top_window.toggle_paused()
-                        if (
-                            "toggle_sensor_logging" in r
-                            and "toggle_sensor_log" not in ignore_duplicate_actions
-                        ):
-                            if (
-                                top_window.emitter_serial is not None
-                                and top_window.emitter_settings_dialog is not None
-                            ):
-                                top_window.emitter_settings_dialog.click_opt_enable_stream_readings_to_serial_toggle()
-                        if "seek" in r:
-                            top_window.perform_seek(r)
-                        if "close" in r and "close" not in ignore_duplicate_actions:
-                            ignore_duplicate_actions.add("close")
-                            top_window.stop_player()
-                        if (
-                            "set_menu_on_top" in r
-                            and "set_menu_on_top" not in ignore_duplicate_actions
-                        ):
-                            ignore_duplicate_actions.add("set_menu_on_top")
-                            if r == "set_menu_on_top_true":
-                                top_window.set_menu_on_top(True, True, False, False)
-                            else:
-                                top_window.set_menu_on_top(False, False, True, True)
-                        if r.startswith("calibration-"):
-                            increment_by = 0
-                            target = None
-                            (
-                                _,
-                                calibration_target_field,
-                                calibration_decrease_or_increase_or_set,
-                                calibration_adjustment_amount,
-                            ) = r.split("-")
-                            calibration_target_field_map = {
-                                "calibration_mode": (
-                                    "display",
-                                    top_window.display_settings_dialog.calibration_mode_variable,
-                                ),
-                                "whitebox_vertical_position": (
-                                    "display",
-                                    top_window.display_settings_dialog.whitebox_vertical_position_variable,
-                                ),
-                                "whitebox_horizontal_position": (
-                                    "display",
-                                    top_window.display_settings_dialog.whitebox_horizontal_position_variable,
-                                ),
-                                "whitebox_horizontal_spacing": (
-                                    "display",
-                                    top_window.display_settings_dialog.whitebox_horizontal_spacing_variable,
-                                ),
-                                "blackbox_border": (
-                                    "display",
-                                    top_window.display_settings_dialog.blackbox_border_variable,
-                                ),
-                                "whitebox_size": (
-                                    "display",
-                                    top_window.display_settings_dialog.whitebox_size_variable,
-                                ),
-                            }
-                            if top_window.emitter_settings_dialog is not None:
-                                calibration_target_field_map["frame_delay"] = (
-                                    "emitter",
-                                    top_window.emitter_settings_dialog.setting_ir_frame_delay_variable,
-                                )
-                                calibration_target_field_map["frame_duration"] = (
-                                    "emitter",
-                                    top_window.emitter_settings_dialog.setting_ir_frame_duration_variable,
-                                )
-
-                            if (
-                                calibration_target_field
-                                not in calibration_target_field_map
-                            ):
-                                continue
-                            emitter_or_display, target = calibration_target_field_map[
-                                calibration_target_field
-                            ]
-                            if calibration_decrease_or_increase_or_set == "increase":
-                                set_to = str(
-                                    int(target.get())
-                                    + int(calibration_adjustment_amount)
-                                )
-                            elif calibration_decrease_or_increase_or_set == "decrease":
-                                set_to = str(
-                                    int(target.get())
-                                    - int(calibration_adjustment_amount)
-                                )
-                            elif calibration_decrease_or_increase_or_set == "set":
-                                set_to = (
-                                    True
-                                    if calibration_adjustment_amount == "true"
-                                    else (
-                                        False
-                                        if calibration_adjustment_amount == "false"
-                                        else calibration_adjustment_amount
-                                    )
-                                )
-                            else:
-                                continue
-                            target.set(set_to)
-                            if (
-                                emitter_or_display == "emitter"
-                                and top_window.emitter_serial is not None
-                            ):
-                                top_window.emitter_settings_dialog.click_update_settings_on_emitter()
-                            if emitter_or_display == "display":
-                                top_window.display_settings_dialog.click_apply_settings_to_active_video()
-                            if calibration_target_field != "calibration_mode":
-                                top_window.pageflipglsink.set_property(
-                                    "latest-subtitle-data",
-                                    json.dumps(
-                                        {
-                                            "show_now": True,
-                                            "text": f"{calibration_target_field} {target.get()} {'connect emitter!' if emitter_or_display == 'emitter' and top_window.emitter_serial is None else ''}",
-                                            "duration": 1000000000,
-                                            "special_type": "setting",
-                                        }
-                                    ),
-                                )
-
-                if top_window.subtitle3dsink is not None:
-                    latest_subtitle_data = top_window.subtitle3dsink.get_property(
-                        "latest-subtitle-data"
-                    )
-                    if latest_subtitle_data:
-                        top_window.subtitle3dsink.set_property(
-                            "latest-subtitle-data", ""
-                        )
-                        top_window.pageflipglsink.set_property(
-                            "latest-subtitle-data", latest_subtitle_data
-                        )
-
-                top_window.notify_player_if_mouse_moved()
-
-            try:
-                top_window.window.update_idletasks()
-                top_window.window.update()
-                time.sleep(0.01)
-            except:
-                # traceback.print_exc()
-                top_window.close_player()
-
+        top_window.window.mainloop()
     finally:
         pass
 
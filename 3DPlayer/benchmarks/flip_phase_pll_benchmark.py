@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+# Open3DOLED is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit http://creativecommons.org/licenses/by-nc-sa/4.0/
+
+"""
+Checks flip_phase_pll.FlipPhasePLL against synthetic flip timestamp traces with known true flip times, covering
+timestamp jitter with late outliers, single dropped flips, a nominal rate that is slightly off and refresh rate changes.
+The estimator on_synced_flip in 3d_player.py used before the pll (9:1 period average, 25% phase nudge and a reset on
+any error over half a period) runs on the same traces for comparison.
+
+The phase error is the difference between the estimated and true time of each flip, it is what the serial sync
+scheduler's eye command deadlines are off by. Exits with 1 if the pll misses a target.
+
+    python flip_phase_pll_benchmark.py --output results.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+benchmarks_path = os.path.dirname(os.path.abspath(__file__))
+player_path = os.path.dirname(benchmarks_path)
+sys.path.insert(0, player_path)
+
+import flip_phase_pll  # @UnresolvedImport
+
+DEFAULT_SEED = 1
+TRACE_SECONDS = 30.0
+TIMESTAMP_JITTER_SECONDS = 0.00015  # standard deviation of the flip callback timestamps around the true flip
+LATE_OUTLIER_PROBABILITY = 0.01  # flips whose callback is delayed by the render thread doing something else
+LATE_OUTLIER_SECONDS = (0.001, 0.003)
+DROPPED_FLIP_PROBABILITY = 0.01  # flips that miss their vsync and land on the next one
+SETTLE_SECONDS = 2.0  # phase errors this soon after the start or a rate change aren't counted as steady state
+TARGET_P99_PHASE_ERROR_SECONDS = 0.0001
+
+
+class LegacyFlipEstimator:
+    "The estimator on_synced_flip used before FlipPhasePLL"
+
+    def __init__(self, period):
+        self.period = period
+        self.next_time = None
+        self.last_flip_time = None
+        self.resets = 0
+
+    def update(self, now):
+        if self.last_flip_time is not None:
+            measured = now - self.last_flip_time
+            if self.period * 0.5 <= measured <= self.period * 1.5:
+                self.period = (self.period * 9.0 + measured) / 10.0
+        self.last_flip_time = now
+        flip_time = now
+        if self.next_time is not None:
+            err = now - self.next_time
+            if abs(err) <= self.period * 0.5:
+                flip_time = self.next_time + err * 0.25
+            else:
+                self.resets += 1
+        self.next_time = flip_time + self.period
+        return flip_time
+
+
+def generate_trace(rng, segments, drop_probability):
+    """
+    Returns (true flip time, timestamp, counted) tuples for segments of (seconds, refresh rate, vsyncs per flip),
+    counted is False for flips in the settling time after the start and after each rate change
+    """
+    flips = []
+    time = 1000.0
+    for seconds, refresh_rate, vsyncs_per_flip in segments:
+        segment_start = time
+        period = vsyncs_per_flip / refresh_rate
+        while time < segment_start + seconds:
+            time += period
+            if rng.random() < drop_probability:
+                time += 1.0 / refresh_rate
+            timestamp = time + rng.gauss(0, TIMESTAMP_JITTER_SECONDS)
+            if rng.random() < LATE_OUTLIER_PROBABILITY:
+                timestamp += rng.uniform(*LATE_OUTLIER_SECONDS)
+            flips.append((time, timestamp, time - segment_start >= SETTLE_SECONDS))
+    return flips
+
+
+def percentiles_us(samples):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "p50": samples[len(samples) // 2] * 1000000,
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000000,
+        "max": samples[-1] * 1000000,
+    }
+
+
+def run_estimator(estimator, flips):
+    phase_errors = []
+    for true_time, timestamp, counted in flips:
+        estimate = estimator.update(timestamp)
+        if counted:
+            phase_errors.append(abs(estimate - true_time))
+    return percentiles_us(phase_errors)
+
+
+TRACES = {
+    # name: (nominal refresh rate the estimator starts from, segments, dropped flip probability, reacquisitions expected)
+    "jitter": (120.0, ((TRACE_SECONDS, 120.0, 1),), 0.0, 0),
+    "dropped-flips": (120.0, ((TRACE_SECONDS, 120.0, 1),), DROPPED_FLIP_PROBABILITY, 0),
+    "ntsc-rate": (120.0, ((TRACE_SECONDS, 119.88, 1),), DROPPED_FLIP_PROBABILITY, 0),
+    "rate-changes": (
+        120.0,
+        ((10.0, 120.0, 1), (10.0, 120.0, 2), (10.0, 144.0, 1)),
+        0.0,
+        2,
+    ),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Checks the flip phase pll against synthetic flip timestamp traces"
+    )
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument(
+        "--locked-bandwidth",
+        type=float,
+        default=flip_phase_pll.DEFAULT_LOCKED_BANDWIDTH_HZ,
+    )
+    parser.add_argument(
+        "--acquire-bandwidth",
+        type=float,
+        default=flip_phase_pll.DEFAULT_ACQUIRE_BANDWIDTH_HZ,
+    )
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = []
+    failures = []
+    for name, trace in TRACES.items():
+        nominal_rate, segments, drop_probability, reacquisitions = trace
+        flips = generate_trace(random.Random(args.seed), segments, drop_probability)
+        pll = flip_phase_pll.FlipPhasePLL(
+            locked_bandwidth_hz=args.locked_bandwidth,
+            acquire_bandwidth_hz=args.acquire_bandwidth,
+        )
+        pll.reset(1.0 / nominal_rate)
+        legacy = LegacyFlipEstimator(1.0 / nominal_rate)
+        result = {
+            "trace": name,
+            "flips": len(flips),
+            "pll_phase_error_us": run_estimator(pll, flips),
+            "pll": pll.summary(),
+            "legacy_phase_error_us": run_estimator(legacy, flips),
+            "legacy_resets": legacy.resets,
+        }
+        results.append(result)
+        print(
+            f"{name:>14} pll p99 {result['pll_phase_error_us']['p99']:.0f}us "
+            f"reacquisitions {result['pll']['reacquisitions']} "
+            f"legacy p99 {result['legacy_phase_error_us']['p99']:.0f}us resets {legacy.resets}",
+            file=sys.stderr,
+        )
+        if (
+            result["pll_phase_error_us"]["p99"]
+            > TARGET_P99_PHASE_ERROR_SECONDS * 1000000
+        ):
+            failures.append(f"{name} p99 phase error over target")
+        if result["pll"]["reacquisitions"] != reacquisitions:
+            # a single missed flip must never restart the loop, only the refresh rate changes should
+            failures.append(
+                f"{name} reacquired {result['pll']['reacquisitions']} times instead of {reacquisitions}"
+            )
+        if not result["pll"]["locked"]:
+            failures.append(f"{name} not locked")
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    for failure in failures:
+        print(f"Failed {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
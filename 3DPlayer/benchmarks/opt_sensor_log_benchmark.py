@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+# Open3DOLED is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit http://creativecommons.org/licenses/by-nc-sa/4.0/
+
+"""
+Compares the batched array decoder in opt_sensor_log.py with the per line +o decoder EmitterSerialLineReader.handle_event
+used before it, on random stream reading packets. The decoded fields are checked to be identical, then the decode
+rate (readings decoded into their 16 fields) is measured, each decoder is timed --repeats times and the fastest run
+counts.
+
+The packets are also logged with opt_sensor_log.OptSensorLogWriter, from +o packets and from binary readings frames,
+and read back with OptSensorLogReader and exported to csv, which has to match the csv the per line decoder wrote. The
+logging rate and the log size are compared with that csv log, and the time to open and decode the log is measured.
+Exits with 1 if the batched decoder isn't at least --target-speedup times faster at decoding.
+
+    python opt_sensor_log_benchmark.py --readings 200000 --output results.json
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+benchmarks_path = os.path.dirname(os.path.abspath(__file__))
+player_path = os.path.dirname(benchmarks_path)
+sys.path.insert(0, player_path)
+
+import opt_sensor_log  # @UnresolvedImport
+
+DEFAULT_READINGS = 200000
+DEFAULT_TARGET_SPEEDUP = 100.0
+DEFAULT_SEED = 1
+FRAME_READINGS = 25  # readings per binary readings frame payload
+DEFAULT_REPEATS = 5  # each decoder is timed this many times and the fastest run counts, so a busy machine doesn't skew it
+
+
+def legacy_decode(raw_bytes):
+    # the per reading decode from EmitterSerialLineReader.handle_event before opt_sensor_log
+    opt_current_time = (
+        (raw_bytes[9] & 0x7F)
+        | ((raw_bytes[8] & 0x7F) << 7)
+        | ((raw_bytes[7] & 0x7F) << 14)
+        | ((raw_bytes[6] & 0x7F) << 21)
+        | ((raw_bytes[5] & 0x0F) << 28)
+    )
+    left_sensor = ((raw_bytes[5] & 0x70) >> 4) | ((raw_bytes[4] & 0x1F) << 3)
+    right_sensor = ((raw_bytes[4] & 0x60) >> 5) | ((raw_bytes[3] & 0x3F) << 2)
+    duplicate_frames_in_a_row_counter = raw_bytes[2] & 0x7F
+
+    opt_duplicate_frame_left = 1 if (raw_bytes[0] & 0x20) else 0
+    opt_ignore_duplicate_left = 1 if (raw_bytes[0] & 0x10) else 0
+    opt_reading_triggered_left = 1 if (raw_bytes[0] & 0x08) else 0
+    opt_duplicate_frame_right = 1 if (raw_bytes[0] & 0x04) else 0
+    opt_ignore_duplicate_right = 1 if (raw_bytes[0] & 0x02) else 0
+    opt_reading_triggered_right = 1 if (raw_bytes[0] & 0x01) else 0
+
+    opt_sensor_average_timing_mode_resync = 1 if (raw_bytes[1] & 0x20) else 0
+    opt_sensor_frametime_average_updated = 1 if (raw_bytes[1] & 0x10) else 0
+    opt_readings_active = 1 if (raw_bytes[1] & 0x08) else 0
+    opt_detected_signal_start_eye = 1 if (raw_bytes[1] & 0x04) else 0
+    opt_initiated_sending_ir_signal = 1 if (raw_bytes[1] & 0x02) else 0
+    opt_block_signal_detection_until = 1 if (raw_bytes[1] & 0x01) else 0
+
+    left_sent_ir = 0
+    right_sent_ir = 0
+    if opt_initiated_sending_ir_signal:
+        if opt_detected_signal_start_eye:
+            left_sent_ir = 1
+        else:
+            right_sent_ir = 1
+    left_duplicate_detected = 0
+    left_duplicate_ignored = 0
+    if opt_reading_triggered_left:
+        left_duplicate_detected = opt_duplicate_frame_left
+        if left_duplicate_detected:
+            left_duplicate_ignored = opt_ignore_duplicate_left
+    right_duplicate_detected = 0
+    right_duplicate_ignored = 0
+    if opt_reading_triggered_right:
+        right_duplicate_detected = opt_duplicate_frame_right
+        if right_duplicate_detected:
+            right_duplicate_ignored = opt_ignore_duplicate_right
+    return (
+        opt_current_time,
+        left_sensor,
+        right_sensor,
+        duplicate_frames_in_a_row_counter,
+        opt_block_signal_detection_until,
+        opt_readings_active,
+        opt_sensor_average_timing_mode_resync,
+        opt_sensor_frametime_average_updated,
+        opt_reading_triggered_left,
+        left_duplicate_detected,
+        left_duplicate_ignored,
+        left_sent_ir,
+        opt_reading_triggered_right,
+        right_duplicate_detected,
+        right_duplicate_ignored,
+        right_sent_ir,
+    )
+
+
+def legacy_log(lines, f):
+    for line in lines:
+        raw_bytes = line.split(" ")[1].encode("iso-8859-1")
+        f.write(",".join(str(value) for value in legacy_decode(raw_bytes)) + "\n")
+
+
+def best_seconds(repeats, decode, *args):
+    "Returns the fastest of repeats runs of decode(*args) in seconds and the decoded result"
+    fastest = None
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        result = decode(*args)
+        seconds = time.perf_counter() - started_at
+        if fastest is None or seconds < fastest:
+            fastest = seconds
+    return fastest, result
+
+
+def legacy_decode_lines(lines):
+    return [legacy_decode(line.split(" ")[1].encode("iso-8859-1")) for line in lines]
+
+
+def rate(readings, seconds):
+    return readings / seconds if seconds > 0 else float("inf")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compares the batched +o decoder with the per line decoder"
+    )
+    parser.add_argument("--readings", type=int, default=DEFAULT_READINGS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--target-speedup", type=float, default=DEFAULT_TARGET_SPEEDUP)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    packets = (
+        rng.integers(0, 0x80, (args.readings, opt_sensor_log.OPT_PACKET_SIZE)) | 0x80
+    ).astype(np.uint8)
+    lines = [f"+o {packet.tobytes().decode('iso-8859-1')}" for packet in packets]
+    packet_bytes = [packet.tobytes() for packet in packets]
+
+    legacy_decode_seconds, legacy_rows = best_seconds(
+        args.repeats, legacy_decode_lines, lines
+    )
+    decode_seconds, columns = best_seconds(
+        args.repeats, opt_sensor_log.decode_opt_packets, packets
+    )
+    legacy_columns = np.array(legacy_rows, np.uint32)
+    if not all(
+        np.array_equal(columns[column], legacy_columns[:, i])
+        for i, column in enumerate(opt_sensor_log.OPT_SENSOR_LOG_COLUMNS)
+    ):
+        print("Decoded readings differ from the per line decoder", file=sys.stderr)
+        sys.exit(1)
+
+    legacy_csv = io.StringIO()
+    started_at = time.perf_counter()
+    legacy_csv.write(",".join(opt_sensor_log.OPT_SENSOR_LOG_COLUMNS) + "\n")
+    legacy_log(lines, legacy_csv)
+    legacy_log_seconds = time.perf_counter() - started_at
+    legacy_log_size = len(legacy_csv.getvalue().encode("iso-8859-1"))
+
+    failures = []
+    with tempfile.TemporaryDirectory() as temp_path:
+        log_path = os.path.join(
+            temp_path, "opt_stream_readings" + opt_sensor_log.OPT_SENSOR_LOG_EXTENSION
+        )
+        started_at = time.perf_counter()
+        writer = opt_sensor_log.OptSensorLogWriter(log_path, 22, {"ir_protocol": "0"})
+        for packet in packet_bytes:
+            writer.append_packet(packet)
+        writer.close()
+        log_seconds = time.perf_counter() - started_at
+        log_size = os.path.getsize(log_path)
+
+        started_at = time.perf_counter()
+        reader = opt_sensor_log.OptSensorLogReader(log_path)
+        logged_columns = reader.columns()
+        load_seconds = time.perf_counter() - started_at
+        if reader.header["readings"] != args.readings or not all(
+            np.array_equal(logged_columns[column], columns[column])
+            for column in opt_sensor_log.OPT_SENSOR_LOG_COLUMNS
+        ):
+            failures.append("Logged readings differ from the decoded packets")
+        if reader.emitter_firmware_version != 22 or reader.settings != {
+            "ir_protocol": "0"
+        }:
+            failures.append("Log header doesn't hold the firmware version and settings")
+
+        # the binary protocol's readings frames have to produce the same log
+        readings = np.empty(args.readings, opt_sensor_log.OPT_READING_DTYPE)
+        opt_sensor_log.unpack_opt_packets(packets, readings)
+        reading_bytes = readings.tobytes()
+        frame_size = FRAME_READINGS * opt_sensor_log.OPT_READING_DTYPE.itemsize
+        frames_log_path = os.path.join(
+            temp_path, "frames" + opt_sensor_log.OPT_SENSOR_LOG_EXTENSION
+        )
+        frames_writer = opt_sensor_log.OptSensorLogWriter(frames_log_path)
+        for offset in range(0, len(reading_bytes), frame_size):
+            frames_writer.append_readings(reading_bytes[offset : offset + frame_size])
+        frames_writer.close()
+        frames_reader = opt_sensor_log.OptSensorLogReader(frames_log_path)
+        if frames_reader.readings.tobytes() != reader.readings.tobytes():
+            failures.append("Readings frames log differs from the +o packets log")
+
+        csv_path = os.path.join(temp_path, "opt_stream_readings.csv")
+        started_at = time.perf_counter()
+        opt_sensor_log.export_opt_sensor_log(log_path, csv_path)
+        export_seconds = time.perf_counter() - started_at
+        with open(csv_path, "rt") as f:
+            if f.read() != legacy_csv.getvalue():
+                failures.append("Exported csv differs from the per line decoder's")
+        del reader, frames_reader  # release the memory maps before the directory goes
+
+    result = {
+        "readings": args.readings,
+        "legacy_decode_readings_per_second": rate(args.readings, legacy_decode_seconds),
+        "decode_readings_per_second": rate(args.readings, decode_seconds),
+        "decode_speedup": legacy_decode_seconds / decode_seconds,
+        "legacy_log_readings_per_second": rate(args.readings, legacy_log_seconds),
+        "log_readings_per_second": rate(args.readings, log_seconds),
+        "log_speedup": legacy_log_seconds / log_seconds,
+        "legacy_log_bytes_per_reading": legacy_log_size / args.readings,
+        "log_bytes_per_reading": log_size / args.readings,
+        "log_size_ratio": log_size / legacy_log_size,
+        "load_readings_per_second": rate(args.readings, load_seconds),
+        "csv_export_readings_per_second": rate(args.readings, export_seconds),
+    }
+    print(
+        f"decode {result['decode_readings_per_second']:.0f}/s ({result['decode_speedup']:.0f}x) "
+        f"log {result['log_readings_per_second']:.0f}/s ({result['log_speedup']:.1f}x) "
+        f"size {result['log_size_ratio'] * 100:.0f}% of csv load {result['load_readings_per_second']:.0f}/s",
+        file=sys.stderr,
+    )
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    if result["decode_speedup"] < args.target_speedup:
+        failures.append("Batched decoder under the target speedup")
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
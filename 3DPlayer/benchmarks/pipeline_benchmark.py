@@ -0,0 +1,523 @@
+#!/usr/bin/env python
+
+# Open3DOLED is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit http://creativecommons.org/licenses/by-nc-sa/4.0/
+
+"""
+Benchmarks the video pipeline used by TopWindow.start_video in 3d_player.py with synthetic videotestsrc frames so
+regressions in do_render, update_image and the render loop show up before a release.
+
+Every frame packing, resolution and target framerate combination runs in its own process so peak RSS and crashes are
+isolated, the results are written as JSON. Rendering uses the headless offscreen path of gstpageflipglsink (egl or osmesa)
+so it runs without a display, or fakesink to measure the decode side of the pipeline without the sink.
+
+The pageflip sink plays in sync so its fps is held at the source framerate until the sink can't keep up, a slower
+do_render or render loop is caught by the per frame costs instead: the time do_render takes on the streaming thread
+and the time the render loop takes to upload and draw each flip, both from the sink's flip telemetry. fakesink runs
+unsynced so its fps is the throughput of the decode side.
+
+    python pipeline_benchmark.py --sink pageflip --render-backend egl --output results.json
+    python pipeline_benchmark.py --baseline results.json  # exits with 1 if any case got slower than the baseline
+    python pipeline_benchmark.py --upload glupload --video-format RGBA  # frames reach the sink as GLMemory textures
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import psutil
+
+FRAME_PACKINGS = (
+    "side-by-side-half",
+    "side-by-side-full",
+    "over-and-under-half",
+    "over-and-under-full",
+)
+RESOLUTIONS = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "2160p": (3840, 2160),
+}
+TARGET_FRAMERATES = ("60", "120")
+SINK_PAGEFLIP = "pageflip"
+SINK_FAKESINK = "fakesink"
+UPLOAD_SYSTEM = "system"  # frames are mapped to system memory and uploaded by the sink
+UPLOAD_GLUPLOAD = "glupload"  # software glupload hands the sink GLMemory textures in a context shared with its render thread
+DEFAULT_RENDER_BACKEND = "egl"
+DEFAULT_VIDEO_FORMAT = "NV12"
+DEFAULT_VIDEO_FRAMERATE = 24  # typical movie content, the sink repeats each frame over several flips
+DEFAULT_DURATION = 10.0  # seconds per case
+DEFAULT_WARMUP = 2.0  # seconds ignored at the start of each case while the pipeline prerolls and caches warm up
+DEFAULT_REGRESSION_TOLERANCE = 0.05  # fraction of the baseline fps a case can lose before it counts as a regression
+DEFAULT_COST_REGRESSION_TOLERANCE = 0.25  # fraction a mean per frame cost can grow by, costs are noisier than fps
+# flip telemetry means compared against the baseline, as (result name, flip telemetry summary key)
+FRAME_COSTS = (
+    ("render_ms", "render_duration_mean_ms"),
+    ("draw_ms", "draw_duration_mean_ms"),
+)
+RSS_SAMPLE_INTERVAL = 0.05
+CASE_TIMEOUT_MARGIN = 30  # seconds allowed on top of duration and warmup before a case process is killed
+
+benchmarks_path = os.path.dirname(os.path.abspath(__file__))
+player_path = os.path.dirname(benchmarks_path)
+
+
+def video_size_for_frame_packing(frame_packing, width, height):
+    # full packings carry both eyes at full display resolution, half packings squeeze both eyes into one display frame
+    if frame_packing == "side-by-side-full":
+        return width * 2, height
+    if frame_packing == "over-and-under-full":
+        return width, height * 2
+    return width, height
+
+
+def percentiles_ms(samples):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples) * 1000,
+        "p50": samples[len(samples) // 2] * 1000,
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        "max": samples[-1] * 1000,
+    }
+
+
+def run_case(args):
+    # environment has to be prepared before gi loads the plugins, the same way 3d_player.py does it
+    if args.sink == SINK_PAGEFLIP:
+        os.environ["PAGEFLIP_GL_RENDER_BACKEND"] = args.render_backend
+        os.environ["PAGEFLIP_GL_COUNT_CALLS"] = "1" if args.count_gl_calls else "0"
+    os.environ["GST_PLUGIN_PATH"] = os.pathsep.join(
+        (
+            os.path.join(player_path, "gstreamer_plugins_active"),
+            player_path,
+            os.environ.get("GST_PLUGIN_PATH", ""),
+        )
+    )
+    os.environ["SDL_HINT_VIDEO_HIGHDPI_DISABLED"] = "1"
+
+    import gi
+
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst, GLib
+
+    Gst.init(None)
+
+    display_width, display_height = RESOLUTIONS[args.resolution]
+    video_width, video_height = video_size_for_frame_packing(
+        args.frame_packing, display_width, display_height
+    )
+
+    # playbin3 only accepts uris, so the decode half is replaced by videotestsrc and the conversion playsink would add
+    pipeline = Gst.Pipeline.new("Benchmark")
+    source = Gst.ElementFactory.make("videotestsrc", "VideoTestSrc")
+    source.set_property("pattern", "smpte")
+    source.set_property("is-live", False)
+    capsfilter = Gst.ElementFactory.make("capsfilter", "VideoCapsFilter")
+    capsfilter.set_property(
+        "caps",
+        Gst.caps_from_string(
+            f"video/x-raw,format={args.video_format},width={video_width},height={video_height},framerate={args.video_framerate}/1,pixel-aspect-ratio=1/1"
+        ),
+    )
+    queue = Gst.ElementFactory.make("queue", "Queue")
+    videoconvert = Gst.ElementFactory.make("videoconvert", "VideoConvert")
+    elements = [source, capsfilter, queue, videoconvert]
+    if args.upload == UPLOAD_GLUPLOAD:
+        elements.append(Gst.ElementFactory.make("glupload", "GLUpload"))
+
+    if args.sink == SINK_PAGEFLIP:
+        sink = Gst.ElementFactory.make("gstpageflipglsink", "PageflipGLSink")
+        if sink is None:
+            raise RuntimeError(
+                "Unable to find/initialize GStreamer plugin GSTPageflipGLSink."
+            )
+        sink.set_property("render-backend", args.render_backend)
+        sink.set_property("offscreen-refresh-rate", args.target_framerate)
+        sink.set_property("fullscreen", True)
+        sink.set_property("frame-packing", args.frame_packing)
+        sink.set_property("right-eye", "right")
+        sink.set_property("target-framerate", args.target_framerate)
+        sink.set_property(
+            "display-resolution", f"{display_width}x{display_height}"
+        )
+        sink.set_property("enable-gl-memory", args.upload == UPLOAD_GLUPLOAD)
+        sink.set_property("start", True)  # this must be done last
+    else:
+        sink = Gst.ElementFactory.make("fakesink", "FakeSink")
+        # unsynced so the source free runs and fps measures throughput instead of the source framerate
+        sink.set_property("sync", False)
+
+    elements.append(sink)
+    for element in elements:
+        pipeline.add(element)
+    for upstream_element, downstream_element in zip(elements, elements[1:]):
+        upstream_element.link(downstream_element)
+
+    # per stage latency is measured by stamping each pts as it leaves the source, enters the sink and is first flipped
+    source_times = dict()
+    sink_times = dict()
+    source_to_sink = []
+    sink_to_flip = []
+    pending_flip = []
+    frames_rendered = [0]
+    flips = [0]
+    measuring = [False]
+    state_lock = threading.Lock()
+
+    def on_source_buffer(pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            with state_lock:
+                source_times[buffer.pts] = time.perf_counter()
+        return Gst.PadProbeReturn.OK
+
+    def on_sink_buffer(pad, info):
+        buffer = info.get_buffer()
+        if buffer is not None:
+            now = time.perf_counter()
+            with state_lock:
+                source_time = source_times.pop(buffer.pts, None)
+                if measuring[0]:
+                    frames_rendered[0] += 1
+                    if source_time is not None:
+                        source_to_sink.append(now - source_time)
+                    pending_flip.append(now)
+                sink_times[buffer.pts] = now
+        return Gst.PadProbeReturn.OK
+
+    def on_synced_flip(element, sync_value):
+        now = time.perf_counter()
+        with state_lock:
+            if measuring[0]:
+                flips[0] += 1
+                for sink_time in pending_flip:
+                    sink_to_flip.append(now - sink_time)
+                pending_flip.clear()
+
+    capsfilter.get_static_pad("src").add_probe(
+        Gst.PadProbeType.BUFFER, on_source_buffer
+    )
+    sink.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, on_sink_buffer)
+    if args.sink == SINK_PAGEFLIP:
+        sink.connect("synced-flip", on_synced_flip)
+
+    process = psutil.Process()
+    peak_rss = [process.memory_info().rss]
+    sampling = [True]
+
+    def sample_rss():
+        while sampling[0]:
+            peak_rss[0] = max(peak_rss[0], process.memory_info().rss)
+            time.sleep(RSS_SAMPLE_INTERVAL)
+
+    rss_thread = threading.Thread(target=sample_rss, daemon=True)
+    rss_thread.start()
+
+    errors = []
+    bus = pipeline.get_bus()
+    main_loop = GLib.MainLoop()
+
+    def on_message(bus, message):
+        if message.type == Gst.MessageType.ERROR:
+            error, debug = message.parse_error()
+            errors.append(f"{error.message} {debug}")
+            main_loop.quit()
+        elif message.type == Gst.MessageType.EOS:
+            main_loop.quit()
+
+    bus.add_signal_watch()
+    bus.connect("message", on_message)
+
+    measurement = dict()
+
+    def start_measuring():
+        psutil.cpu_percent(percpu=True)  # resets the per core counters
+        with state_lock:
+            measuring[0] = True
+        measurement["cpu_times_start"] = process.cpu_times()
+        measurement["start"] = time.perf_counter()
+        GLib.timeout_add(int(args.duration * 1000), stop_measuring)
+        return False
+
+    def stop_measuring():
+        measurement["end"] = time.perf_counter()
+        measurement["sink_caps"] = sink.get_static_pad("sink").get_current_caps()
+        measurement["cpu_per_core_percent"] = psutil.cpu_percent(percpu=True)
+        measurement["cpu_times_end"] = process.cpu_times()
+        with state_lock:
+            measuring[0] = False
+        if args.sink == SINK_PAGEFLIP:
+            measurement["flip_telemetry"] = json.loads(
+                sink.get_property("flip-telemetry-summary")
+            )
+            measurement["trigger_box_readback"] = json.loads(
+                sink.get_property("trigger-box-readback")
+            )
+            measurement["gl_calls_per_flip"] = int(
+                sink.get_property("gl-calls-per-flip")
+            )
+        main_loop.quit()
+        return False
+
+    GLib.timeout_add(
+        int(args.warmup * 1000), start_measuring
+    )  # the warmup starts counting once the pipeline is asked to play
+    pipeline.set_state(Gst.State.PLAYING)
+    try:
+        main_loop.run()
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+        if args.sink == SINK_PAGEFLIP:
+            sink.set_property("close", True)
+        sampling[0] = False
+        rss_thread.join()
+
+    result = {
+        "sink": args.sink,
+        "render_backend": args.render_backend if args.sink == SINK_PAGEFLIP else None,
+        "frame_packing": args.frame_packing,
+        "resolution": args.resolution,
+        "target_framerate": args.target_framerate,
+        "video_format": args.video_format,
+        "upload": args.upload,
+        "video_size": [video_width, video_height],
+        "peak_rss_mb": peak_rss[0] / (1024 * 1024),
+        "errors": errors,
+    }
+    if "end" not in measurement:
+        result["errors"].append("pipeline stopped before the measurement finished")
+        return result
+    elapsed = measurement["end"] - measurement["start"]
+    sink_caps = measurement["sink_caps"]
+    if args.upload == UPLOAD_GLUPLOAD and (
+        sink_caps is None
+        or not sink_caps.get_features(0).contains("memory:GLMemory")
+    ):
+        # the case would silently measure the system memory path
+        result["errors"].append(f"sink didn't negotiate GLMemory caps: {sink_caps}")
+    cpu_start, cpu_end = measurement["cpu_times_start"], measurement["cpu_times_end"]
+    result.update(
+        {
+            "duration": elapsed,
+            "frames_rendered": frames_rendered[0],
+            "fps": frames_rendered[0] / elapsed,
+            "flips": flips[0],
+            "flips_per_second": flips[0] / elapsed,
+            "latency_ms": {
+                "source_to_sink": percentiles_ms(source_to_sink),
+                "sink_to_flip": percentiles_ms(sink_to_flip),
+            },
+            "process_cpu_percent": (
+                (cpu_end.user - cpu_start.user + cpu_end.system - cpu_start.system)
+                / elapsed
+                * 100
+            ),
+            "cpu_per_core_percent": measurement["cpu_per_core_percent"],
+            "sink_caps": sink_caps.to_string() if sink_caps is not None else None,
+            "flip_telemetry": measurement.get("flip_telemetry"),
+            "frame_cost_ms": {
+                name: measurement["flip_telemetry"].get(key)
+                for name, key in FRAME_COSTS
+                if measurement.get("flip_telemetry")
+            },
+            "trigger_box_readback": measurement.get("trigger_box_readback"),
+            "gl_calls_per_flip": (
+                measurement.get("gl_calls_per_flip") if args.count_gl_calls else None
+            ),
+        }
+    )
+    return result
+
+
+def case_key(result):
+    return (
+        result["sink"],
+        result.get("upload", UPLOAD_SYSTEM),
+        result["frame_packing"],
+        result["resolution"],
+        result["target_framerate"],
+    )
+
+
+def find_regressions(results, baseline_results, tolerance, cost_tolerance):
+    baseline_by_case = {case_key(result): result for result in baseline_results}
+    regressions = []
+    for result in results:
+        baseline = baseline_by_case.get(case_key(result))
+        if baseline is None or "fps" not in baseline:
+            continue
+        if "fps" not in result:
+            regressions.append(f"{case_key(result)} failed: {result['errors']}")
+            continue
+        if result["fps"] < baseline["fps"] * (1 - tolerance):
+            regressions.append(
+                f"{case_key(result)} fps dropped from {baseline['fps']:.2f} to {result['fps']:.2f}"
+            )
+            continue
+        for name, _ in FRAME_COSTS:
+            cost = (result.get("frame_cost_ms") or {}).get(name)
+            baseline_cost = (baseline.get("frame_cost_ms") or {}).get(name)
+            if (
+                cost is not None
+                and baseline_cost is not None
+                and cost > baseline_cost * (1 + cost_tolerance)
+            ):
+                regressions.append(
+                    f"{case_key(result)} {name} per frame went from {baseline_cost:.3f} to {cost:.3f}"
+                )
+        if (
+            result.get("flip_telemetry")
+            and baseline.get("flip_telemetry")
+            and result["flip_telemetry"].get("missed_vsyncs", 0)
+            > baseline["flip_telemetry"].get("missed_vsyncs", 0)
+            * (1 + tolerance)
+        ):
+            regressions.append(
+                f"{case_key(result)} missed vsyncs went from {baseline['flip_telemetry']['missed_vsyncs']} to {result['flip_telemetry']['missed_vsyncs']}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the gstpageflipglsink video pipeline with synthetic frames."
+    )
+    parser.add_argument(
+        "--sink", choices=(SINK_PAGEFLIP, SINK_FAKESINK), default=SINK_PAGEFLIP
+    )
+    parser.add_argument(
+        "--render-backend", choices=("egl", "osmesa"), default=DEFAULT_RENDER_BACKEND
+    )
+    parser.add_argument(
+        "--frame-packings", nargs="+", choices=FRAME_PACKINGS, default=FRAME_PACKINGS
+    )
+    parser.add_argument(
+        "--resolutions", nargs="+", choices=tuple(RESOLUTIONS), default=tuple(RESOLUTIONS)
+    )
+    parser.add_argument(
+        "--target-framerates", nargs="+", default=TARGET_FRAMERATES
+    )
+    parser.add_argument(
+        "--upload", choices=(UPLOAD_SYSTEM, UPLOAD_GLUPLOAD), default=UPLOAD_SYSTEM
+    )
+    parser.add_argument("--video-format", default=DEFAULT_VIDEO_FORMAT)
+    parser.add_argument("--video-framerate", type=int, default=DEFAULT_VIDEO_FRAMERATE)
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION)
+    parser.add_argument("--warmup", type=float, default=DEFAULT_WARMUP)
+    parser.add_argument(
+        "--count-gl-calls",
+        action="store_true",
+        help="report gl calls per flip, every gl call is slower while they are counted so leave it off for timings",
+    )
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument(
+        "--baseline",
+        help="JSON results from a previous run, exit with status 1 if any case regressed",
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_REGRESSION_TOLERANCE
+    )
+    parser.add_argument(
+        "--cost-tolerance", type=float, default=DEFAULT_COST_REGRESSION_TOLERANCE
+    )
+    # used internally to run a single case in a child process
+    parser.add_argument("--case", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case is not None:
+        args.frame_packing, args.resolution, args.target_framerate = args.case
+        print(json.dumps(run_case(args)))
+        return 0
+
+    results = []
+    for frame_packing in args.frame_packings:
+        for resolution in args.resolutions:
+            for target_framerate in args.target_framerates:
+                command = [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "--sink",
+                    args.sink,
+                    "--render-backend",
+                    args.render_backend,
+                    "--upload",
+                    args.upload,
+                    "--video-format",
+                    args.video_format,
+                    "--video-framerate",
+                    str(args.video_framerate),
+                    "--duration",
+                    str(args.duration),
+                    "--warmup",
+                    str(args.warmup),
+                    *(("--count-gl-calls",) if args.count_gl_calls else ()),
+                    "--case",
+                    frame_packing,
+                    resolution,
+                    target_framerate,
+                ]
+                print(
+                    f"Benchmarking {args.sink} {args.upload} {frame_packing} {resolution} {target_framerate}hz",
+                    file=sys.stderr,
+                )
+                try:
+                    completed = subprocess.run(
+                        command,
+                        capture_output=True,
+                        text=True,
+                        timeout=args.duration + args.warmup + CASE_TIMEOUT_MARGIN,
+                    )
+                    # plugins print to stdout too so the result is the last line
+                    result = json.loads(completed.stdout.strip().splitlines()[-1])
+                except (subprocess.TimeoutExpired, json.JSONDecodeError, IndexError) as e:
+                    result = {
+                        "sink": args.sink,
+                        "upload": args.upload,
+                        "frame_packing": frame_packing,
+                        "resolution": resolution,
+                        "target_framerate": target_framerate,
+                        "errors": [repr(e)],
+                    }
+                results.append(result)
+                if "fps" in result:
+                    frame_cost_ms = result.get("frame_cost_ms") or {}
+                    print(
+                        f"  {result['fps']:.2f} fps {result['flips_per_second']:.2f} flips/s peak rss {result['peak_rss_mb']:.1f}mb"
+                        + "".join(
+                            f" {name} {cost:.3f}"
+                            for name, cost in frame_cost_ms.items()
+                            if cost is not None
+                        ),
+                        file=sys.stderr,
+                    )
+                else:
+                    print(f"  failed {result['errors']}", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline_results = json.load(f)
+        regressions = find_regressions(
+            results, baseline_results, args.tolerance, args.cost_tolerance
+        )
+        for regression in regressions:
+            print(f"Regression {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+# Open3DOLED is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit http://creativecommons.org/licenses/by-nc-sa/4.0/
+
+"""
+Benchmarks how close to their deadlines the serial drive mode eye commands reach the emitter, using a pty as a fake
+emitter so it runs without hardware. The commands go through emitter_settings.EmitterSerial exactly like in 3d_player.py
+and the fake emitter timestamps every line as it arrives on the other end of the pty.
+
+The deadline mode is serial_sync_scheduler.SerialSyncScheduler, the polling mode is the sleep polling loop with the send
+thread hop that 3d_player.py used before it, kept here as the reference the send time jitter is compared against.
+
+    python serial_sync_benchmark.py --output results.json
+    python serial_sync_benchmark.py --mode deadline --framerate 144 --handoff  # republish the schedule on every flip
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+benchmarks_path = os.path.dirname(os.path.abspath(__file__))
+player_path = os.path.dirname(benchmarks_path)
+sys.path.insert(0, player_path)
+
+import emitter_settings  # @UnresolvedImport
+import serial_sync_scheduler  # @UnresolvedImport
+
+MODE_DEADLINE = "deadline"
+MODE_POLLING = "polling"
+DEFAULT_FRAMERATE = 120.0
+DEFAULT_DURATION = 10.0  # seconds per mode
+DEFAULT_WARMUP = 1.0  # seconds ignored at the start of each mode while threads and the pty settle
+SCHEDULE_START_DELAY = 0.1  # the first deadline is this far after the schedule is published
+HISTOGRAM_BUCKETS_US = (10, 25, 50, 100, 250, 500, 1000, 2000, 5000)
+
+
+class FakeEmitter:
+    "Reads the master side of a pty and timestamps each line the player writes to the slave side"
+
+    def __init__(self):
+        self.master_fd, self.slave_fd = os.openpty()
+        # pyserial opens the slave again by path like a real emitter port, this one stays open until close because
+        # reading the master of a pty whose slave isn't open fails with EIO and would end the reader thread early
+        self.slave_path = os.ttyname(self.slave_fd)
+        self.lines = []
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.name = "fake-emitter"
+        self.__thread.start()
+
+    def __run(self):
+        pending = b""
+        while True:
+            try:
+                data = os.read(self.master_fd, 4096)
+            except OSError:
+                return
+            arrived = time.monotonic()
+            if not data:
+                return
+            pending += data
+            while b"\r\n" in pending:
+                line, pending = pending.split(b"\r\n", 1)
+                self.lines.append((arrived, line.decode("iso-8859-1")))
+
+    def close(self):
+        # with the last slave fd closed the blocked read fails with EIO and the reader thread returns
+        os.close(self.slave_fd)
+        self.__thread.join(1)
+        os.close(self.master_fd)
+
+
+def eye_command(eye):
+    if eye == emitter_settings.SYNC_SIGNAL_LEFT:
+        return emitter_settings.SERIAL_DRIVE_MODE_LEFT_COMMAND
+    return emitter_settings.SERIAL_DRIVE_MODE_RIGHT_COMMAND
+
+
+def run_deadline(emitter_serial, anchor, period, end_time, handoff):
+    def send_eye(eye):
+        emitter_serial.line_reader.drive_mode_eye_command(eye)
+        return True
+
+    scheduler = serial_sync_scheduler.SerialSyncScheduler(send_eye)
+    scheduler.start()
+    scheduler.set_schedule(
+        serial_sync_scheduler.SerialSyncSchedule(
+            anchor, period, emitter_settings.SYNC_SIGNAL_LEFT
+        )
+    )
+    if handoff:
+        # stands in for the render thread, publishing the flip that just happened like on_synced_flip does
+        flip = 0
+        while time.monotonic() < end_time:
+            flip_time = anchor + flip * period
+            serial_sync_scheduler.sleep_until(flip_time, 0)
+            scheduler.set_schedule(
+                serial_sync_scheduler.SerialSyncSchedule(
+                    flip_time,
+                    period,
+                    (
+                        emitter_settings.SYNC_SIGNAL_LEFT
+                        if flip % 2 == 0
+                        else emitter_settings.SYNC_SIGNAL_RIGHT
+                    ),
+                )
+            )
+            flip += 1
+    else:
+        time.sleep(max(0, end_time - time.monotonic()))
+    scheduler.stop()
+    return scheduler.summary()
+
+
+def run_polling(emitter_serial, anchor, period, end_time):
+    # the loop 3d_player.py ran before the deadline scheduler, with the schedule fixed instead of fed by flips
+    lock = threading.Lock()
+    next_time = anchor
+    next_eye = emitter_settings.SYNC_SIGNAL_LEFT
+    while time.monotonic() < end_time:
+        with lock:
+            current_time = next_time
+            current_eye = next_eye
+        now = time.monotonic()
+        if now < current_time:
+            time.sleep(min(0.001, current_time - now))
+            continue
+        emitter_serial.line_reader.async_command(eye_command(current_eye))
+        with lock:
+            next_eye = 3 - current_eye
+            next_time = current_time + period
+            now = time.monotonic()
+            if now - next_time > period:
+                next_time += (int((now - next_time) // period) + 1) * period
+    return None
+
+
+def run_mode(args, mode):
+    fake_emitter = FakeEmitter()
+    emitter_serial = emitter_settings.EmitterSerial(fake_emitter.slave_path)
+    period = 1.0 / args.framerate
+    anchor = time.monotonic() + SCHEDULE_START_DELAY
+    end_time = anchor + args.warmup + args.duration
+    cpu_started_at = time.process_time()
+    if mode == MODE_DEADLINE:
+        scheduler_summary = run_deadline(
+            emitter_serial, anchor, period, end_time, args.handoff
+        )
+    else:
+        scheduler_summary = run_polling(emitter_serial, anchor, period, end_time)
+    cpu_seconds = time.process_time() - cpu_started_at
+    time.sleep(0.1)  # let the last lines cross the pty
+    emitter_serial.close()
+    fake_emitter.close()
+
+    arrival_errors = []
+    eye_errors = 0
+    deadlines_hit = set()
+    for arrived, line in fake_emitter.lines:
+        index = round((arrived - anchor) / period)
+        target = anchor + index * period
+        if target < anchor + args.warmup:
+            continue
+        deadlines_hit.add(index)
+        arrival_errors.append(arrived - target)
+        expected_eye = (
+            emitter_settings.SYNC_SIGNAL_LEFT
+            if index % 2 == 0
+            else emitter_settings.SYNC_SIGNAL_RIGHT
+        )
+        if line != eye_command(expected_eye):
+            eye_errors += 1
+    expected_sends = int(args.duration / period)
+    histogram = {}
+    for bucket_us in HISTOGRAM_BUCKETS_US:
+        histogram[f"<={bucket_us}us"] = sum(
+            1 for error in arrival_errors if abs(error) * 1000000 <= bucket_us
+        )
+    histogram["total"] = len(arrival_errors)
+    return {
+        "mode": mode,
+        "framerate": args.framerate,
+        "handoff": bool(args.handoff) if mode == MODE_DEADLINE else False,
+        "expected_sends": expected_sends,
+        "received": len(arrival_errors),
+        "missed_deadlines": max(0, expected_sends - len(deadlines_hit)),
+        "eye_errors": eye_errors,
+        "arrival_error_us": serial_sync_scheduler.percentiles_us(arrival_errors),
+        "abs_arrival_error_histogram": histogram,
+        "cpu_percent": cpu_seconds / (end_time - anchor + SCHEDULE_START_DELAY) * 100,
+        "scheduler": scheduler_summary,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measures serial sync send time jitter against a pty backed fake emitter"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=(MODE_DEADLINE, MODE_POLLING),
+        action="append",
+        help="modes to run, all of them by default",
+    )
+    parser.add_argument("--framerate", type=float, default=DEFAULT_FRAMERATE)
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION)
+    parser.add_argument("--warmup", type=float, default=DEFAULT_WARMUP)
+    parser.add_argument(
+        "--handoff",
+        action="store_true",
+        help="republish the schedule on every flip in deadline mode",
+    )
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = []
+    failures = []
+    for mode in args.mode or (MODE_DEADLINE, MODE_POLLING):
+        result = run_mode(args, mode)
+        results.append(result)
+        arrival_error_us = result["arrival_error_us"] or {}
+        print(
+            f"{mode:>8} received {result['received']}/{result['expected_sends']} "
+            f"p50 {arrival_error_us.get('p50', 0):.0f}us p99 {arrival_error_us.get('p99', 0):.0f}us "
+            f"max {arrival_error_us.get('max', 0):.0f}us eye errors {result['eye_errors']} "
+            f"cpu {result['cpu_percent']:.1f}%",
+            file=sys.stderr,
+        )
+        if not result["received"]:
+            failures.append(f"{mode} mode: the fake emitter received no commands")
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    for failure in failures:
+        print(f"Failed {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -395,7 +395,7 @@ class DisplaySettingsDialog:
         # self.target_framerate_frame.pack()
         self.target_framerate_entry_tooltip = idlelib.tooltip.Hovertip(
             self.target_framerate_entry,
-            f"If set to a value other than 0 this will choose which eye to show based on a timer. This means if a single frame is dropped by default it will drop a second frame to re-sync. This mode is required for simulated BFI mode. It is for experimental purposes only. \n(this value will not be updated on an already playing video) \n(default {DEFAULT_TARGET_FRAMERATE})",
+            f"If set to a value other than 0 this will choose which eye to show based on a timer. This means if a single frame is dropped by default it will drop a second frame to re-sync. This mode is required for simulated BFI mode. It is for experimental purposes only. If set to auto the display refresh rate is measured over the first few seconds of playback and used as the target framerate (and for serial sync timing). \n(this value will not be updated on an already playing video) \n(default {DEFAULT_TARGET_FRAMERATE})",
             hover_delay=100,
         )
         self.target_framerate_frame.grid(row=row_count, column=0, sticky="w")
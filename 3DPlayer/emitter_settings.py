@@ -13,6 +13,9 @@ import idlelib.tooltip
 
 import avrloader
 import util
+import opt_sensor_log
+
+CLOCK_TIME_NONE = 2**64 - 1  # same value as Gst.CLOCK_TIME_NONE, subtitles pushed with this start are shown immediately
 
 # Default IR Settings
 DEFAULT_IR_DRIVE_MODE = "0"
@@ -45,6 +48,35 @@ SYNC_SIGNAL_RIGHT = 2
 SERIAL_DRIVE_MODE_LEFT_COMMAND = "9,0"
 SERIAL_DRIVE_MODE_RIGHT_COMMAND = "9,1"
 
+# Binary framed protocol, used next to the ascii lines once negotiated with ENABLE_BINARY_PROTOCOL_COMMAND
+# frame: BINARY_FRAME_START, type, payload length, payload, crc16 ccitt of type, length and payload (little endian)
+BINARY_PROTOCOL_MIN_FIRMWARE_VERSION = 23
+ENABLE_BINARY_PROTOCOL_COMMAND = "11,1"
+BINARY_FRAME_START = 0xFE  # frames only start where a line would, ascii lines never start with this byte
+BINARY_FRAME_HEADER_SIZE = 3
+BINARY_FRAME_CRC_SIZE = 2
+BINARY_FRAME_DRIVE_MODE_EYE = 0x09  # host to emitter, payload 0 left or 1 right like the 9 command
+BINARY_FRAME_DUPLICATE = 0x81  # emitter to host, same meaning as a +d line
+BINARY_FRAME_OPT_READINGS = 0x8A  # emitter to host, payload is one or more opt_sensor_log.OPT_READING_DTYPE readings
+
+
+def crc16_ccitt(data, crc=0xFFFF):
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        crc &= 0xFFFF
+    return crc
+
+
+def encode_binary_frame(frame_type, payload):
+    body = bytes((frame_type, len(payload))) + payload
+    return (
+        bytes((BINARY_FRAME_START,))
+        + body
+        + crc16_ccitt(body).to_bytes(BINARY_FRAME_CRC_SIZE, "little")
+    )
+
 
 class EmitterSerialLineReader(serial.threaded.LineReader):
 
@@ -59,8 +91,11 @@ class EmitterSerialLineReader(serial.threaded.LineReader):
         self.realtime_duplicate_counter = 0
         self.total_duplicate_frames = 0
         self.total_premature_frames = 0
-        self.debug_stream_file = None
+        self.opt_sensor_log_writer = None
         self.debug_opt_enable_stream_readings_to_serial = 0
+        self.binary_protocol = False
+        self.binary_frame_errors = 0
+        self.binary_frame_resync = False
         self.responses = queue.Queue()
         self.events = queue.Queue()
         self._event_thread = threading.Thread(target=self._run_event)
@@ -99,85 +134,101 @@ class EmitterSerialLineReader(serial.threaded.LineReader):
             except:
                 traceback.print_exc()
 
+    def data_received(self, data):
+        if not self.binary_protocol:
+            return super(EmitterSerialLineReader, self).data_received(data)
+        # lines and binary frames are interleaved, a frame can only start where a line would
+        self.buffer.extend(data)
+        while self.buffer:
+            if self.binary_frame_resync:
+                # the rest of a corrupt frame is skipped up to the next frame start or line end, whichever comes first
+                frame_start = self.buffer.find(BINARY_FRAME_START)
+                line_end = self.buffer.find(self.TERMINATOR)
+                if frame_start < 0 and line_end < 0:
+                    # keep a trailing partial terminator so a line end split across reads is still found
+                    del self.buffer[: len(self.buffer) - (len(self.TERMINATOR) - 1)]
+                    return
+                if line_end < 0 or 0 <= frame_start < line_end:
+                    del self.buffer[:frame_start]
+                else:
+                    del self.buffer[: line_end + len(self.TERMINATOR)]
+                self.binary_frame_resync = False
+            elif self.buffer[0] == BINARY_FRAME_START:
+                if len(self.buffer) < BINARY_FRAME_HEADER_SIZE:
+                    return
+                payload_end = BINARY_FRAME_HEADER_SIZE + self.buffer[2]
+                if len(self.buffer) < payload_end + BINARY_FRAME_CRC_SIZE:
+                    return
+                frame = bytes(self.buffer[: payload_end + BINARY_FRAME_CRC_SIZE])
+                if crc16_ccitt(frame[1:payload_end]) != int.from_bytes(
+                    frame[payload_end:], "little"
+                ):
+                    # drop only the start byte so a corrupt length can't swallow the frames and lines after it, then
+                    # resync instead of parsing the remains of the frame as a line
+                    self.binary_frame_errors += 1
+                    del self.buffer[:1]
+                    self.binary_frame_resync = True
+                    continue
+                del self.buffer[: len(frame)]
+                self.events.put((frame[1], frame[BINARY_FRAME_HEADER_SIZE:payload_end]))
+            else:
+                line_end = self.buffer.find(self.TERMINATOR)
+                if line_end < 0:
+                    return
+                packet = bytes(self.buffer[:line_end])
+                del self.buffer[: line_end + len(self.TERMINATOR)]
+                self.handle_packet(packet)
+
+    def handle_packet(self, packet):
+        # stream readings skip the event thread and are batched for opt_sensor_log's array decoder
+        if packet.startswith(b"+o "):
+            opt_sensor_log_writer = self.opt_sensor_log_writer
+            if (
+                opt_sensor_log_writer is not None
+                and self.debug_opt_enable_stream_readings_to_serial == 1
+                and len(packet) == 3 + opt_sensor_log.OPT_PACKET_SIZE
+            ):
+                opt_sensor_log_writer.append_packet(packet[3:])
+            return
+        if not packet.isascii():
+            # line noise, never let it through to responses where command() would take it as the emitter's reply
+            return
+        super(EmitterSerialLineReader, self).handle_packet(packet)
+
     def handle_line(self, line):
         if line.startswith("+"):
             self.events.put(line)
         else:
             self.responses.put(line)
 
+    def handle_binary_frame(self, frame_type, payload):
+        if frame_type == BINARY_FRAME_DUPLICATE:
+            self.handle_event("+d")
+        elif frame_type == BINARY_FRAME_OPT_READINGS:
+            opt_sensor_log_writer = self.opt_sensor_log_writer
+            if (
+                opt_sensor_log_writer is not None
+                and self.debug_opt_enable_stream_readings_to_serial == 1
+            ):
+                opt_sensor_log_writer.append_readings(payload)
+        else:
+            print(f"binary frame received: type {frame_type:#x} {payload.hex()}")
+
     def handle_event(self, event):
-        if event.startswith("+d"):
+        if isinstance(event, tuple):
+            self.handle_binary_frame(*event)
+        elif event.startswith("+d"):
             self.realtime_duplicate_counter += 1
             if self.__pageflipglsink is not None:
                 # self.__pageflipglsink.set_property("skip-n-page-flips", "1")
                 # if self.__pageflipglsink.get_property("calibration-mode"):
-                self.__pageflipglsink.set_property(
-                    "latest-subtitle-data",
-                    json.dumps(
-                        {
-                            "show_now": True,
-                            "text": f"\nduplicate frames {self.realtime_duplicate_counter}",
-                            "duration": 500000000,
-                            "special_type": "duplicate",
-                        }
-                    ),
+                self.__pageflipglsink.emit(
+                    "push-subtitle",
+                    CLOCK_TIME_NONE,
+                    500000000,
+                    f"\nduplicate frames {self.realtime_duplicate_counter}",
+                    "duplicate",
                 )
-        elif (
-            event.startswith("+o ")
-            and self.debug_opt_enable_stream_readings_to_serial == 1
-        ):
-            # self.debug_stream.file.write(f"{event.split(" ")[1]}\n")
-            raw_bytes = event.split(" ")[1].encode("iso-8859-1")
-            opt_current_time = (
-                (raw_bytes[9] & 0x7F)
-                | ((raw_bytes[8] & 0x7F) << 7)
-                | ((raw_bytes[7] & 0x7F) << 14)
-                | ((raw_bytes[6] & 0x7F) << 21)
-                | ((raw_bytes[5] & 0x0F) << 28)
-            )
-            left_sensor = ((raw_bytes[5] & 0x70) >> 4) | ((raw_bytes[4] & 0x1F) << 3)
-            right_sensor = ((raw_bytes[4] & 0x60) >> 5) | ((raw_bytes[3] & 0x3F) << 2)
-            duplicate_frames_in_a_row_counter = raw_bytes[2] & 0x7F
-
-            opt_duplicate_frame_left = 1 if (raw_bytes[0] & 0x20) else 0
-            opt_ignore_duplicate_left = 1 if (raw_bytes[0] & 0x10) else 0
-            opt_reading_triggered_left = 1 if (raw_bytes[0] & 0x08) else 0
-            opt_duplicate_frame_right = 1 if (raw_bytes[0] & 0x04) else 0
-            opt_ignore_duplicate_right = 1 if (raw_bytes[0] & 0x02) else 0
-            opt_reading_triggered_right = 1 if (raw_bytes[0] & 0x01) else 0
-
-            opt_sensor_average_timing_mode_resync = 1 if (raw_bytes[1] & 0x20) else 0
-            opt_sensor_frametime_average_updated = 1 if (raw_bytes[1] & 0x10) else 0
-            opt_readings_active = 1 if (raw_bytes[1] & 0x08) else 0
-            opt_detected_signal_start_eye = 1 if (raw_bytes[1] & 0x04) else 0
-            opt_initiated_sending_ir_signal = 1 if (raw_bytes[1] & 0x02) else 0
-            opt_block_signal_detection_until = 1 if (raw_bytes[1] & 0x01) else 0
-
-            left_sent_ir = 0
-            right_sent_ir = 0
-            if opt_initiated_sending_ir_signal:
-                if opt_detected_signal_start_eye:
-                    left_sent_ir = 1
-                else:
-                    right_sent_ir = 1
-            left_duplicate_detected = 0
-            left_duplicate_ignored = 0
-            if opt_reading_triggered_left:
-                left_duplicate_detected = opt_duplicate_frame_left
-                if left_duplicate_detected:
-                    left_duplicate_ignored = opt_ignore_duplicate_left
-            right_duplicate_detected = 0
-            right_duplicate_ignored = 0
-            if opt_reading_triggered_right:
-                right_duplicate_detected = opt_duplicate_frame_right
-                if right_duplicate_detected:
-                    right_duplicate_ignored = opt_ignore_duplicate_right
-            self.debug_stream_file.write(
-                f"{opt_current_time},{left_sensor},{right_sensor},{duplicate_frames_in_a_row_counter},"
-                f"{opt_block_signal_detection_until},{opt_readings_active},{opt_sensor_average_timing_mode_resync},{opt_sensor_frametime_average_updated},"
-                f"{opt_reading_triggered_left},{left_duplicate_detected},{left_duplicate_ignored},{left_sent_ir},"
-                f"{opt_reading_triggered_right},{right_duplicate_detected},{right_duplicate_ignored},{right_sent_ir}\n"
-            )
         else:
             print("event received:", event)
             if event.startswith("+stats general"):
@@ -216,6 +267,40 @@ class EmitterSerialLineReader(serial.threaded.LineReader):
     def async_command(self, command, response="OK", timeout=5):
         self._send_queue.put(command)
 
+    def immediate_command(self, command):
+        # written from the calling thread without waiting for a response, for commands sent at a deadline where the hop through the send thread would add its wakeup latency
+        with self.lock:
+            self.write_line(command)
+
+    def drive_mode_eye_command(self, eye):
+        "Sends the serial drive mode command for eye (SYNC_SIGNAL_LEFT or SYNC_SIGNAL_RIGHT) from the calling thread"
+        if self.binary_protocol:
+            frame = encode_binary_frame(
+                BINARY_FRAME_DRIVE_MODE_EYE,
+                bytes((0 if eye == SYNC_SIGNAL_LEFT else 1,)),
+            )
+            with self.lock:
+                self.transport.write(frame)
+        elif eye == SYNC_SIGNAL_LEFT:
+            self.immediate_command(SERIAL_DRIVE_MODE_LEFT_COMMAND)
+        else:
+            self.immediate_command(SERIAL_DRIVE_MODE_RIGHT_COMMAND)
+
+    def negotiate_binary_protocol(self, emitter_firmware_version):
+        "Switches to binary frames for eye commands and sensor readings if the firmware supports them, returns whether it did"
+        if emitter_firmware_version < BINARY_PROTOCOL_MIN_FIRMWARE_VERSION:
+            self.binary_protocol = False
+            return False
+        if not self.binary_protocol:
+            # frames are parsed before asking since the firmware can send one right after its OK
+            self.binary_protocol = True
+            try:
+                self.command(ENABLE_BINARY_PROTOCOL_COMMAND)
+            except Exception:
+                traceback.print_exc()
+                self.binary_protocol = False
+        return self.binary_protocol
+
     @property
     def pageflipglsink(self):
         return self.__pageflipglsink
@@ -1157,6 +1242,10 @@ class EmitterSettingsDialog:
                     parameters = [3] + parameters
                 emitter_firmware_version = parameters[0]
                 self.emitter_firmware_version_int = int(emitter_firmware_version)
+                if self.main_app.emitter_serial.line_reader.negotiate_binary_protocol(
+                    self.emitter_firmware_version_int
+                ):
+                    print("Emitter binary protocol enabled")
                 # remove what was param_12 or setting_pwm_backlight_frequency_variable
                 if (
                     self.emitter_firmware_version_int > 14
@@ -1583,22 +1672,17 @@ class EmitterSettingsDialog:
             )
             if new_value == 1:
                 if (
-                    self.main_app.emitter_serial.line_reader.debug_stream_file
+                    self.main_app.emitter_serial.line_reader.opt_sensor_log_writer
                     is not None
                 ):
                     return
-                self.main_app.emitter_serial.line_reader.debug_stream_file = open(
+                self.main_app.emitter_serial.line_reader.opt_sensor_log_writer = opt_sensor_log.OptSensorLogWriter(
                     os.path.join(
                         self.main_app.base_path,
-                        f'{datetime.datetime.now().strftime("%Y-%m-%d_%H%M%S")}_debug_opt_stream_readings.csv',
+                        f'{datetime.datetime.now().strftime("%Y-%m-%d_%H%M%S")}_debug_opt_stream_readings{opt_sensor_log.OPT_SENSOR_LOG_EXTENSION}',
                     ),
-                    "wt",
-                )
-                self.main_app.emitter_serial.line_reader.debug_stream_file.write(
-                    "opt_current_time,left_sensor,right_sensor,duplicate_frames_in_a_row_counter,"
-                    "opt_block_signal_detection_until,opt_readings_active,opt_sensor_average_timing_mode_resync,opt_sensor_frametime_average_updated,"
-                    "opt_reading_triggered_left,left_duplicate_detected,left_duplicate_ignored,left_sent_ir,"
-                    "opt_reading_triggered_right,right_duplicate_detected,right_duplicate_ignored,right_sent_ir\n"
+                    self.emitter_firmware_version_int,
+                    self.get_settings_dictionary(),
                 )
 
             self.main_app.emitter_serial.line_reader.debug_opt_enable_stream_readings_to_serial = (
@@ -1606,18 +1690,11 @@ class EmitterSettingsDialog:
             )
 
             if new_value == 0:
-                self.main_app.emitter_serial.line_reader.debug_stream_file.write(
-                    f"\n\n"
+                opt_sensor_log_writer = (
+                    self.main_app.emitter_serial.line_reader.opt_sensor_log_writer
                 )
-                for (
-                    setting_name,
-                    setting_value,
-                ) in self.get_settings_dictionary().items():
-                    self.main_app.emitter_serial.line_reader.debug_stream_file.write(
-                        f"\n\n{setting_name},{setting_value}\n"
-                    )
-                self.main_app.emitter_serial.line_reader.debug_stream_file.close()
-                self.main_app.emitter_serial.line_reader.debug_stream_file = None
+                self.main_app.emitter_serial.line_reader.opt_sensor_log_writer = None
+                opt_sensor_log_writer.close(self.get_settings_dictionary())
             command = f"10,{new_value}"
             print(command)
             try:
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+# Open3DOLED is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit http://creativecommons.org/licenses/by-nc-sa/4.0/
+
+"""
+Page flip phase tracking for serial sync in 3d_player.py
+
+FlipPhasePLL filters the noisy flip callback timestamps through a second order phase locked loop, so the serial sync
+scheduler's eye command deadlines follow the true flip grid rather than the jitter of each callback. Missed flips are
+absorbed as whole period slips, late outliers are rejected, and the loop reacquires when the flip rate changes.
+"""
+
+DEFAULT_LOCKED_BANDWIDTH_HZ = 0.5  # loop noise bandwidth once locked, narrow so timestamp jitter is averaged over many flips
+DEFAULT_ACQUIRE_BANDWIDTH_HZ = 5.0  # loop noise bandwidth while acquiring, wide so the phase and period are pulled in quickly
+DEFAULT_DAMPING = 0.707
+DEFAULT_OUTLIER_DEVIATIONS = 5.0  # flips further than this many estimated standard deviations from the prediction are rejected
+OUTLIER_MIN_SECONDS = 0.0002  # rejection threshold floor so a very clean trace doesn't start rejecting ordinary jitter
+JITTER_ESTIMATE_GAIN = 0.02  # fraction of each accepted residual the mean absolute deviation estimate moves by
+MEAN_ABSOLUTE_DEVIATION_TO_SIGMA = 1.2533  # standard deviation of normally distributed jitter per unit of mean absolute deviation
+LOCK_MIN_FLIPS = 30  # accepted flips needed after an acquisition before the loop can lock
+LOCK_JITTER_SECONDS = 0.0005  # estimated jitter standard deviation under which the loop counts as locked
+REACQUIRE_FLIPS = 6  # consecutive rejected or consecutively slipped flips after which the flip rate is taken to have changed
+MIN_PERIOD_SECONDS = 1.0 / 500
+MAX_PERIOD_SECONDS = 1.0 / 20
+PERIOD_TRACKING_RANGE = 0.05  # fraction of the acquired period the loop can move the period by before it reacquires instead
+
+
+class FlipPhasePLL:
+    """
+    Second order phase locked loop that tracks the phase and period of page flips from noisy flip timestamps
+
+    update(flip_time) is called once per flip and returns the filtered time of that flip, next_flip_time predicts the
+    following one. Flips that arrive a whole number of periods late are counted as missed flips and keep the phase
+    instead of restarting the loop, flips that land far off the predicted grid are rejected as outliers, and a run of
+    either means the flip rate changed so the loop reacquires from the observed flip interval. The loop acquires with
+    a wide bandwidth that narrows to the locked bandwidth as flips are averaged, and counts as locked once the residual
+    jitter is low enough.
+
+    Not thread safe, callers updating it from several threads have to serialise the calls.
+    """
+
+    def __init__(
+        self,
+        locked_bandwidth_hz=DEFAULT_LOCKED_BANDWIDTH_HZ,
+        acquire_bandwidth_hz=DEFAULT_ACQUIRE_BANDWIDTH_HZ,
+        damping=DEFAULT_DAMPING,
+        outlier_deviations=DEFAULT_OUTLIER_DEVIATIONS,
+    ):
+        self.locked_bandwidth_hz = locked_bandwidth_hz
+        self.acquire_bandwidth_hz = acquire_bandwidth_hz
+        self.damping = damping
+        self.outlier_deviations = outlier_deviations
+        self.__period = None
+        self.reset()
+
+    def reset(self, period=None):
+        "Forgets the phase, the next update starts acquiring again from period or the period tracked so far"
+        if period is not None:
+            self.__period = period
+        self.__acquired_period = self.__period
+        self.__next_flip_time = None
+        self.__last_flip_time = None
+        self.__jitter = None
+        self.__locked = False
+        self.__accepted_since_acquire = 0
+        self.__consecutive_rejected = 0
+        self.__consecutive_slipped = 0
+        self.__flips = 0
+        self.__missed_flips = 0
+        self.__outliers = 0
+        self.__reacquisitions = 0
+
+    def set_period(self, period):
+        "Replaces the period estimate, eg with a measured refresh interval, without losing the phase"
+        self.__period = period
+        self.__acquired_period = period
+
+    @property
+    def period(self):
+        return self.__period
+
+    @property
+    def next_flip_time(self):
+        return self.__next_flip_time
+
+    @property
+    def locked(self):
+        return self.__locked
+
+    @property
+    def jitter(self):
+        "Estimated standard deviation of the flip timestamps around the tracked grid in seconds"
+        if self.__jitter is None:
+            return None
+        return self.__jitter * MEAN_ABSOLUTE_DEVIATION_TO_SIGMA
+
+    def summary(self):
+        return {
+            "flips": self.__flips,
+            "locked": self.__locked,
+            "period": self.__period,
+            "jitter": self.jitter,
+            "missed_flips": self.__missed_flips,
+            "outliers": self.__outliers,
+            "reacquisitions": self.__reacquisitions,
+        }
+
+    def update(self, flip_time):
+        "Adds the timestamp of a flip and returns the loop's estimate of when that flip happened"
+        if self.__period is None:
+            raise ValueError("FlipPhasePLL needs a period before the first update")
+        self.__flips += 1
+        if self.__next_flip_time is None:
+            self.__acquire(flip_time, None)
+            return flip_time
+        interval = flip_time - self.__last_flip_time
+        self.__last_flip_time = flip_time
+        error = flip_time - self.__next_flip_time
+        slips = round(error / self.__period)
+        residual = error - slips * self.__period
+        predicted_flip_time = self.__next_flip_time + max(slips, 0) * self.__period
+
+        threshold = max(
+            OUTLIER_MIN_SECONDS,
+            self.outlier_deviations * self.__jitter * MEAN_ABSOLUTE_DEVIATION_TO_SIGMA,
+        )
+        if slips < 0 or abs(residual) > threshold:
+            self.__outliers += 1
+            self.__consecutive_rejected += 1
+            if self.__consecutive_rejected >= REACQUIRE_FLIPS:
+                self.__reacquire(flip_time, interval)
+                return flip_time
+            if slips >= 0:
+                self.__next_flip_time = predicted_flip_time + self.__period
+            return predicted_flip_time
+        self.__consecutive_rejected = 0
+
+        if slips > 0:
+            self.__missed_flips += slips
+            self.__consecutive_slipped += 1
+            if self.__consecutive_slipped >= REACQUIRE_FLIPS:
+                # every flip skipping vsyncs means flips now happen at a lower rate rather than being dropped
+                self.__reacquire(flip_time, interval)
+                return flip_time
+        else:
+            self.__consecutive_slipped = 0
+
+        phase_gain, period_gain = self.__loop_gains()
+        flip_estimate = predicted_flip_time + phase_gain * residual
+        self.__period += period_gain * residual
+        if abs(self.__period - self.__acquired_period) > (
+            self.__acquired_period * PERIOD_TRACKING_RANGE
+        ):
+            self.__reacquire(flip_time, interval)
+            return flip_time
+        self.__next_flip_time = flip_estimate + self.__period
+
+        self.__jitter += (abs(residual) - self.__jitter) * JITTER_ESTIMATE_GAIN
+        self.__accepted_since_acquire += 1
+        if not self.__locked:
+            self.__locked = (
+                self.__accepted_since_acquire >= LOCK_MIN_FLIPS
+                and self.jitter < LOCK_JITTER_SECONDS
+            )
+        elif self.jitter >= LOCK_JITTER_SECONDS * 2:
+            # hysteresis so jitter hovering around the threshold doesn't keep unlocking, the bandwidth widens again
+            self.__locked = False
+            self.__accepted_since_acquire = 0
+        return flip_estimate
+
+    def __loop_gains(self):
+        # discrete type 2 loop updated once per flip, from the natural frequency that gives the chosen noise bandwidth
+        # narrowed in proportion to the flips averaged since acquiring so the remaining period error keeps being pulled in
+        bandwidth_hz = max(
+            self.locked_bandwidth_hz,
+            self.acquire_bandwidth_hz
+            * LOCK_MIN_FLIPS
+            / max(LOCK_MIN_FLIPS, self.__accepted_since_acquire),
+        )
+        natural_frequency = 2 * bandwidth_hz / (self.damping + 1 / (4 * self.damping))
+        normalised_frequency = natural_frequency * self.__period
+        return (
+            min(1.0, 2 * self.damping * normalised_frequency),
+            normalised_frequency**2,
+        )
+
+    def __acquire(self, flip_time, period):
+        if period is not None:
+            self.__period = min(MAX_PERIOD_SECONDS, max(MIN_PERIOD_SECONDS, period))
+        self.__acquired_period = self.__period
+        self.__next_flip_time = flip_time + self.__period
+        self.__last_flip_time = flip_time
+        # starts wide enough that every flip within half a period of the prediction is accepted
+        self.__jitter = self.__period / 8
+        self.__locked = False
+        self.__accepted_since_acquire = 0
+        self.__consecutive_rejected = 0
+        self.__consecutive_slipped = 0
+
+    def __reacquire(self, flip_time, interval):
+        self.__reacquisitions += 1
+        self.__acquire(flip_time, interval)
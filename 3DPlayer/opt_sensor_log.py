@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+
+# Open3DOLED is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit http://creativecommons.org/licenses/by-nc-sa/4.0/
+
+"""
+Optical sensor stream logging for the emitter settings dialog in emitter_settings.py
+
+OptSensorLogWriter buffers stream readings, from +o lines or binary readings frames, and writes them a chunk at a time
+to a binary sensor log: a json header with the emitter firmware version and settings followed by fixed width
+OPT_READING_DTYPE records. OptSensorLogReader memory maps a log and decodes its readings into the OPT_SENSOR_LOG_COLUMNS
+with array operations, and export_opt_sensor_log converts a log to csv or parquet for sensor_log_analyzer.
+"""
+
+import datetime
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+
+OPT_SENSOR_LOG_COLUMNS = (
+    "opt_current_time",
+    "left_sensor",
+    "right_sensor",
+    "duplicate_frames_in_a_row_counter",
+    "opt_block_signal_detection_until",
+    "opt_readings_active",
+    "opt_sensor_average_timing_mode_resync",
+    "opt_sensor_frametime_average_updated",
+    "opt_reading_triggered_left",
+    "left_duplicate_detected",
+    "left_duplicate_ignored",
+    "left_sent_ir",
+    "opt_reading_triggered_right",
+    "right_duplicate_detected",
+    "right_duplicate_ignored",
+    "right_sent_ir",
+)
+OPT_SENSOR_LOG_CSV_ROW_FORMAT = ",".join(("%d",) * len(OPT_SENSOR_LOG_COLUMNS)) + "\n"
+OPT_SENSOR_LOG_CHUNK_READINGS = 8192  # readings buffered before a chunk is written, about a second of streaming
+OPT_PACKET_SIZE = 10  # bytes after "+o " in a stream readings line, every byte has its high bit set so it never contains a line end
+# layout of a reading in an emitter_settings.BINARY_FRAME_OPT_READINGS frame, the flags have the bit layout of the first two +o bytes
+OPT_READING_DTYPE = np.dtype(
+    [
+        ("opt_current_time", "<u4"),
+        ("left_sensor", "u1"),
+        ("right_sensor", "u1"),
+        ("trigger_flags", "u1"),
+        ("state_flags", "u1"),
+        ("duplicate_frames_in_a_row_counter", "u1"),
+    ]
+)
+OPT_SENSOR_LOG_EXTENSION = ".optlog"
+OPT_SENSOR_LOG_MAGIC = b"O3DOPTLG"
+OPT_SENSOR_LOG_FORMAT_VERSION = 1
+# follows the magic, the format version and the offset of the first reading, the json header fills the space between
+OPT_SENSOR_LOG_PREAMBLE = struct.Struct("<HI")
+OPT_SENSOR_LOG_HEADER_SIZE = 4096  # bytes reserved for the json header so it can be rewritten in place when the log is closed
+OPT_SENSOR_LOG_DATA_OFFSET = (
+    len(OPT_SENSOR_LOG_MAGIC)
+    + OPT_SENSOR_LOG_PREAMBLE.size
+    + OPT_SENSOR_LOG_HEADER_SIZE
+)
+
+
+def opt_reading_columns(
+    opt_current_time,
+    left_sensor,
+    right_sensor,
+    duplicate_frames_in_a_row_counter,
+    trigger_flags,
+    state_flags,
+):
+    "Returns a dictionary of OPT_SENSOR_LOG_COLUMNS arrays from arrays of the raw reading fields"
+    # a duplicate only counts on a channel that triggered and it can only be ignored once detected
+    initiated_sending_ir_signal = (state_flags >> 1) & 1
+    detected_signal_start_eye = (state_flags >> 2) & 1
+    opt_reading_triggered_left = (trigger_flags >> 3) & 1
+    left_duplicate_detected = opt_reading_triggered_left & (trigger_flags >> 5)
+    opt_reading_triggered_right = trigger_flags & 1
+    right_duplicate_detected = opt_reading_triggered_right & (trigger_flags >> 2)
+    return {
+        "opt_current_time": opt_current_time,
+        "left_sensor": left_sensor,
+        "right_sensor": right_sensor,
+        "duplicate_frames_in_a_row_counter": duplicate_frames_in_a_row_counter,
+        "opt_block_signal_detection_until": state_flags & 1,
+        "opt_readings_active": (state_flags >> 3) & 1,
+        "opt_sensor_average_timing_mode_resync": (state_flags >> 5) & 1,
+        "opt_sensor_frametime_average_updated": (state_flags >> 4) & 1,
+        "opt_reading_triggered_left": opt_reading_triggered_left,
+        "left_duplicate_detected": left_duplicate_detected,
+        "left_duplicate_ignored": left_duplicate_detected & (trigger_flags >> 4),
+        "left_sent_ir": initiated_sending_ir_signal & detected_signal_start_eye,
+        "opt_reading_triggered_right": opt_reading_triggered_right,
+        "right_duplicate_detected": right_duplicate_detected,
+        "right_duplicate_ignored": right_duplicate_detected & (trigger_flags >> 1),
+        "right_sent_ir": initiated_sending_ir_signal & (detected_signal_start_eye ^ 1),
+    }
+
+
+def opt_packet_fields(packets):
+    "Unpacks an (n, OPT_PACKET_SIZE) uint8 array of +o payloads into arrays of the raw reading fields in opt_reading_columns order"
+    # the firmware packs the fields 7 bits per byte so the high bit stays set, see opt_sensor.cpp
+    # transposed so each byte position is contiguous, everything but the time is worked on as uint8
+    packets = np.ascontiguousarray(packets.T)
+    opt_current_time = (packets[5] & 0x0F).astype(np.uint32) << 28
+    opt_current_time |= (packets[6] & 0x7F).astype(np.uint32) << 21
+    opt_current_time |= (packets[7] & 0x7F).astype(np.uint32) << 14
+    opt_current_time |= (packets[8] & 0x7F).astype(np.uint32) << 7
+    opt_current_time |= packets[9] & 0x7F
+    left_sensor = ((packets[5] & 0x70) >> 4) | ((packets[4] & 0x1F) << 3)
+    right_sensor = ((packets[4] & 0x60) >> 5) | ((packets[3] & 0x3F) << 2)
+    return (
+        opt_current_time,
+        left_sensor,
+        right_sensor,
+        packets[2] & 0x7F,
+        packets[0],
+        packets[1],
+    )
+
+
+def decode_opt_packets(packets):
+    "Decodes an (n, OPT_PACKET_SIZE) uint8 array of +o payloads into a dictionary of OPT_SENSOR_LOG_COLUMNS arrays"
+    return opt_reading_columns(*opt_packet_fields(packets))
+
+
+def unpack_opt_packets(packets, readings):
+    "Unpacks an (n, OPT_PACKET_SIZE) uint8 array of +o payloads into the first n entries of an OPT_READING_DTYPE array"
+    readings = readings[: len(packets)]
+    (
+        readings["opt_current_time"],
+        readings["left_sensor"],
+        readings["right_sensor"],
+        readings["duplicate_frames_in_a_row_counter"],
+        readings["trigger_flags"],
+        readings["state_flags"],
+    ) = opt_packet_fields(packets)
+
+
+def decode_opt_readings(readings):
+    "Decodes an OPT_READING_DTYPE array into a dictionary of OPT_SENSOR_LOG_COLUMNS arrays"
+    return opt_reading_columns(
+        readings["opt_current_time"],
+        readings["left_sensor"],
+        readings["right_sensor"],
+        readings["duplicate_frames_in_a_row_counter"],
+        readings["trigger_flags"],
+        readings["state_flags"],
+    )
+
+
+def write_csv_rows(f, columns):
+    "Writes a dictionary of OPT_SENSOR_LOG_COLUMNS arrays as csv rows in one format call and returns the rows written"
+    rows = np.column_stack([columns[column] for column in OPT_SENSOR_LOG_COLUMNS])
+    f.write((OPT_SENSOR_LOG_CSV_ROW_FORMAT * len(rows)) % tuple(rows.ravel().tolist()))
+    return len(rows)
+
+
+class OptSensorLogWriter:
+    """
+    Writes the optical sensor stream readings to a binary sensor log
+
+    The log starts with OPT_SENSOR_LOG_MAGIC, OPT_SENSOR_LOG_PREAMBLE and a json header holding the emitter firmware
+    version and settings, followed by the readings as raw OPT_READING_DTYPE records so OptSensorLogReader can memory
+    map them. Readings are copied as raw bytes into preallocated buffers by the serial reader thread and written a
+    chunk of OPT_SENSOR_LOG_CHUNK_READINGS readings at a time, +o packets are unpacked into records with array
+    operations per chunk. A log that wasn't closed is still readable, it just has no reading count in its header.
+    """
+
+    def __init__(
+        self,
+        path,
+        emitter_firmware_version=None,
+        settings=None,
+        chunk_readings=OPT_SENSOR_LOG_CHUNK_READINGS,
+    ):
+        self.path = path
+        self.readings_written = 0
+        self.__header = {
+            "dtype": OPT_READING_DTYPE.descr,
+            "emitter_firmware_version": emitter_firmware_version,
+            "settings": settings or {},
+            "started": datetime.datetime.now().isoformat(),
+            "readings": None,
+        }
+        self.__lock = threading.Lock()
+        self.__chunk_readings = chunk_readings
+        self.__packets = np.empty((chunk_readings, OPT_PACKET_SIZE), np.uint8)
+        self.__packet_bytes = memoryview(self.__packets).cast("B")
+        self.__packet_count = 0
+        self.__packet_readings = np.empty(chunk_readings, OPT_READING_DTYPE)
+        self.__packet_reading_bytes = memoryview(self.__packet_readings.view(np.uint8))
+        self.__readings = np.empty(chunk_readings, OPT_READING_DTYPE)
+        self.__reading_bytes = memoryview(self.__readings.view(np.uint8))
+        self.__reading_count = 0
+        self.__file = open(path, "wb")
+        self.__write_header()
+
+    def append_packet(self, packet):
+        "Adds the OPT_PACKET_SIZE bytes following '+o ' in a stream readings line"
+        with self.__lock:
+            if self.__file is None:
+                return
+            offset = self.__packet_count * OPT_PACKET_SIZE
+            self.__packet_bytes[offset : offset + OPT_PACKET_SIZE] = packet
+            self.__packet_count += 1
+            if self.__packet_count == self.__chunk_readings:
+                self.__flush_packets()
+
+    def append_readings(self, payload):
+        "Adds the OPT_READING_DTYPE readings in the payload of a binary readings frame"
+        payload = memoryview(payload)
+        with self.__lock:
+            if self.__file is None:
+                return
+            while len(payload) >= OPT_READING_DTYPE.itemsize:
+                readings = min(
+                    len(payload) // OPT_READING_DTYPE.itemsize,
+                    self.__chunk_readings - self.__reading_count,
+                )
+                offset = self.__reading_count * OPT_READING_DTYPE.itemsize
+                size = readings * OPT_READING_DTYPE.itemsize
+                self.__reading_bytes[offset : offset + size] = payload[:size]
+                payload = payload[size:]
+                self.__reading_count += readings
+                if self.__reading_count == self.__chunk_readings:
+                    self.__flush_readings()
+
+    def close(self, settings=None):
+        "Writes the buffered readings and the reading count, and the settings if they changed while recording"
+        with self.__lock:
+            if self.__file is None:
+                return
+            self.__flush_packets()
+            self.__flush_readings()
+            if settings is not None:
+                self.__header["settings"] = settings
+            self.__header["readings"] = self.readings_written
+            self.__file.seek(0)
+            self.__write_header()
+            self.__file.close()
+            self.__file = None
+
+    def __write_header(self):
+        header = json.dumps(self.__header).encode("utf-8")
+        if len(header) > OPT_SENSOR_LOG_HEADER_SIZE:
+            raise ValueError(
+                f"Sensor log header is {len(header)} bytes, only {OPT_SENSOR_LOG_HEADER_SIZE} are reserved"
+            )
+        self.__file.write(OPT_SENSOR_LOG_MAGIC)
+        self.__file.write(
+            OPT_SENSOR_LOG_PREAMBLE.pack(
+                OPT_SENSOR_LOG_FORMAT_VERSION, OPT_SENSOR_LOG_DATA_OFFSET
+            )
+        )
+        self.__file.write(header.ljust(OPT_SENSOR_LOG_HEADER_SIZE))
+
+    def __flush_packets(self):
+        if self.__packet_count:
+            unpack_opt_packets(
+                self.__packets[: self.__packet_count], self.__packet_readings
+            )
+            self.__file.write(
+                self.__packet_reading_bytes[
+                    : self.__packet_count * OPT_READING_DTYPE.itemsize
+                ]
+            )
+            self.readings_written += self.__packet_count
+            self.__packet_count = 0
+
+    def __flush_readings(self):
+        if self.__reading_count:
+            self.__file.write(
+                self.__reading_bytes[
+                    : self.__reading_count * OPT_READING_DTYPE.itemsize
+                ]
+            )
+            self.readings_written += self.__reading_count
+            self.__reading_count = 0
+
+
+class OptSensorLogReader:
+    """
+    Reads a binary sensor log written by OptSensorLogWriter
+
+    The readings are memory mapped rather than read so opening even an hour long log is instant, columns() decodes
+    the range of readings that is actually looked at.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(OPT_SENSOR_LOG_MAGIC)) != OPT_SENSOR_LOG_MAGIC:
+                raise ValueError(f"{path} is not an optical sensor log")
+            format_version, data_offset = OPT_SENSOR_LOG_PREAMBLE.unpack(
+                f.read(OPT_SENSOR_LOG_PREAMBLE.size)
+            )
+            if format_version > OPT_SENSOR_LOG_FORMAT_VERSION:
+                raise ValueError(
+                    f"{path} is sensor log format version {format_version}, only up to {OPT_SENSOR_LOG_FORMAT_VERSION} is supported"
+                )
+            self.header = json.loads(f.read(data_offset - f.tell()).decode("utf-8"))
+        dtype = np.dtype([tuple(field) for field in self.header["dtype"]])
+        # counted from the file size so a log that wasn't closed still reads up to its last whole reading
+        readings = (os.path.getsize(path) - data_offset) // dtype.itemsize
+        if readings > 0:
+            self.readings = np.memmap(path, dtype, "r", data_offset, (readings,))
+        else:
+            self.readings = np.empty(0, dtype)
+
+    def __len__(self):
+        return len(self.readings)
+
+    @property
+    def emitter_firmware_version(self):
+        return self.header["emitter_firmware_version"]
+
+    @property
+    def settings(self):
+        return self.header["settings"]
+
+    def columns(self, start=None, stop=None):
+        "Returns a dictionary of OPT_SENSOR_LOG_COLUMNS arrays for the readings from start to stop"
+        return decode_opt_readings(self.readings[start:stop])
+
+
+def export_opt_sensor_log(
+    path, output_path, chunk_readings=OPT_SENSOR_LOG_CHUNK_READINGS
+):
+    "Exports a binary sensor log to csv, or to parquet if output_path ends with .parquet which needs pandas and pyarrow"
+    reader = OptSensorLogReader(path)
+    if output_path.endswith(".parquet"):
+        import pandas  # only the parquet export needs it, the player itself doesn't depend on pandas
+
+        pandas.DataFrame(reader.columns()).to_parquet(output_path, index=False)
+        return
+    with open(output_path, "wt") as f:
+        f.write(",".join(OPT_SENSOR_LOG_COLUMNS) + "\n")
+        for start in range(0, len(reader), chunk_readings):
+            write_csv_rows(f, reader.columns(start, start + chunk_readings))
@@ -2,8 +2,6 @@
 
 # Open3DOLED is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit http://creativecommons.org/licenses/by-nc-sa/4.0/
 
-import json
-
 import gi
 
 gi.require_version("Gst", "1.0")
@@ -36,6 +34,15 @@ class GstSubtitle3DSink(GstBase.BaseSink):
         # IN_CAPS
     )
 
+    # emitted on the streaming thread for every subtitle buffer with its start, duration and text, connect it to push-subtitle on GstPageflipGLSink
+    __gsignals__ = {
+        "subtitle": (
+            GObject.SIGNAL_RUN_FIRST,
+            None,
+            (GObject.TYPE_UINT64, GObject.TYPE_UINT64, GObject.TYPE_STRING),
+        )
+    }
+
     __gproperties__ = {
         "fullscreen": (
             GObject.TYPE_BOOLEAN,
@@ -79,31 +86,16 @@ class GstSubtitle3DSink(GstBase.BaseSink):
             False,  # default
             GObject.ParamFlags.WRITABLE,
         ),
-        "latest_subtitle_data": (
-            GObject.TYPE_STRING,
-            "Latest Subtitle Data",
-            "Latest subtitle data as json object",
-            "",  # default
-            GObject.ParamFlags.READWRITE,
-        ),
     }
 
     def __init__(self):
         super(GstSubtitle3DSink, self).__init__()
-        self.__latest_subtitle_data = ""
 
     def do_get_property(self, prop: GObject.GParamSpec):
-        if prop.name == "latest-subtitle-data":
-            return self.__latest_subtitle_data
-        else:
-            raise AttributeError("unknown property %s" % prop.name)
+        raise AttributeError("unknown property %s" % prop.name)
 
     def do_set_property(self, prop: GObject.GParamSpec, value):
-        if prop.name == "latest-subtitle-data":
-            if value == "":
-                self.__latest_subtitle_data = value
-        else:
-            raise AttributeError("unknown property %s" % prop.name)
+        raise AttributeError("unknown property %s" % prop.name)
 
     def do_render(self, inbuffer: Gst.Buffer) -> Gst.FlowReturn:
         # https://gstreamer.freedesktop.org/documentation/gstreamer/gstbuffer.html?gi-language=python
@@ -112,12 +104,7 @@ class GstSubtitle3DSink(GstBase.BaseSink):
         )
         # Gst.info(f"start:{Gst.TIME_ARGS(inbuffer.pts)} duration:{Gst.TIME_ARGS(inbuffer.duration)} text={text}")
         # print(f"start:{Gst.TIME_ARGS(inbuffer.pts)} duration:{Gst.TIME_ARGS(inbuffer.duration)} text={text}")
-        subtitle_data = {
-            "start": inbuffer.pts,
-            "duration": inbuffer.duration,
-            "text": text,
-        }
-        self.__latest_subtitle_data = json.dumps(subtitle_data)
+        self.emit("subtitle", inbuffer.pts, inbuffer.duration, text)
 
         return Gst.FlowReturn.OK
 
@@ -39,7 +39,11 @@ import datetime
 # import sdl2.video
 import json
 import collections
+import functools
+import bisect
 import threading
+import queue
+import weakref
 import os
 import psutil
 import ctypes
@@ -53,14 +57,35 @@ gi.require_version("GstVideo", "1.0")
 
 from gi.repository import Gst, GObject, GLib, GstBase, GstVideo  # noqa:F401,F402
 
+try:
+    gi.require_version("GstGL", "1.0")
+    from gi.repository import GstGL
+except (ValueError, ImportError):
+    # without the gstreamer gl library only system memory frames are accepted
+    GstGL = None
+
 import gstreamer_utils  # @UnresolvedImport
+import pageflip_timing  # @UnresolvedImport
 
 # """
 
 import numpy as np
 import sys  # @UnusedImport
 
+# window renders to a pygame vsync window, egl and osmesa render offscreen into a framebuffer object with a simulated vsync clock
+RENDER_BACKEND_WINDOW = "window"
+RENDER_BACKEND_EGL = "egl"
+RENDER_BACKEND_OSMESA = "osmesa"
+RENDER_BACKEND_ENV_VAR = "PAGEFLIP_GL_RENDER_BACKEND"
+DEFAULT_RENDER_BACKEND = os.environ.get(RENDER_BACKEND_ENV_VAR, RENDER_BACKEND_WINDOW)
+DEFAULT_OFFSCREEN_REFRESH_RATE = "120"
+if DEFAULT_RENDER_BACKEND != RENDER_BACKEND_WINDOW:
+    # pyopengl picks its platform when it is first imported so offscreen backends have to be chosen before importing OpenGL.GL
+    os.environ.setdefault("PYOPENGL_PLATFORM", DEFAULT_RENDER_BACKEND)
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
 import OpenGL.GL as gl
+import OpenGL.GL.shaders as gl_shaders
 import contextlib
 
 with contextlib.redirect_stdout(None):
@@ -94,6 +119,38 @@ else:
         return wrapper
 
 
+# counts gl calls made per page flip and reports them through the gl-calls-per-flip property, off unless the env var is 1
+# because every gl call goes through a python wrapper while counting
+COUNT_GL_CALLS_ENV_VAR = "PAGEFLIP_GL_COUNT_CALLS"
+COUNT_GL_CALLS = os.environ.get(COUNT_GL_CALLS_ENV_VAR, "0") == "1"
+if COUNT_GL_CALLS:
+
+    class GLCallCounter:
+        "Stands in for the OpenGL.GL module counting every gl function called through it"
+
+        def __init__(self, gl_module):
+            self.__gl_module = gl_module
+            self.__counting_functions = dict()
+            self.call_count = 0
+
+        def __getattr__(self, name):
+            value = getattr(self.__gl_module, name)
+            # unsupported functions are falsy in pyopengl so they are returned as is to keep feature checks working
+            if not name.startswith("gl") or not callable(value) or not value:
+                return value
+            counting_function = self.__counting_functions.get(name)
+            if counting_function is None:
+
+                def counting_function(*args, **kwargs):
+                    self.call_count += 1
+                    return value(*args, **kwargs)
+
+                self.__counting_functions[name] = counting_function
+            return counting_function
+
+    gl = GLCallCounter(gl)
+
+
 overlay_timestamp_vertical_offset = 60  # this should be more than the height of the emitter box to avoid being blocked by it
 
 # defaults for 55inch LG OLED 1920x1080 120hz all in mm to be adjusted by pixel pitch factor for different display sizes
@@ -109,7 +166,7 @@ FORMATS = [
     #           for f in "RGBx,xRGB,BGRx,xBGR,RGBA,ARGB,BGRA,ABGR,RGB,BGR,RGB16,RGB15,GRAY8,GRAY16_LE,GRAY16_BE".split(',')]
     #           for f in "I420,RGBx,xRGB,BGRx,xBGR,RGBA,ARGB,BGRA,ABGR,RGB,BGR,RGB16,RGB15,GRAY8,GRAY16_LE,GRAY16_BE".split(',')]
     #           for f in "I420,YV12,YUY2,UYVY,AYUV,VUYA,RGBx,BGRx,xRGB,xBGR,RGBA,BGRA,ARGB,ABGR,RGB,BGR,Y41B,Y42B,YVYU,Y444,v210,v216,Y210,Y410,NV12,NV21,GRAY8,GRAY16_BE,GRAY16_LE,v308,RGB16,BGR16,RGB15,BGR15,UYVP,A420,RGB8P,YUV9,YVU9,IYU1,ARGB64,AYUV64,r210,I420_10BE,I420_10LE,I422_10BE,I422_10LE,Y444_10BE,Y444_10LE,GBR,GBR_10BE,GBR_10LE,NV16,NV24,NV12_64Z32,A420_10BE,A420_10LE,A422_10BE,A422_10LE,A444_10BE,A444_10LE,NV61,P010_10BE,P010_10LE,IYU2,VYUY,GBRA,GBRA_10BE,GBRA_10LE,BGR10A2_LE,GBR_12BE,GBR_12LE,GBRA_12BE,GBRA_12LE,I420_12BE,I420_12LE,I422_12BE,I422_12LE,Y444_12BE,Y444_12LE,GRAY10_LE32,NV12_10LE32,NV16_10LE32,NV12_10LE40".split(',')]
-    for f in "RGBA".split(",")
+    for f in "NV12,I420,P010_10LE,RGBA".split(",")
 ]
 
 # Input caps
@@ -123,11 +180,267 @@ FORMATS = [
 # )
 
 # https://stackoverflow.com/questions/2380575/what-is-the-gstreamer-caps-syntax
-IN_CAPS = Gst.Caps(
-    f"video/x-raw,format=RGBA,width=[1, {GLib.MAXINT}],height=[1, {GLib.MAXINT}]"
+SYSTEM_MEMORY_IN_CAPS = Gst.Caps(
+    f"video/x-raw,format={{ {', '.join(FORMATS)} }},width=[1, {GLib.MAXINT}],height=[1, {GLib.MAXINT}]"
     f";"
-    f"video/x-raw(memory:CUDAMemory),format=RGBA,width=[1, {GLib.MAXINT}],height=[1, {GLib.MAXINT}]"
+    f"video/x-raw(memory:CUDAMemory),format={{ {', '.join(FORMATS)} }},width=[1, {GLib.MAXINT}],height=[1, {GLib.MAXINT}]"
 )
+# frames from glupload or gl capable decoders (like nvh264dec which does the cuda gl interop itself) arrive as one texture per plane
+# in a gl context shared with the render thread so they are drawn without ever being copied through system memory
+if GstGL is not None:
+    IN_CAPS = Gst.Caps(
+        f"video/x-raw({gstreamer_utils.GL_MEMORY_CAPS_FEATURE}),format={{ {', '.join(FORMATS)} }},width=[1, {GLib.MAXINT}],height=[1, {GLib.MAXINT}],texture-target=2D"
+        f";"
+        f"{SYSTEM_MEMORY_IN_CAPS.to_string()}"
+    )
+else:
+    IN_CAPS = SYSTEM_MEMORY_IN_CAPS
+GL_MEMORY_CONTEXT_TIMEOUT = 5  # seconds a gl context query waits for the window to start and wrap its context
+
+# per plane (horizontal subsampling, vertical subsampling, bytes per texel, internal format, format, type) used to upload each negotiated format
+# yuv planes are uploaded as is and converted to rgb in the video fragment shader
+VIDEO_FORMAT_PLANES = {
+    "RGBA": ((1, 1, 4, gl.GL_RGBA8, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE),),
+    "I420": (
+        (1, 1, 1, gl.GL_R8, gl.GL_RED, gl.GL_UNSIGNED_BYTE),
+        (2, 2, 1, gl.GL_R8, gl.GL_RED, gl.GL_UNSIGNED_BYTE),
+        (2, 2, 1, gl.GL_R8, gl.GL_RED, gl.GL_UNSIGNED_BYTE),
+    ),
+    "NV12": (
+        (1, 1, 1, gl.GL_R8, gl.GL_RED, gl.GL_UNSIGNED_BYTE),
+        (2, 2, 2, gl.GL_RG8, gl.GL_RG, gl.GL_UNSIGNED_BYTE),
+    ),
+    # 10 bit samples are stored in the high bits of each 16 bit word so normalized values are already in range
+    "P010_10LE": (
+        (1, 1, 2, gl.GL_R16, gl.GL_RED, gl.GL_UNSIGNED_SHORT),
+        (2, 2, 4, gl.GL_RG16, gl.GL_RG, gl.GL_UNSIGNED_SHORT),
+    ),
+}
+# bits per sample container of yuv formats, higher bit depths are stored msb aligned so reference levels only depend on the container
+VIDEO_FORMAT_CONTAINER_BITS = {"I420": 8, "NV12": 8, "P010_10LE": 16}
+
+# luma coefficients (Kr, Kb) for each supported colour matrix
+YUV_MATRIX_COEFFICIENTS = {
+    "bt601": (0.299, 0.114),
+    "bt709": (0.2126, 0.0722),
+    "bt2020": (0.2627, 0.0593),
+}
+
+# vertex attribute locations shared by all shader programs so vertex array objects can be used with any of them
+POSITION_ATTRIBUTE_LOCATION = 0
+COLOR_ATTRIBUTE_LOCATION = 1
+
+# the video is drawn as a unit square scaled to video_rect (in display pixels), eye_axis is the half of the texture each eye occupies
+# along the packing direction and eye (0 or 1) selects which half is shown on this page flip
+VIDEO_VERTEX_SHADER = """
+#version 120
+attribute vec2 position;
+uniform mat4 projection;
+uniform vec4 video_rect;
+uniform vec2 eye_axis;
+uniform float eye;
+varying vec2 texture_coord;
+void main() {
+    texture_coord = vec2(position.x, 1.0 - position.y) * (vec2(1.0) - eye_axis) + eye_axis * eye;
+    gl_Position = projection * vec4(video_rect.xy + position * video_rect.zw, 0.0, 1.0);
+}
+"""
+
+RGBA_FRAGMENT_SHADER = """
+#version 120
+uniform sampler2D texture_0;
+varying vec2 texture_coord;
+void main() {
+    gl_FragColor = texture2D(texture_0, texture_coord);
+}
+"""
+
+YUV_FRAGMENT_SHADER = """
+#version 120
+uniform sampler2D texture_0;
+uniform sampler2D texture_1;
+uniform sampler2D texture_2;
+uniform bool semi_planar;
+uniform mat3 yuv_to_rgb;
+uniform vec3 yuv_offset;
+uniform vec3 yuv_scale;
+varying vec2 texture_coord;
+void main() {
+    vec3 yuv;
+    yuv.x = texture2D(texture_0, texture_coord).r;
+    if (semi_planar) {
+        yuv.yz = texture2D(texture_1, texture_coord).rg;
+    } else {
+        yuv.y = texture2D(texture_1, texture_coord).r;
+        yuv.z = texture2D(texture_2, texture_coord).r;
+    }
+    vec3 rgb = yuv_to_rgb * ((yuv - yuv_offset) * yuv_scale);
+    gl_FragColor = vec4(clamp(rgb, 0.0, 1.0), 1.0);
+}
+"""
+
+OVERLAY_VERTEX_SHADER = """
+#version 120
+attribute vec2 position;
+attribute vec4 color;
+uniform mat4 projection;
+varying vec4 vertex_color;
+void main() {
+    vertex_color = color;
+    gl_Position = projection * vec4(position, 0.0, 1.0);
+}
+"""
+
+OVERLAY_FRAGMENT_SHADER = """
+#version 120
+varying vec4 vertex_color;
+void main() {
+    gl_FragColor = vertex_color;
+}
+"""
+
+# osd and subtitle text lines are drawn as a unit square scaled to text_rect (in display pixels) and textured with RGBA_FRAGMENT_SHADER
+TEXT_VERTEX_SHADER = """
+#version 120
+attribute vec2 position;
+uniform mat4 projection;
+uniform vec4 text_rect;
+varying vec2 texture_coord;
+void main() {
+    texture_coord = position;
+    gl_Position = projection * vec4(text_rect.xy + position * text_rect.zw, 0.0, 1.0);
+}
+"""
+TEXT_SHADOW_OFFSET = 1  # pixels the text shadow is offset diagonally in each direction
+
+DEFAULT_SUBTITLE_PRERENDER_SECONDS = "10"  # how far ahead of the play position subtitle cues are rendered in the background
+SUBTITLE_TEXTURE_CACHE_SIZE = 256  # subtitles kept in the least recently used text texture cache
+SUBTITLE_PRERENDER_INTERVAL = 0.5  # seconds between checks of the play position by the subtitle prerender thread
+SUBTITLE_PRERENDER_UPLOADS_PER_FLIP = 2  # prerendered text textures uploaded per flip so cues don't upload when they are first shown
+
+
+def compile_shader_program(vertex_shader_source, fragment_shader_source):
+    "Compiles and links a shader program with position and color bound to the shared attribute locations"
+    program = gl.glCreateProgram()
+    shaders = (
+        gl_shaders.compileShader(vertex_shader_source, gl.GL_VERTEX_SHADER),
+        gl_shaders.compileShader(fragment_shader_source, gl.GL_FRAGMENT_SHADER),
+    )
+    for shader in shaders:
+        gl.glAttachShader(program, shader)
+    gl.glBindAttribLocation(program, POSITION_ATTRIBUTE_LOCATION, "position")
+    gl.glBindAttribLocation(program, COLOR_ATTRIBUTE_LOCATION, "color")
+    gl.glLinkProgram(program)
+    for shader in shaders:
+        gl.glDetachShader(program, shader)
+        gl.glDeleteShader(shader)
+    if gl.glGetProgramiv(program, gl.GL_LINK_STATUS) != gl.GL_TRUE:
+        program_info_log = gl.glGetProgramInfoLog(program)
+        gl.glDeleteProgram(program)
+        raise RuntimeError(f"Shader program link failed {program_info_log}")
+    return program
+
+
+def orthographic_projection(width, height):
+    "Maps display pixel coordinates with the origin in the bottom left to clip space, same as glOrtho(0, width, 0, height, -1, 1)"
+    return np.array(
+        [
+            [2.0 / width, 0.0, 0.0, -1.0],
+            [0.0, 2.0 / height, 0.0, -1.0],
+            [0.0, 0.0, -1.0, 0.0],
+            [0.0, 0.0, 0.0, 1.0],
+        ],
+        dtype=np.float32,
+    )
+
+
+def rgba_video_layout(width, height):
+    "Layout of a tightly packed RGBA frame, matching what gstreamer_utils.gst_caps_to_video_layout returns"
+    return {
+        "format": "RGBA",
+        "width": width,
+        "height": height,
+        "size": width * height * 4,
+        "offsets": [0],
+        "strides": [width * 4],
+        "yuv_matrix": None,
+        "full_range": True,
+        "gl_memory": False,
+    }
+
+
+class ImageTexture:
+    "RGBA pixels (bottom row first) uploaded to a texture the first time it is drawn so it can be created on any thread"
+
+    def __init__(self, rendered_data, width, height, released_textures):
+        self.rendered_data = rendered_data
+        self.width = width
+        self.height = height
+        self.texture = None
+        self.__released_textures = released_textures
+
+    def texture_size(self):
+        return self.width, self.height
+
+    def bind(self):
+        if self.texture is not None:
+            gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+            return
+        self.texture = gl.glGenTextures(1)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+        texture_width, texture_height = self.texture_size()
+        gl.glTexImage2D(
+            gl.GL_TEXTURE_2D,
+            0,
+            gl.GL_RGBA8,
+            texture_width,
+            texture_height,
+            0,
+            gl.GL_RGBA,
+            gl.GL_UNSIGNED_BYTE,
+            self.rendered_data,
+        )
+        self.rendered_data = None
+        # textures can only be deleted on the render thread so the name is queued for deletion once this is garbage collected
+        weakref.finalize(self, self.__released_textures.put, self.texture)
+
+
+class TextTexture(ImageTexture):
+    "A line of text rendered together with its shadow, width and height are the size of the text without the shadow border"
+
+    def texture_size(self):
+        return self.width + 2 * TEXT_SHADOW_OFFSET, self.height + 2 * TEXT_SHADOW_OFFSET
+
+
+def yuv_to_rgb_uniforms(video_layout):
+    "Colour matrix, offsets and scales the yuv fragment shader needs for a given layout"
+    k_r, k_b = YUV_MATRIX_COEFFICIENTS[video_layout["yuv_matrix"]]
+    k_g = 1.0 - k_r - k_b
+    yuv_to_rgb = np.array(
+        [
+            [1.0, 0.0, 2.0 * (1.0 - k_r)],
+            [1.0, -2.0 * k_b * (1.0 - k_b) / k_g, -2.0 * k_r * (1.0 - k_r) / k_g],
+            [1.0, 2.0 * (1.0 - k_b), 0.0],
+        ],
+        dtype=np.float32,
+    )
+    container_bits = VIDEO_FORMAT_CONTAINER_BITS[video_layout["format"]]
+    container_max = float((1 << container_bits) - 1)
+    depth_shift = container_bits - 8
+    chroma_offset = (128 << depth_shift) / container_max
+    if video_layout["full_range"]:
+        yuv_offset = (0.0, chroma_offset, chroma_offset)
+        yuv_scale = (1.0, 1.0, 1.0)
+    else:
+        luma_scale = container_max / (219 << depth_shift)
+        chroma_scale = container_max / (224 << depth_shift)
+        yuv_offset = ((16 << depth_shift) / container_max, chroma_offset, chroma_offset)
+        yuv_scale = (luma_scale, chroma_scale, chroma_scale)
+    return yuv_to_rgb, yuv_offset, yuv_scale
 
 
 def clip(value, min_value, max_value):
@@ -135,6 +448,149 @@ def clip(value, min_value, max_value):
     return min(max(value, min_value), max_value)
 
 
+# overlay box vertex positions along one axis as (box size, gradient width) coefficients added to the box position
+_OB_0, _OB_G, _OB_Q, _OB_WG, _OB_WQ, _OB_W = (
+    (0, 0),
+    (0, 1),
+    (0, 0.25),
+    (1, -1),
+    (1, -0.25),
+    (1, 0),
+)
+# each quad starting at top left and go clockwise (unless otherwise noted), rows are (x, y) per vertex
+OVERLAY_BOX_MIDDLE_TEMPLATE = [
+    [_OB_G, _OB_G],
+    [_OB_WG, _OB_G],
+    [_OB_WG, _OB_WG],
+    [_OB_G, _OB_WG],
+]
+OVERLAY_BOX_GRADIENT_TEMPLATE = [
+    [[_OB_0, _OB_0], [_OB_G, _OB_0], [_OB_G, _OB_G], [_OB_0, _OB_G]],  # bottom left
+    [[_OB_G, _OB_0], [_OB_WG, _OB_0], [_OB_WG, _OB_G], [_OB_G, _OB_G]],  # bottom
+    # bottom right (starting in top right to get triangles to look better)
+    [[_OB_W, _OB_0], [_OB_W, _OB_G], [_OB_WG, _OB_G], [_OB_WG, _OB_0]],
+    [[_OB_WG, _OB_G], [_OB_W, _OB_G], [_OB_W, _OB_WG], [_OB_WG, _OB_WG]],  # right
+    [[_OB_WG, _OB_WG], [_OB_W, _OB_WG], [_OB_W, _OB_W], [_OB_WG, _OB_W]],  # top right
+    [[_OB_G, _OB_WG], [_OB_WG, _OB_WG], [_OB_WG, _OB_W], [_OB_G, _OB_W]],  # top
+    [[_OB_0, _OB_W], [_OB_0, _OB_WG], [_OB_G, _OB_WG], [_OB_G, _OB_W]],  # top left
+    # left (starting in top right to get triangles to look better)
+    [[_OB_0, _OB_G], [_OB_G, _OB_G], [_OB_G, _OB_WG], [_OB_0, _OB_WG]],
+]
+# the blackbox replaces its bottom corners with pointed ones where its gradient meets the screen edge
+OVERLAY_BOX_POINTED_BOTTOM_CORNERS = {
+    # bottom left (starting in top right to get pointed corner)
+    0: [[_OB_G, _OB_0], [_OB_G, _OB_G], [_OB_0, _OB_G], [_OB_Q, _OB_Q]],
+    # bottom right
+    2: [[_OB_WG, _OB_0], [_OB_WQ, _OB_Q], [_OB_W, _OB_G], [_OB_WG, _OB_G]],
+}
+# per vertex alpha of the quads above for the blackbox (with pointed bottom corners) and the white boxes
+OVERLAY_BOX_BLACK_ALPHA_TEMPLATE = (
+    (1, 1, 1, 1),  # middle
+    (0, 1, 0, 0),  # bottom left
+    (0, 0, 1, 1),  # bottom
+    (0, 0, 0, 1),  # bottom right
+    (1, 0, 0, 1),  # right
+    (1, 0, 0, 1),  # top right
+    (1, 1, 1, 1),  # top
+    (0, 0, 1, 1),  # top left
+    (0, 1, 1, 0),  # left
+)
+OVERLAY_BOX_WHITE_ALPHA_TEMPLATE = (
+    (1, 1, 1, 1),  # middle
+    (0, 0, 1, 0),  # bottom left
+    (0, 0, 1, 1),  # bottom
+    (0, 0, 1, 0),  # bottom right
+    (1, 0, 0, 1),  # right
+    (1, 0, 0, 0),  # top right
+    (1, 1, 0, 0),  # top
+    (0, 0, 1, 0),  # top left
+    (0, 1, 1, 0),  # left
+)
+OVERLAY_BOX_RETICULE_ALPHA_TEMPLATE = (
+    (1, 1, 1, 1),  # horizontal
+    (1, 1, 1, 1),  # vertical
+)
+OVERLAY_GEOMETRY_CACHE_SIZE = 256  # enough distinct calibration states to step back and forth through without rebuilding
+
+
+@functools.lru_cache(maxsize=None)
+def overlay_box_template(gradient, pointed_bottom_corners):
+    """
+    Homogeneous template of an overlay box quad list, each vertex row is (wx, wy, gx, gy, 1) coefficients
+    which multiplied by a box matrix give the vertex position relative to the box corner
+    """
+    quads = [OVERLAY_BOX_MIDDLE_TEMPLATE]
+    if gradient:
+        quads.extend(OVERLAY_BOX_GRADIENT_TEMPLATE)
+        if pointed_bottom_corners:
+            for quad_index, quad in OVERLAY_BOX_POINTED_BOTTOM_CORNERS.items():
+                quads[quad_index + 1] = quad
+    coefficients = np.array(quads, dtype=np.float64).reshape(-1, 2, 2)
+    template = np.ones((len(coefficients), 5), dtype=np.float64)
+    template[:, 0:2] = coefficients[:, :, 0]
+    template[:, 2:4] = coefficients[:, :, 1]
+    template.flags.writeable = False
+    return template
+
+
+def overlay_box_matrix(px, py, wx, wy, gradient_width):
+    "Maps template coefficients to pixel offsets of a box at (px, py) of size (wx, wy)"
+    return np.array(
+        [
+            [wx, 0, gradient_width, 0, px],
+            [0, wy, 0, gradient_width, py],
+            [0, 0, 0, 0, 1],
+        ],
+        dtype=np.float64,
+    )
+
+
+def overlay_corner_matrix(bpx, bpy, mpx, mpy):
+    "Moves box pixel offsets to the screen corner the boxes are anchored at, mirroring them for right and bottom corners"
+    return np.array(
+        [
+            [mpx, 0, bpx],
+            [0, mpy, bpy],
+            [0, 0, 1],
+        ],
+        dtype=np.float64,
+    )
+
+
+@functools.lru_cache(maxsize=OVERLAY_GEOMETRY_CACHE_SIZE)
+def overlay_box_vertices(boxes, corner):
+    """
+    Vertex buffer contents for a tuple of (px, py, wx, wy, gradient_width, pointed_bottom_corners) boxes
+    anchored with corner (bpx, bpy, mpx, mpy), cached so calibration changes only rebuild new geometry
+    """
+    corner_matrix = overlay_corner_matrix(*corner)
+    vertices = []
+    for px, py, wx, wy, gradient_width, pointed_bottom_corners in boxes:
+        transform = corner_matrix @ overlay_box_matrix(px, py, wx, wy, gradient_width)
+        template = overlay_box_template(gradient_width > 0, pointed_bottom_corners)
+        vertices.append(template @ transform[:2].T)
+    result = np.concatenate(vertices).astype(np.float32).ravel()
+    result.flags.writeable = False
+    return result
+
+
+@functools.lru_cache(maxsize=OVERLAY_GEOMETRY_CACHE_SIZE)
+def overlay_box_colors(alpha_template, brightness):
+    "Colour buffer contents with each template vertex either transparent or the given brightness"
+    alpha = np.array(alpha_template, dtype=np.float32).ravel()
+    if brightness is None:
+        # blackbox vertices are always black and only fade their alpha
+        result = np.zeros((len(alpha), 4), dtype=np.float32)
+        result[:, 3] = alpha
+    else:
+        result = np.outer(
+            alpha, np.array([brightness, brightness, brightness, 1], dtype=np.float32)
+        )
+    result = result.ravel()
+    result.flags.writeable = False
+    return result
+
+
 # """
 
 FRAME_PACKING_SIDE_BY_SIDE_HALF = "side-by-side-half"
@@ -142,6 +598,8 @@ FRAME_PACKING_SIDE_BY_SIDE_FULL = "side-by-side-full"
 FRAME_PACKING_OVER_AND_UNDER_HALF = "over-and-under-half"
 FRAME_PACKING_OVER_AND_UNDER_FULL = "over-and-under-full"
 
+TARGET_FRAMERATE_AUTO = "auto"  # target_framerate value that measures the display refresh rate and paces flips to it
+
 DISPLAY_DUPLICATE_FRAME_MODE_OFF = 0
 DISPLAY_DUPLICATE_FRAME_MODE_ON = 1
 DISPLAY_DUPLICATE_FRAME_MODE_ON_WITH_COUNTER = 2
@@ -149,9 +607,39 @@ DISPLAY_DUPLICATE_FRAME_MODE_ON_WITH_COUNTER = 2
 SYNC_SIGNAL_LEFT = 1
 SYNC_SIGNAL_RIGHT = 2
 
+# (eye_axis, eye shown on the left or bottom page) for each frame packing
+FRAME_PACKING_EYE_HALVES = {
+    FRAME_PACKING_SIDE_BY_SIDE_HALF: ((0.5, 0.0), 0),
+    FRAME_PACKING_SIDE_BY_SIDE_FULL: ((0.5, 0.0), 0),
+    FRAME_PACKING_OVER_AND_UNDER_HALF: ((0.0, 0.5), 0),
+    FRAME_PACKING_OVER_AND_UNDER_FULL: ((0.0, 0.5), 1),
+}
+
 WINDOW_NAME = "Open3DOLED3DPlayer"
 FINISH_BUFFER_COPY_EVENT_TIMEOUT = 1 / 30
 
+# bounded queue of frame slots between the streaming thread and the render thread, the slots are persistently mapped pixel buffer objects when the driver supports them
+DEFAULT_FRAME_QUEUE_DEPTH = 3
+FRAME_QUEUE_POLICY_DROP = "drop"  # when the queue is full the oldest queued frame is overwritten
+FRAME_QUEUE_POLICY_HOLD = "hold"  # when the queue is full the streaming thread waits until a slot is displayed
+FRAME_SLOT_FREE = 0
+FRAME_SLOT_WRITING = 1
+FRAME_SLOT_FILLED = 2
+FRAME_SLOT_UPLOADING = 3
+
+# requests from the player window to the parent app, delivered through the request-queue property and announced with the request-queued signal
+PlayerRequest = collections.namedtuple("PlayerRequest", ("action", "value"))
+REQUEST_CLOSE = "close"
+REQUEST_TOGGLE_PAUSED = "toggle_paused"
+REQUEST_TOGGLE_SENSOR_LOGGING = "toggle_sensor_logging"
+REQUEST_SEEK = "seek"  # value is the seek command, seek_percent_<0-9> or seek_<forward|backward>_<big|small>, or seek_release once the seek key goes up
+REQUEST_SET_MENU_ON_TOP = "set_menu_on_top"  # value is True to put the menu on top of the video
+REQUEST_CALIBRATION = "calibration"  # value is (target field, "increase" or "decrease" or "set", amount)
+REQUEST_SUBTITLE_OFFSET = "subtitle_offset"  # value is the new subtitle offset in seconds as a string
+
+DEFAULT_SUBTITLE_OFFSET = "0"
+SUBTITLE_OFFSET_STEP = 0.1  # seconds the subtitle offset hotkeys move subtitles, ten times this with shift held
+
 
 class PageflipGLWindow(threading.Thread):
     def __init__(self, gst_pageflip_gl_sink):
@@ -165,7 +653,40 @@ class PageflipGLWindow(threading.Thread):
         self.__finish_buffer_copy_event = threading.Event()
         self.__in_image_updated = False
         self.__in_image = None
+        self.__in_image_width = None
+        self.__in_image_height = None
         self.__in_image_play_timestamp = None
+        self.__video_planes = []
+        self.__video_layout = None
+        self.__in_image_video_layout = None
+        self.__video_programs = dict()
+        self.__video_program = None
+        self.__video_uniform_locations = dict()
+        self.__video_vertex_buffer = None
+        self.__video_vao = None
+        self.__overlay_program = None
+        self.__text_program = None
+        self.__text_rect_location = None
+        self.__released_text_textures = queue.SimpleQueue()
+        self.__gl_calls_per_flip = 0
+        self.__frame_queue_depth = DEFAULT_FRAME_QUEUE_DEPTH
+        self.__frame_queue_policy = FRAME_QUEUE_POLICY_DROP
+        self.__frame_queue_flushing = False
+        self.__use_frame_queue = False
+        self.__frame_slots = []
+        self.__frame_slots_condition = threading.Condition()
+        self.__frame_sequence = 0
+        self.__frame_queue_video_layout = None
+        self.__enable_gl_memory = False
+        self.__gl_memory_display = None
+        self.__gl_memory_context = None
+        self.__gl_memory_context_ready = threading.Event()
+        self.__gl_memory_frames = (
+            collections.deque()
+        )  # frames waiting to be displayed, guarded by __frame_slots_condition like the frame slots
+        self.__gl_memory_frame = None  # frame whose textures are bound, holding its buffer keeps the textures alive
+        # fences of frames dropped by other threads, deleted on the render thread
+        self.__released_gl_memory_fences = []
         self.__keys_pressed = dict()
         self.__restore_to_window_height = None
         self.__restore_to_window_width = None
@@ -224,7 +745,6 @@ class PageflipGLWindow(threading.Thread):
         self.__disable_mouse_detection_until = None
         self.__set_menu_on_top_true = True
         self.__set_video_on_top_true = False
-        self.__requests = ""
         self.__invalidate_overlay_boxes = False
         self.__overlay_box_black_vertex_buffer = None
         self.__overlay_box_black_color_buffer = None
@@ -233,10 +753,26 @@ class PageflipGLWindow(threading.Thread):
         self.__overlay_box_white_color_buffer = None
         self.__overlay_box_calibration_reticule_vertex_buffer = None
         self.__overlay_box_calibration_reticule_color_buffer = None
+        self.__overlay_buffer_contents = dict()
         self.__latest_subtitles = collections.deque()
-        self.__latest_subtitles_event = threading.Event()
-        self.__latest_subtitle_data = ""
-        self.__subtitle_surface_cache = dict()
+        self.__pending_subtitles = (
+            queue.SimpleQueue()
+        )  # (start, duration, text, special_type) pushed from any thread and picked up by the render thread before the next flip
+        # text textures keyed by (text, font, size, scale factor), filled by the render thread and the subtitle prerender thread
+        self.__subtitle_texture_cache = collections.OrderedDict()
+        self.__subtitle_texture_cache_lock = threading.Lock()
+        self.__subtitle_prerender_track = (
+            None,
+            [],
+        )  # sorted (start, end, text) cues and their start times, replaced together so the prerender thread sees a consistent pair
+        self.__subtitle_prerender_seconds = DEFAULT_SUBTITLE_PRERENDER_SECONDS
+        self.__subtitle_prerender_thread = None
+        self.__subtitle_prerender_wake = threading.Event()
+        self.__subtitle_prerender_running = False
+        self.__prerendered_text_textures = queue.SimpleQueue()
+        self.__subtitle_offset = DEFAULT_SUBTITLE_OFFSET
+        self.__subtitle_offset_ns = 0
+        self.__applied_subtitle_offset_ns = 0  # offset the cues in __latest_subtitles are shifted by, only changed on the render thread
         self.__display_duplicate_frame_mode = DISPLAY_DUPLICATE_FRAME_MODE_OFF
         self.__latest_overlay_timestamp = None
         self.__latest_overlay_timestamp_time_str = None
@@ -260,18 +796,35 @@ class PageflipGLWindow(threading.Thread):
         self.__show_calibration_instruction_image = (
             True  # this only applies if in calibration mode to begin with
         )
-        self.__calibration_instruction_image = self.__get_local_image_with_alpha(
-            "calibration_message.png"
-        )
+        self.__calibration_instruction_image = None  # loaded the first time it is shown
 
         self.__help_text = None
         self.__show_help_text = False
         self.__show_help_instruction_image = False
-        self.__help_instruction_image = self.__get_local_image_with_alpha(
-            "help_message.png"
+        self.__help_instruction_image = None  # loaded the first time it is shown
+        self.__render_backend = DEFAULT_RENDER_BACKEND
+        self.__offscreen_context = None
+        self.__offscreen_osmesa_buffer = None
+        self.__offscreen_framebuffer = None
+        self.__offscreen_renderbuffer = None
+        self.__offscreen_refresh_rate = DEFAULT_OFFSCREEN_REFRESH_RATE
+        self.__offscreen_vsync_period = 1.0 / float(DEFAULT_OFFSCREEN_REFRESH_RATE)
+        self.__offscreen_next_vsync = None
+        self.__whitebox_centers = []
+        self.__trigger_box_readback = dict()
+        self.__trigger_box_readback_flips = 0
+        self.__trigger_box_readback_mismatches = 0
+        self.__flip_telemetry = pageflip_timing.FlipTelemetry()
+        self.__draw_start = None
+        self.__flip_telemetry_dump = ""
+        self.__frame_pacer = pageflip_timing.FramePacer()
+        self.__refresh_rate_detector = pageflip_timing.RefreshRateDetector()
+        self.__refresh_rate_calibration_flips = str(
+            pageflip_timing.DEFAULT_REFRESH_RATE_CALIBRATION_FLIPS
         )
-        self.__debug_loop_times = dict()
-        self.__debug_loop_count = 0
+        self.__detected_refresh_rate = None
+        self.__missed_flip_detector = pageflip_timing.MissedFlipDetector()
+        self.__missed_flip_correction = True
 
         pg.init()
 
@@ -289,39 +842,43 @@ class PageflipGLWindow(threading.Thread):
         else:
             p.nice(10)
 
-        flags = pg_locals.DOUBLEBUF | pg_locals.OPENGL | pg_locals.RESIZABLE
-        if os.name == WINDOWS_OS_NAME:
-            pass
-            # flags |= pg_locals.NOFRAME # the frame isn't visible anyways and by excluding this we can force the graphics driver not to treat it like an overlay window unless we call toggle_fullscreen, it comes with a performance penality and lots of duplicate frames though.
-        else:
-            flags |= pg_locals.FULLSCREEN
         self.__pg_clock = pg.time.Clock()
-        self.__pg_window = pg.display.set_mode(
-            (self.__display_resolution_width, self.__display_resolution_height),
-            flags,
-            vsync=1,
-        )
+        if self.__render_backend != RENDER_BACKEND_WINDOW:
+            self.__start_offscreen()
+        else:
+            flags = pg_locals.DOUBLEBUF | pg_locals.OPENGL | pg_locals.RESIZABLE
+            if os.name == WINDOWS_OS_NAME:
+                pass
+                # flags |= pg_locals.NOFRAME # the frame isn't visible anyways and by excluding this we can force the graphics driver not to treat it like an overlay window unless we call toggle_fullscreen, it comes with a performance penality and lots of duplicate frames though.
+            else:
+                flags |= pg_locals.FULLSCREEN
+            self.__pg_window = pg.display.set_mode(
+                (self.__display_resolution_width, self.__display_resolution_height),
+                flags,
+                vsync=1,
+            )
+            self.__sdl2_window = pygame_sdl2.Window.from_display_module()
+            self.__sdl2_window.size = (
+                self.__display_resolution_width,
+                self.__display_resolution_height,
+            )
+            self.__sdl2_window.position = pygame_sdl2.WINDOWPOS_CENTERED
 
         self.__fullscreen = True
-        self.__sdl2_window = pygame_sdl2.Window.from_display_module()
-        self.__sdl2_window.size = (
-            self.__display_resolution_width,
-            self.__display_resolution_height,
-        )
-        self.__sdl2_window.position = pygame_sdl2.WINDOWPOS_CENTERED
         # self.__sdl2_window.set_fullscreen(desktop=False) # desktop False change full screen resolution to window size, desktop True use desktop resolution
         # self.__sdl2_window.restore()  # this changes window from maximized state to normal window state
         # self.__sdl2_window.set_windowed()
         self.__do_fullscreen = None
 
-        # self.__prepare_pbos()
+        self.__prepare_shader_programs()
         self.__create_overlay_boxes()
         self.__update_window_scale_factor()
 
-        pg.display.set_caption(WINDOW_NAME)
-        pg.display.set_icon(
-            pg.image.load(os.path.join(os.path.dirname(__file__), "blank.ico"))
-        )
+        if self.__offscreen_context is None:
+            pg.display.set_caption(WINDOW_NAME)
+            pg.display.set_icon(
+                pg.image.load(os.path.join(os.path.dirname(__file__), "blank.ico"))
+            )
 
         gl.glTexEnvf(gl.GL_TEXTURE_ENV, gl.GL_TEXTURE_ENV_MODE, gl.GL_MODULATE)
         # gl.glEnable(gl.GL_DEPTH_TEST) # we are disabling this for now because the texture z depth and overlay elements aren't configured right yet.
@@ -329,15 +886,30 @@ class PageflipGLWindow(threading.Thread):
         gl.glEnable(gl.GL_COLOR_MATERIAL)
         gl.glColorMaterial(gl.GL_FRONT_AND_BACK, gl.GL_AMBIENT_AND_DIFFUSE)
         gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
-        gl.glEnable(gl.GL_TEXTURE_2D)
 
-        self.__prepare_video_texture()
+        if self.__in_image_video_layout is not None:
+            # without a frame yet the window was started early to share its gl context, planes are prepared by the first frame
+            self.__prepare_video_planes(self.__in_image_video_layout)
+            self.__prepare_frame_queue()
+        if self.__enable_gl_memory:
+            self.__create_gl_memory_context()
+        self.__gl_memory_context_ready.set()
         self.__reshape_window()
         self.__started = True
         self.__time_started = time.perf_counter()
+        self.__frame_pacer.reset()
+        self.__missed_flip_detector.reset()
 
         self.__update_overlay_boxes()
 
+        self.__subtitle_prerender_running = True
+        self.__subtitle_prerender_thread = threading.Thread(
+            target=self.__prerender_subtitles
+        )
+        self.__subtitle_prerender_thread.daemon = True
+        self.__subtitle_prerender_thread.name = "subtitle-prerender"
+        self.__subtitle_prerender_thread.start()
+
         temp_width, temp_height = self.__in_image_width, self.__in_image_height
         print(
             f"PageflipGLSink Started with display ({self.__display_resolution_width}x{self.__display_resolution_height}), source ({temp_width}x{temp_height})"
@@ -345,59 +917,747 @@ class PageflipGLWindow(threading.Thread):
 
     def __stop(self):
 
+        if self.__subtitle_prerender_thread is not None:
+            self.__subtitle_prerender_running = False
+            self.__subtitle_prerender_wake.set()
+            self.__subtitle_prerender_thread.join()
+            self.__subtitle_prerender_thread = None
+        # drop the instruction image textures so they are released with the text textures below
+        self.__calibration_instruction_image = None
+        self.__help_instruction_image = None
         if self.__started:
-            # self.__destroy_pbos()
+            self.__destroy_frame_queue()
+            self.__destroy_gl_memory_context()
             self.__destroy_overlay_boxes()
-            self.__destroy_video_texture()
+            self.__destroy_video_planes()
+            self.__destroy_shader_programs()
+        if self.__offscreen_context is not None:
+            self.__stop_offscreen()
 
         self.__pg_window = None
         self.__sdl2_window = None
 
         pg.quit()
 
-    def __prepare_video_texture(self):
-        self.__video_texture_id = gl.glGenTextures(1)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self.__video_texture_id)
-        gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
-        gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
+    def __start_offscreen(self):
+        # draws into a framebuffer object on an offscreen gl context so the render path can run without a display
+        width, height = (
+            self.__display_resolution_width,
+            self.__display_resolution_height,
+        )
+        if os.environ.get("PYOPENGL_PLATFORM") != self.__render_backend:
+            print(
+                f"PageflipGLSink {self.__render_backend} render backend requires {RENDER_BACKEND_ENV_VAR}={self.__render_backend} to be set before the plugin is loaded"
+            )
+        # the dummy sdl video driver still gives pygame the display surface it needs for font surface conversion and event polling
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        pg.display.quit()
+        pg.display.init()
+        self.__pg_window = pg.display.set_mode((width, height))
+
+        if self.__render_backend == RENDER_BACKEND_EGL:
+            from OpenGL import EGL
+
+            egl_display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+            egl_major, egl_minor = EGL.EGLint(), EGL.EGLint()
+            if not EGL.eglInitialize(
+                egl_display, ctypes.pointer(egl_major), ctypes.pointer(egl_minor)
+            ):
+                raise RuntimeError("PageflipGLSink eglInitialize failed")
+            config_attributes = [
+                EGL.EGL_SURFACE_TYPE,
+                EGL.EGL_PBUFFER_BIT,
+                EGL.EGL_RED_SIZE,
+                8,
+                EGL.EGL_GREEN_SIZE,
+                8,
+                EGL.EGL_BLUE_SIZE,
+                8,
+                EGL.EGL_ALPHA_SIZE,
+                8,
+                EGL.EGL_RENDERABLE_TYPE,
+                EGL.EGL_OPENGL_BIT,
+                EGL.EGL_NONE,
+            ]
+            egl_config = EGL.EGLConfig()
+            egl_config_count = EGL.EGLint()
+            EGL.eglChooseConfig(
+                egl_display,
+                (EGL.EGLint * len(config_attributes))(*config_attributes),
+                ctypes.pointer(egl_config),
+                1,
+                ctypes.pointer(egl_config_count),
+            )
+            if egl_config_count.value < 1:
+                raise RuntimeError("PageflipGLSink no suitable EGL config found")
+            surface_attributes = [EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE]
+            egl_surface = EGL.eglCreatePbufferSurface(
+                egl_display,
+                egl_config,
+                (EGL.EGLint * len(surface_attributes))(*surface_attributes),
+            )
+            EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+            egl_context = EGL.eglCreateContext(
+                egl_display, egl_config, EGL.EGL_NO_CONTEXT, None
+            )
+            if not EGL.eglMakeCurrent(egl_display, egl_surface, egl_surface, egl_context):
+                raise RuntimeError("PageflipGLSink eglMakeCurrent failed")
+            self.__offscreen_context = (egl_display, egl_surface, egl_context)
+        elif self.__render_backend == RENDER_BACKEND_OSMESA:
+            from OpenGL import osmesa
+
+            osmesa_context = osmesa.OSMesaCreateContextExt(
+                osmesa.OSMESA_RGBA, 24, 0, 0, None
+            )
+            self.__offscreen_osmesa_buffer = np.zeros((height, width, 4), np.uint8)
+            if not osmesa.OSMesaMakeCurrent(
+                osmesa_context,
+                self.__offscreen_osmesa_buffer,
+                gl.GL_UNSIGNED_BYTE,
+                width,
+                height,
+            ):
+                raise RuntimeError("PageflipGLSink OSMesaMakeCurrent failed")
+            self.__offscreen_context = (None, None, osmesa_context)
+        else:
+            raise ValueError(
+                f"PageflipGLSink unknown render backend {self.__render_backend}"
+            )
 
-    def __destroy_video_texture(self):
-        gl.glDeleteTextures([self.__video_texture_id])
-        self.__video_texture_id = None
+        self.__offscreen_renderbuffer = gl.glGenRenderbuffers(1)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self.__offscreen_renderbuffer)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_RGBA8, width, height)
+        self.__offscreen_framebuffer = gl.glGenFramebuffers(1)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.__offscreen_framebuffer)
+        gl.glFramebufferRenderbuffer(
+            gl.GL_FRAMEBUFFER,
+            gl.GL_COLOR_ATTACHMENT0,
+            gl.GL_RENDERBUFFER,
+            self.__offscreen_renderbuffer,
+        )
+        if (
+            gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+            != gl.GL_FRAMEBUFFER_COMPLETE
+        ):
+            raise RuntimeError("PageflipGLSink offscreen framebuffer is incomplete")
+        self.__offscreen_next_vsync = None
+        print(
+            f"PageflipGLSink rendering offscreen with {self.__render_backend} ({gl.glGetString(gl.GL_RENDERER)}) at a simulated {self.__offscreen_refresh_rate}hz"
+        )
 
-    def __prepare_pbos(self):
-        temp_width, temp_height = self.__in_image_width, self.__in_image_height
-        num_texels = temp_width * temp_height
-        data = np.zeros((num_texels, 4), np.uint8)
-        self.dest_pbo = gl.glGenBuffers(1)
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.dest_pbo)
-        gl.glBufferData(gl.GL_ARRAY_BUFFER, data, gl.GL_DYNAMIC_DRAW)
-        # gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
-
-    def __destroy_pbos(self):
-        for pbo in (self.dest_pbo,):
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, int(pbo))
-            gl.glDeleteBuffers(1, [pbo])
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
-        self.dest_pbo = None
+    def __stop_offscreen(self):
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+        gl.glDeleteFramebuffers(1, [self.__offscreen_framebuffer])
+        gl.glDeleteRenderbuffers(1, [self.__offscreen_renderbuffer])
+        self.__offscreen_framebuffer = None
+        self.__offscreen_renderbuffer = None
+        egl_display, egl_surface, offscreen_context = self.__offscreen_context
+        if egl_display is not None:
+            from OpenGL import EGL
+
+            EGL.eglMakeCurrent(
+                egl_display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT
+            )
+            EGL.eglDestroySurface(egl_display, egl_surface)
+            EGL.eglDestroyContext(egl_display, offscreen_context)
+            EGL.eglTerminate(egl_display)
+        else:
+            from OpenGL import osmesa
+
+            osmesa.OSMesaDestroyContext(offscreen_context)
+            self.__offscreen_osmesa_buffer = None
+        self.__offscreen_context = None
+
+    def __present(self):
+        if self.__offscreen_context is None:
+            pg.display.flip()
+            return
+        gl.glFinish()  # stands in for the buffer swap waiting on the gpu
+        if self.__offscreen_vsync_period is not None:
+            # simulated vsync, frames that finish late are presented immediately and the vsync phase restarts from them
+            now = time.perf_counter()
+            if (
+                self.__offscreen_next_vsync is None
+                or now > self.__offscreen_next_vsync + self.__offscreen_vsync_period
+            ):
+                self.__offscreen_next_vsync = now
+            elif now < self.__offscreen_next_vsync:
+                time.sleep(self.__offscreen_next_vsync - now)
+            self.__offscreen_next_vsync += self.__offscreen_vsync_period
+
+    def __read_back_trigger_boxes(self, overlay_box_white_vao):
+        # reads the centre pixel of both white trigger boxes to verify only the one for the current eye is lit
+        whitebox_levels = [
+            int(
+                np.frombuffer(
+                    gl.glReadPixels(
+                        int(whitebox_x),
+                        int(whitebox_y),
+                        1,
+                        1,
+                        gl.GL_RGBA,
+                        gl.GL_UNSIGNED_BYTE,
+                    ),
+                    np.uint8,
+                )[0]
+            )
+            for whitebox_x, whitebox_y in self.__whitebox_centers
+        ]
+        expected_whitebox = {
+            self.__overlay_box_white_left_vao: 0,
+            self.__overlay_box_white_right_vao: 1,
+        }.get(overlay_box_white_vao)
+        whitebox_lit = [whitebox_level >= 128 for whitebox_level in whitebox_levels]
+        if expected_whitebox is None:
+            readback_matches = not any(whitebox_lit)
+        else:
+            readback_matches = whitebox_lit[expected_whitebox] and not any(
+                whitebox_lit[:expected_whitebox] + whitebox_lit[expected_whitebox + 1 :]
+            )
+        self.__trigger_box_readback_flips += 1
+        if not readback_matches:
+            self.__trigger_box_readback_mismatches += 1
+        self.__trigger_box_readback = {
+            "eye": (
+                SYNC_SIGNAL_LEFT if self.__left_or_bottom_page else SYNC_SIGNAL_RIGHT
+            ),
+            "expected_whitebox": expected_whitebox,
+            "whitebox_levels": whitebox_levels,
+            "flips": self.__trigger_box_readback_flips,
+            "mismatches": self.__trigger_box_readback_mismatches,
+        }
+
+    def __prepare_video_planes(self, video_layout):
+        # one texture per plane, storage is only (re)allocated when the negotiated layout changes and every frame after that is a glTexSubImage2D into it
+        video_planes = []
+        for i, (
+            subsampling_x,
+            subsampling_y,
+            bytes_per_texel,
+            internal_format,
+            texel_format,
+            texel_type,
+        ) in enumerate(VIDEO_FORMAT_PLANES[video_layout["format"]]):
+            plane_width = -(-video_layout["width"] // subsampling_x)
+            plane_height = -(-video_layout["height"] // subsampling_y)
+            texture_id = gl.glGenTextures(1)
+            gl.glBindTexture(gl.GL_TEXTURE_2D, texture_id)
+            gl.glTexParameterf(
+                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR
+            )
+            gl.glTexParameterf(
+                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR
+            )
+            gl.glTexParameterf(
+                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE
+            )
+            gl.glTexParameterf(
+                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE
+            )
+            if gl.glTexStorage2D:
+                gl.glTexStorage2D(
+                    gl.GL_TEXTURE_2D, 1, internal_format, plane_width, plane_height
+                )
+            else:
+                gl.glTexImage2D(
+                    gl.GL_TEXTURE_2D,
+                    0,
+                    internal_format,
+                    plane_width,
+                    plane_height,
+                    0,
+                    texel_format,
+                    texel_type,
+                    None,
+                )
+            video_planes.append(
+                {
+                    "texture_id": texture_id,
+                    "width": plane_width,
+                    "height": plane_height,
+                    "format": texel_format,
+                    "type": texel_type,
+                    "offset": video_layout["offsets"][i],
+                    "row_length": video_layout["strides"][i] // bytes_per_texel,
+                }
+            )
+        self.__video_planes = video_planes
+        self.__video_layout = video_layout
+        self.__select_video_program(video_layout)
+        print(
+            f"PageflipGLSink video planes prepared for {video_layout['format']} ({video_layout['width']}x{video_layout['height']}) colour matrix {video_layout['yuv_matrix']}"
+        )
+
+    def __select_video_program(self, video_layout):
+        if video_layout["yuv_matrix"] is not None:
+            self.__video_program = self.__video_programs["yuv"]
+            yuv_to_rgb, yuv_offset, yuv_scale = yuv_to_rgb_uniforms(video_layout)
+            gl.glUseProgram(self.__video_program)
+            gl.glUniform1i(
+                gl.glGetUniformLocation(self.__video_program, "semi_planar"),
+                len(VIDEO_FORMAT_PLANES[video_layout["format"]]) == 2,
+            )
+            gl.glUniformMatrix3fv(
+                gl.glGetUniformLocation(self.__video_program, "yuv_to_rgb"),
+                1,
+                gl.GL_TRUE,
+                yuv_to_rgb,
+            )
+            gl.glUniform3f(
+                gl.glGetUniformLocation(self.__video_program, "yuv_offset"),
+                *yuv_offset,
+            )
+            gl.glUniform3f(
+                gl.glGetUniformLocation(self.__video_program, "yuv_scale"), *yuv_scale
+            )
+            gl.glUseProgram(0)
+        else:
+            self.__video_program = self.__video_programs["rgba"]
+
+    def __destroy_video_planes(self):
+        if self.__video_planes:
+            gl.glDeleteTextures(
+                [video_plane["texture_id"] for video_plane in self.__video_planes]
+            )
+        self.__video_planes = []
+        self.__video_layout = None
+
+    def __bind_video_planes(self):
+        if self.__gl_memory_frame is not None:
+            texture_ids = self.__gl_memory_frame["texture_ids"]
+        else:
+            texture_ids = [
+                video_plane["texture_id"] for video_plane in self.__video_planes
+            ]
+        for i, texture_id in enumerate(texture_ids):
+            gl.glActiveTexture(gl.GL_TEXTURE0 + i)
+            gl.glBindTexture(gl.GL_TEXTURE_2D, texture_id)
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+
+    def __upload_video_planes(self, source, source_is_pbo):
+        # source is either a bound pixel unpack buffer or host memory holding the whole frame at the negotiated plane offsets and strides
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        for i, video_plane in enumerate(self.__video_planes):
+            gl.glActiveTexture(gl.GL_TEXTURE0 + i)
+            gl.glBindTexture(gl.GL_TEXTURE_2D, video_plane["texture_id"])
+            gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, video_plane["row_length"])
+            gl.glTexSubImage2D(
+                gl.GL_TEXTURE_2D,
+                0,
+                0,
+                0,
+                video_plane["width"],
+                video_plane["height"],
+                video_plane["format"],
+                video_plane["type"],
+                (
+                    ctypes.c_void_p(video_plane["offset"])
+                    if source_is_pbo
+                    else source[video_plane["offset"] :]
+                ),
+            )
+        gl.glPixelStorei(gl.GL_UNPACK_ROW_LENGTH, 0)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+
+    def __prepare_frame_queue(self):
+        video_layout = self.__video_layout
+        buffer_size = video_layout["size"]
+        use_pbos = bool(gl.glBufferStorage and gl.glTexStorage2D and gl.glFenceSync)
+        if not use_pbos:
+            print(
+                "PageflipGLSink persistent mapped PBOs are not supported by this driver, queuing frames in host memory"
+            )
+        map_flags = (
+            gl.GL_MAP_WRITE_BIT | gl.GL_MAP_PERSISTENT_BIT | gl.GL_MAP_COHERENT_BIT
+        )
+        frame_slots = []
+        for _ in range(self.__frame_queue_depth):
+            if use_pbos:
+                pbo = gl.glGenBuffers(1)
+                gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, pbo)
+                gl.glBufferStorage(
+                    gl.GL_PIXEL_UNPACK_BUFFER, buffer_size, None, map_flags
+                )
+                pbo_pointer = gl.glMapBufferRange(
+                    gl.GL_PIXEL_UNPACK_BUFFER, 0, buffer_size, map_flags
+                )
+                # the mapping stays valid until __destroy_frame_queue so the streaming thread can copy straight into it
+                mapped = np.ctypeslib.as_array(
+                    ctypes.cast(
+                        pbo_pointer, ctypes.POINTER(ctypes.c_ubyte * buffer_size)
+                    ).contents
+                )
+            else:
+                pbo = None
+                mapped = np.empty(buffer_size, np.uint8)
+            frame_slots.append(
+                {
+                    "pbo": pbo,
+                    "mapped": mapped,
+                    "state": FRAME_SLOT_FREE,
+                    "fence": None,
+                    "sequence": 0,
+                    "play_timestamp": None,
+                    "running_time": None,
+                }
+            )
+        if use_pbos:
+            gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+        with self.__frame_slots_condition:
+            self.__frame_slots = frame_slots
+            self.__frame_queue_video_layout = video_layout
+            self.__use_frame_queue = True
+            self.__frame_slots_condition.notify_all()
+
+    def __destroy_frame_queue(self):
+        with self.__frame_slots_condition:
+            self.__use_frame_queue = False
+            # never unmap a buffer the streaming thread is still copying into, no timeout because a slot is only writing
+            # for the length of one frame copy that never waits on anything, however long a big frame takes to copy
+            self.__frame_slots_condition.wait_for(
+                lambda: all(
+                    frame_slot["state"] != FRAME_SLOT_WRITING
+                    for frame_slot in self.__frame_slots
+                )
+            )
+            frame_slots = self.__frame_slots
+            self.__frame_slots = []
+            self.__frame_queue_video_layout = None
+            self.__frame_slots_condition.notify_all()
+        for frame_slot in frame_slots:
+            if frame_slot["fence"] is not None:
+                gl.glDeleteSync(frame_slot["fence"])
+            if frame_slot["pbo"] is not None:
+                gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, frame_slot["pbo"])
+                gl.glUnmapBuffer(gl.GL_PIXEL_UNPACK_BUFFER)
+                gl.glDeleteBuffers(1, [frame_slot["pbo"]])
+                gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def __upload_due_frame(self):
+        # runs on the render thread, retires slots the gpu has finished reading and uploads the newest frame that is due for display
+        if self.__gst_pageflip_gl_sink is not None:
+            current_running_time = (
+                self.__gst_pageflip_gl_sink.get_current_display_running_time()
+            )
+        else:
+            current_running_time = None
+        upload_slot = None
+        with self.__frame_slots_condition:
+            for frame_slot in self.__frame_slots:
+                if frame_slot["state"] == FRAME_SLOT_UPLOADING and (
+                    frame_slot["fence"] is None
+                    or gl.glClientWaitSync(frame_slot["fence"], 0, 0)
+                    in (gl.GL_ALREADY_SIGNALED, gl.GL_CONDITION_SATISFIED)
+                ):
+                    if frame_slot["fence"] is not None:
+                        gl.glDeleteSync(frame_slot["fence"])
+                        frame_slot["fence"] = None
+                    frame_slot["state"] = FRAME_SLOT_FREE
+            for frame_slot in sorted(
+                (
+                    frame_slot
+                    for frame_slot in self.__frame_slots
+                    if frame_slot["state"] == FRAME_SLOT_FILLED
+                ),
+                key=lambda s: s["sequence"],
+            ):
+                if (
+                    current_running_time is not None
+                    and frame_slot["running_time"] is not None
+                    and frame_slot["running_time"] > current_running_time
+                ):
+                    break
+                if upload_slot is not None:
+                    # a later frame is already due so this one would never be seen
+                    upload_slot["state"] = FRAME_SLOT_FREE
+                upload_slot = frame_slot
+            if upload_slot is not None:
+                upload_slot["state"] = FRAME_SLOT_UPLOADING
+            self.__frame_slots_condition.notify_all()
+        if upload_slot is None:
+            return False
+        if upload_slot["pbo"] is not None:
+            gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, upload_slot["pbo"])
+            self.__upload_video_planes(None, True)
+            gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+            upload_slot["fence"] = gl.glFenceSync(
+                gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0
+            )
+        else:
+            # client memory is copied before glTexSubImage2D returns so the slot is freed on the next pass
+            self.__upload_video_planes(upload_slot["mapped"], False)
+        self.__gl_memory_frame = None
+        self.__in_image_play_timestamp = upload_slot["play_timestamp"]
+        return True
+
+    def __create_gl_memory_context(self):
+        # wraps the context pygame or the offscreen backend made current on this thread so upstream gl elements can create contexts sharing its textures
+        if GstGL is None:
+            print(
+                "PageflipGLSink the GstGL library is not installed, gl memory is disabled"
+            )
+            return
+        try:
+            if os.name == WINDOWS_OS_NAME:
+                gl_platform, gl_display_type = (
+                    GstGL.GLPlatform.WGL,
+                    GstGL.GLDisplayType.WIN32,
+                )
+            elif self.__render_backend == RENDER_BACKEND_EGL:
+                gl_platform, gl_display_type = (
+                    GstGL.GLPlatform.EGL,
+                    GstGL.GLDisplayType.EGL,
+                )
+            elif (
+                self.__render_backend == RENDER_BACKEND_WINDOW
+                and pg.display.get_driver() == "x11"
+            ):
+                gl_platform, gl_display_type = (
+                    GstGL.GLPlatform.GLX,
+                    GstGL.GLDisplayType.X11,
+                )
+            else:
+                raise RuntimeError(
+                    f"PageflipGLSink gl memory is not supported with the {self.__render_backend} render backend on {pg.display.get_driver()}"
+                )
+            gl_display = GstGL.GLDisplay.new_with_type(gl_display_type)
+            gl_api, _, _ = GstGL.GLContext.get_current_gl_api(gl_platform)
+            gl_context = GstGL.GLContext.new_wrapped(
+                gl_display,
+                GstGL.GLContext.get_current_gl_context(gl_platform),
+                gl_platform,
+                gl_api,
+            )
+            gl_context.activate(True)
+            gl_context.fill_info()
+        except Exception as e:
+            traceback.print_exc()
+            logging.error(e)
+            return
+        self.__gl_memory_display = gl_display
+        self.__gl_memory_context = gl_context
+        print(
+            f"PageflipGLSink gl memory context wrapped for {GstGL.gl_platform_to_string(gl_platform)} sharing"
+        )
+
+    def __destroy_gl_memory_context(self):
+        with self.__frame_slots_condition:
+            released_fences = self.__released_gl_memory_fences + [
+                gl_memory_frame["fence"] for gl_memory_frame in self.__gl_memory_frames
+            ]
+            self.__released_gl_memory_fences = []
+            self.__gl_memory_frames.clear()
+            gl_memory_context = self.__gl_memory_context
+            self.__gl_memory_context = None
+            self.__gl_memory_display = None
+            self.__gl_memory_context_ready.clear()
+            self.__frame_slots_condition.notify_all()
+        for fence in released_fences:
+            if fence is not None:
+                gl.glDeleteSync(fence)
+        self.__gl_memory_frame = None
+        if gl_memory_context is not None:
+            gl_memory_context.activate(False)
+
+    def __display_due_gl_memory_frame(self):
+        # runs on the render thread, binds the textures of the newest frame that is due for display in place of the video planes
+        if self.__gst_pageflip_gl_sink is not None:
+            current_running_time = (
+                self.__gst_pageflip_gl_sink.get_current_display_running_time()
+            )
+        else:
+            current_running_time = None
+        due_frame = None
+        with self.__frame_slots_condition:
+            released_fences = self.__released_gl_memory_fences
+            self.__released_gl_memory_fences = []
+            while self.__gl_memory_frames:
+                gl_memory_frame = self.__gl_memory_frames[0]
+                if (
+                    current_running_time is not None
+                    and gl_memory_frame["running_time"] is not None
+                    and gl_memory_frame["running_time"] > current_running_time
+                ):
+                    break
+                self.__gl_memory_frames.popleft()
+                if due_frame is not None:
+                    # a later frame is already due so this one would never be seen
+                    released_fences.append(due_frame["fence"])
+                due_frame = gl_memory_frame
+            self.__frame_slots_condition.notify_all()
+        for fence in released_fences:
+            if fence is not None:
+                gl.glDeleteSync(fence)
+        if due_frame is None:
+            return False
+        if due_frame["video_layout"] != self.__video_layout:
+            self.__destroy_frame_queue()
+            self.__destroy_video_planes()
+            self.__video_layout = due_frame["video_layout"]
+            self.__select_video_program(self.__video_layout)
+        if due_frame["fence"] is not None:
+            # the gpu waits for upstream to finish writing the textures, this thread doesn't block
+            gl.glWaitSync(due_frame["fence"], 0, gl.GL_TIMEOUT_IGNORED)
+            gl.glDeleteSync(due_frame["fence"])
+            due_frame["fence"] = None
+        self.__gl_memory_frame = due_frame
+        self.__in_image_play_timestamp = due_frame["play_timestamp"]
+        return True
+
+    def __queue_frame(self, play_timestamp, running_time, in_image, video_layout):
+        # runs on the streaming thread, returns False if the frame must go through the direct upload path instead
+        with self.__frame_slots_condition:
+            if (
+                not self.__use_frame_queue
+                or video_layout != self.__frame_queue_video_layout
+            ):
+                return False
+            if self.__frame_queue_policy == FRAME_QUEUE_POLICY_HOLD:
+                available_states = (FRAME_SLOT_FREE,)
+                wait_timeout = None
+            else:
+                # queued frames that haven't been uploaded yet can be overwritten, only slots the gpu is reading from are off limits
+                available_states = (FRAME_SLOT_FREE, FRAME_SLOT_FILLED)
+                wait_timeout = FINISH_BUFFER_COPY_EVENT_TIMEOUT
+            if not self.__frame_slots_condition.wait_for(
+                lambda: not self.__use_frame_queue
+                or self.__frame_queue_flushing
+                or any(
+                    frame_slot["state"] in available_states
+                    for frame_slot in self.__frame_slots
+                ),
+                timeout=wait_timeout,
+            ):
+                return True  # the gpu is behind so drop this frame
+            if not self.__use_frame_queue:
+                return False
+            if self.__frame_queue_flushing:
+                return True
+            frame_slot = min(
+                (
+                    frame_slot
+                    for frame_slot in self.__frame_slots
+                    if frame_slot["state"] in available_states
+                ),
+                key=lambda s: (s["state"] != FRAME_SLOT_FREE, s["sequence"]),
+            )
+            frame_slot["state"] = FRAME_SLOT_WRITING
+        mapped = frame_slot["mapped"]
+        mapped[:] = np.frombuffer(in_image, dtype=np.uint8, count=mapped.size)
+        with self.__frame_slots_condition:
+            self.__frame_sequence += 1
+            frame_slot["sequence"] = self.__frame_sequence
+            frame_slot["play_timestamp"] = play_timestamp
+            frame_slot["running_time"] = running_time
+            frame_slot["state"] = FRAME_SLOT_FILLED
+            self.__frame_slots_condition.notify_all()
+        return True
+
+    def __prepare_shader_programs(self):
+        for video_program_name, fragment_shader_source in (
+            ("rgba", RGBA_FRAGMENT_SHADER),
+            ("yuv", YUV_FRAGMENT_SHADER),
+        ):
+            video_program = compile_shader_program(
+                VIDEO_VERTEX_SHADER, fragment_shader_source
+            )
+            gl.glUseProgram(video_program)
+            # each plane is bound to the texture unit matching its index
+            for i in range(3):
+                texture_location = gl.glGetUniformLocation(
+                    video_program, f"texture_{i}"
+                )
+                if texture_location != -1:
+                    gl.glUniform1i(texture_location, i)
+            self.__video_programs[video_program_name] = video_program
+            self.__video_uniform_locations[video_program] = {
+                uniform_name: gl.glGetUniformLocation(video_program, uniform_name)
+                for uniform_name in ("projection", "video_rect", "eye_axis", "eye")
+            }
+        gl.glUseProgram(0)
+        self.__overlay_program = compile_shader_program(
+            OVERLAY_VERTEX_SHADER, OVERLAY_FRAGMENT_SHADER
+        )
+        self.__text_program = compile_shader_program(
+            TEXT_VERTEX_SHADER, RGBA_FRAGMENT_SHADER
+        )
+        gl.glUseProgram(self.__text_program)
+        gl.glUniform1i(gl.glGetUniformLocation(self.__text_program, "texture_0"), 0)
+        self.__text_rect_location = gl.glGetUniformLocation(
+            self.__text_program, "text_rect"
+        )
+        gl.glUseProgram(0)
+
+        self.__video_vertex_buffer = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.__video_vertex_buffer)
+        gl.glBufferData(
+            gl.GL_ARRAY_BUFFER,
+            np.array([0, 0, 1, 0, 0, 1, 1, 1], dtype="float32"),
+            gl.GL_STATIC_DRAW,
+        )
+        self.__video_vao = gl.glGenVertexArrays(1)
+        gl.glBindVertexArray(self.__video_vao)
+        gl.glEnableVertexAttribArray(POSITION_ATTRIBUTE_LOCATION)
+        gl.glVertexAttribPointer(
+            POSITION_ATTRIBUTE_LOCATION, 2, gl.GL_FLOAT, gl.GL_FALSE, 0, None
+        )
+        gl.glBindVertexArray(0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def __destroy_shader_programs(self):
+        gl.glDeleteVertexArrays(1, [self.__video_vao])
+        gl.glDeleteBuffers(1, [self.__video_vertex_buffer])
+        self.__video_vao = None
+        self.__video_vertex_buffer = None
+        for video_program in self.__video_programs.values():
+            gl.glDeleteProgram(video_program)
+        self.__video_programs = dict()
+        self.__video_uniform_locations = dict()
+        self.__video_program = None
+        gl.glDeleteProgram(self.__overlay_program)
+        self.__overlay_program = None
+        gl.glDeleteProgram(self.__text_program)
+        self.__text_program = None
+        self.__delete_released_text_textures()
+
+    def __delete_released_text_textures(self):
+        released_text_textures = []
+        while True:
+            try:
+                released_text_textures.append(
+                    self.__released_text_textures.get_nowait()
+                )
+            except queue.Empty:
+                break
+        if released_text_textures:
+            gl.glDeleteTextures(len(released_text_textures), released_text_textures)
 
     def __reshape_window(self):
         # https://stackoverflow.com/questions/24538310/the-difference-between-glortho-and-glviewport-in-opengl
         gl.glViewport(
             0, 0, self.__display_resolution_width, self.__display_resolution_height
         )
-        gl.glMatrixMode(gl.GL_PROJECTION)
-        gl.glLoadIdentity()
-        gl.glOrtho(
-            0,
-            self.__display_resolution_width,
-            0,
-            self.__display_resolution_height,
-            -1,
-            1,
+        projection = orthographic_projection(
+            self.__display_resolution_width, self.__display_resolution_height
         )
-        gl.glMatrixMode(gl.GL_MODELVIEW)
-        gl.glLoadIdentity()
+        for video_program in self.__video_programs.values():
+            gl.glUseProgram(video_program)
+            gl.glUniformMatrix4fv(
+                self.__video_uniform_locations[video_program]["projection"],
+                1,
+                gl.GL_TRUE,
+                projection,
+            )
+        for program in (self.__overlay_program, self.__text_program):
+            gl.glUseProgram(program)
+            gl.glUniformMatrix4fv(
+                gl.glGetUniformLocation(program, "projection"),
+                1,
+                gl.GL_TRUE,
+                projection,
+            )
+        gl.glUseProgram(0)
 
     def __create_overlay_boxes(self):
         self.__overlay_box_black_vertex_buffer = gl.glGenBuffers(1)
@@ -407,8 +1667,52 @@ class PageflipGLWindow(threading.Thread):
         self.__overlay_box_black_color_buffer = gl.glGenBuffers(1)
         self.__overlay_box_white_color_buffer = gl.glGenBuffers(1)
         self.__overlay_box_calibration_reticule_color_buffer = gl.glGenBuffers(1)
+        self.__overlay_buffer_contents = dict()
+        # the buffers are refilled in place by __update_overlay_boxes so each vertex array object only needs its attributes set up once
+        self.__overlay_box_black_vao = self.__create_overlay_vao(
+            self.__overlay_box_black_vertex_buffer,
+            self.__overlay_box_black_color_buffer,
+        )
+        self.__overlay_box_white_left_vao = self.__create_overlay_vao(
+            self.__overlay_box_white_left_vertex_buffer,
+            self.__overlay_box_white_color_buffer,
+        )
+        self.__overlay_box_white_right_vao = self.__create_overlay_vao(
+            self.__overlay_box_white_right_vertex_buffer,
+            self.__overlay_box_white_color_buffer,
+        )
+        self.__overlay_box_calibration_reticule_vao = self.__create_overlay_vao(
+            self.__overlay_box_calibration_reticule_vertex_buffer,
+            self.__overlay_box_calibration_reticule_color_buffer,
+        )
+
+    def __create_overlay_vao(self, vertex_buffer, color_buffer):
+        vao = gl.glGenVertexArrays(1)
+        gl.glBindVertexArray(vao)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, vertex_buffer)
+        gl.glEnableVertexAttribArray(POSITION_ATTRIBUTE_LOCATION)
+        gl.glVertexAttribPointer(
+            POSITION_ATTRIBUTE_LOCATION, 2, gl.GL_FLOAT, gl.GL_FALSE, 0, None
+        )
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, color_buffer)
+        gl.glEnableVertexAttribArray(COLOR_ATTRIBUTE_LOCATION)
+        gl.glVertexAttribPointer(
+            COLOR_ATTRIBUTE_LOCATION, 4, gl.GL_FLOAT, gl.GL_FALSE, 0, None
+        )
+        gl.glBindVertexArray(0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        return vao
 
     def __destroy_overlay_boxes(self):
+        gl.glDeleteVertexArrays(
+            4,
+            [
+                self.__overlay_box_black_vao,
+                self.__overlay_box_white_left_vao,
+                self.__overlay_box_white_right_vao,
+                self.__overlay_box_calibration_reticule_vao,
+            ],
+        )
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.__overlay_box_black_vertex_buffer)
         gl.glDeleteBuffers(1, [self.__overlay_box_black_vertex_buffer])
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
@@ -493,56 +1797,45 @@ class PageflipGLWindow(threading.Thread):
         if "right" in self.__whitebox_corner_position:
             whitebox_horizontal_offsets.reverse()  # we reverse them here because we are going to flip the numpy ndarray later for right aligned boxes
 
+        whitebox_vertical_offset = (
+            blackbox_height
+            - whitebox_height
+            - int(self.__whitebox_vertical_position * self.__pixel_pitch_y)
+        )
+        # boxes are (px, py, wx, wy, gradient_width, pointed_bottom_corners) in pixels relative to the anchored corner
+        whitebox_boxes = [
+            (
+                whitebox_horizontal_offset,
+                whitebox_vertical_offset,
+                whitebox_width,
+                whitebox_height,
+                whitebox_gradient_width,
+                False,
+            )
+            for whitebox_horizontal_offset in whitebox_horizontal_offsets
+        ]
         buffers_to_build = [
             (
                 self.__overlay_box_black_vertex_buffer,
-                [
+                (
                     (
                         0,
                         0,
                         blackbox_width,
                         blackbox_height,
                         blackbox_gradient_width,
-                        ["blackbox_bottom_corners"],
-                    )
-                ],
-            ),
-            (
-                self.__overlay_box_white_left_vertex_buffer,
-                [
-                    (
-                        whitebox_horizontal_offsets[0],
-                        blackbox_height
-                        - whitebox_height
-                        - int(self.__whitebox_vertical_position * self.__pixel_pitch_y),
-                        whitebox_width,
-                        whitebox_height,
-                        whitebox_gradient_width,
-                        [],
-                    )
-                ],
-            ),
-            (
-                self.__overlay_box_white_right_vertex_buffer,
-                [
-                    (
-                        whitebox_horizontal_offsets[1],
-                        blackbox_height
-                        - whitebox_height
-                        - int(self.__whitebox_vertical_position * self.__pixel_pitch_y),
-                        whitebox_width,
-                        whitebox_height,
-                        whitebox_gradient_width,
-                        [],
-                    )
-                ],
+                        True,
+                    ),
+                ),
             ),
+            (self.__overlay_box_white_left_vertex_buffer, (whitebox_boxes[0],)),
+            (self.__overlay_box_white_right_vertex_buffer, (whitebox_boxes[1],)),
         ]
         if self.__calibration_mode:
             buffers_to_build.append(
                 (
                     self.__overlay_box_calibration_reticule_vertex_buffer,
-                    [
+                    (
                         (
                             original_blackbox_width,
                             blackbox_height
@@ -554,7 +1847,7 @@ class PageflipGLWindow(threading.Thread):
                             blackbox_width - original_blackbox_width,
                             3,
                             0,
-                            [],
+                            False,
                         ),  # horizontal
                         (
                             (
@@ -568,9 +1861,9 @@ class PageflipGLWindow(threading.Thread):
                             3,
                             blackbox_height - original_blackbox_height,
                             0,
-                            [],
+                            False,
                         ),  # vertical
-                    ],
+                    ),
                 )
             )
 
@@ -604,374 +1897,217 @@ class PageflipGLWindow(threading.Thread):
                 -1,
             )
 
+        # centres of the left and right white boxes in window coordinates used to read back trigger boxes when rendering offscreen
+        self.__whitebox_centers = [
+            (bpx + (px + wx / 2) * mpx, bpy + (py + wy / 2) * mpy)
+            for (px, py, wx, wy, _, _) in whitebox_boxes
+        ]
+
+        # geometry is cached by its parameters so stepping calibration values back and forth doesn't rebuild it
+        corner = (bpx, bpy, mpx, mpy)
         for buffer, boxes in buffers_to_build:
-            vb = []
-            for box_attributes in boxes:
-                (px, py, wx, wy, bgw, flags) = box_attributes
-                # each quad starting at top left and go clockwise (unless otherwise noted)
-                vb.extend(
-                    [
-                        bpx + (px + bgw) * mpx,
-                        bpy + (py + bgw) * mpy,
-                        bpx + (px + wx - bgw) * mpx,
-                        bpy + (py + bgw) * mpy,
-                        bpx + (px + wx - bgw) * mpx,
-                        bpy + (py + wy - bgw) * mpy,
-                        bpx + (px + bgw) * mpx,
-                        bpy + (py + wy - bgw) * mpy,
-                    ]
-                )  # middle
-                if bgw > 0:
-                    if "blackbox_bottom_corners" in flags:
-                        vb.extend(
-                            [
-                                bpx + (px + bgw) * mpx,
-                                bpy + (py) * mpy,
-                                bpx + (px + bgw) * mpx,
-                                bpy + (py + bgw) * mpy,
-                                bpx + (px) * mpx,
-                                bpy + (py + bgw) * mpy,
-                                bpx + (px + bgw * 0.25) * mpx,
-                                bpy + (py + bgw * 0.25) * mpy,
-                            ]
-                        )  # bottom left (starting in top right to get pointed corner)
-                    else:
-                        vb.extend(
-                            [
-                                bpx + (px) * mpx,
-                                bpy + (py) * mpy,
-                                bpx + (px + bgw) * mpx,
-                                bpy + (py) * mpy,
-                                bpx + (px + bgw) * mpx,
-                                bpy + (py + bgw) * mpy,
-                                bpx + (px) * mpx,
-                                bpy + (py + bgw) * mpy,
-                            ]
-                        )  # bottom left
-                    vb.extend(
-                        [
-                            bpx + (px + bgw) * mpx,
-                            bpy + (py) * mpy,
-                            bpx + (px + wx - bgw) * mpx,
-                            bpy + (py) * mpy,
-                            bpx + (px + wx - bgw) * mpx,
-                            bpy + (py + bgw) * mpy,
-                            bpx + (px + bgw) * mpx,
-                            bpy + (py + bgw) * mpy,
-                        ]
-                    )  # bottom
-                    if "blackbox_bottom_corners" in flags:
-                        vb.extend(
-                            [
-                                bpx + (px + wx - bgw) * mpx,
-                                bpy + (py) * mpy,
-                                bpx + (px + wx - bgw * 0.25) * mpx,
-                                bpy + (py + bgw * 0.25) * mpy,
-                                bpx + (px + wx) * mpx,
-                                bpy + (py + bgw) * mpy,
-                                bpx + (px + wx - bgw) * mpx,
-                                bpy + (py + bgw) * mpy,
-                            ]
-                        )  # bottom right
-                    else:
-                        vb.extend(
-                            [
-                                bpx + (px + wx) * mpx,
-                                bpy + (py) * mpy,
-                                bpx + (px + wx) * mpx,
-                                bpy + (py + bgw) * mpy,
-                                bpx + (px + wx - bgw) * mpx,
-                                bpy + (py + bgw) * mpy,
-                                bpx + (px + wx - bgw) * mpx,
-                                bpy + (py) * mpy,
-                            ]
-                        )  # bottom right (starting in top right to get triangles to look better)
-                    vb.extend(
-                        [
-                            bpx + (px + wx - bgw) * mpx,
-                            bpy + (py + bgw) * mpy,
-                            bpx + (px + wx) * mpx,
-                            bpy + (py + bgw) * mpy,
-                            bpx + (px + wx) * mpx,
-                            bpy + (py + wy - bgw) * mpy,
-                            bpx + (px + wx - bgw) * mpx,
-                            bpy + (py + wy - bgw) * mpy,
-                        ]
-                    )  # right
-                    vb.extend(
-                        [
-                            bpx + (px + wx - bgw) * mpx,
-                            bpy + (py + wy - bgw) * mpy,
-                            bpx + (px + wx) * mpx,
-                            bpy + (py + wy - bgw) * mpy,
-                            bpx + (px + wx) * mpx,
-                            bpy + (py + wy) * mpy,
-                            bpx + (px + wx - bgw) * mpx,
-                            bpy + (py + wy) * mpy,
-                        ]
-                    )  # top right
-                    vb.extend(
-                        [
-                            bpx + (px + bgw) * mpx,
-                            bpy + (py + wy - bgw) * mpy,
-                            bpx + (px + wx - bgw) * mpx,
-                            bpy + (py + wy - bgw) * mpy,
-                            bpx + (px + wx - bgw) * mpx,
-                            bpy + (py + wy) * mpy,
-                            bpx + (px + bgw) * mpx,
-                            bpy + (py + wy) * mpy,
-                        ]
-                    )  # top
-                    vb.extend(
-                        [
-                            bpx + (px) * mpx,
-                            bpy + (py + wy) * mpy,
-                            bpx + (px) * mpx,
-                            bpy + (py + wy - bgw) * mpy,
-                            bpx + (px + bgw) * mpx,
-                            bpy + (py + wy - bgw) * mpy,
-                            bpx + (px + bgw) * mpx,
-                            bpy + (py + wy) * mpy,
-                        ]
-                    )  # top left
-                    vb.extend(
-                        [
-                            bpx + (px) * mpx,
-                            bpy + (py + bgw) * mpy,
-                            bpx + (px + bgw) * mpx,
-                            bpy + (py + bgw) * mpy,
-                            bpx + (px + bgw) * mpx,
-                            bpy + (py + wy - bgw) * mpy,
-                            bpx + (px) * mpx,
-                            bpy + (py + wy - bgw) * mpy,
-                        ]
-                    )  # left (starting in top right to get triangles to look better)
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, buffer)
-            gl.glBufferData(
-                gl.GL_ARRAY_BUFFER,
-                np.array(
-                    vb,
-                    dtype="float32",
-                ),
-                gl.GL_STATIC_DRAW,
-            )
-            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+            self.__upload_overlay_buffer(buffer, overlay_box_vertices(boxes, corner))
 
-        c = 0
-        bb_cb = []
-        bb_cb.extend([c, c, c, 1, c, c, c, 1, c, c, c, 1, c, c, c, 1])  # middle
-        bb_cb.extend(
-            [
-                c,
-                c,
-                c,
-                0,
-                c,
-                c,
-                c,
-                1,
-                c,
-                c,
-                c,
-                0,
-                c,
-                c,
-                c,
-                0,
-            ]
-        )  # bottom left
-        bb_cb.extend([c, c, c, 0, c, c, c, 0, c, c, c, 1, c, c, c, 1])  # bottom
-        bb_cb.extend(
-            [
-                c,
-                c,
-                c,
-                0,
-                c,
-                c,
-                c,
-                0,
-                c,
-                c,
-                c,
-                0,
-                c,
-                c,
-                0,
-                1,
-            ]
-        )  # bottom right (starting in top right to get triangles to look better)
-        bb_cb.extend([c, c, c, 1, c, c, c, 0, c, c, c, 0, c, c, c, 1])  # right
-        bb_cb.extend(
-            [
-                c,
-                c,
-                c,
-                1,
-                c,
-                c,
-                c,
-                0,
-                c,
-                c,
-                c,
-                0,
-                c,
-                c,
-                c,
-                1,
-            ]
-        )  # top right
-        bb_cb.extend([c, c, c, 1, c, c, c, 1, c, c, c, 1, c, c, c, 1])  # top
-        bb_cb.extend(
-            [
-                c,
-                c,
-                c,
-                0,
-                c,
-                c,
-                c,
-                0,
-                c,
-                c,
-                c,
-                1,
-                c,
-                c,
-                c,
-                1,
-            ]
-        )  # top left (starting in top right to get triangles to look better)
-        bb_cb.extend([c, c, c, 0, c, c, c, 1, c, c, c, 1, c, c, c, 0])  # left
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.__overlay_box_black_color_buffer)
-        gl.glBufferData(
-            gl.GL_ARRAY_BUFFER,
-            np.array(
-                bb_cb,
-                dtype="float32",
-            ),
-            gl.GL_STATIC_DRAW,
-        )
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
         wbb = int(self.__whitebox_brightness)
-        wb_cb = []
-        wb_cb.extend(
-            [wbb, wbb, wbb, 1, wbb, wbb, wbb, 1, wbb, wbb, wbb, 1, wbb, wbb, wbb, 1]
-        )  # middle
-        wb_cb.extend(
-            [0, 0, 0, 0, 0, 0, 0, 0, wbb, wbb, wbb, 1, 0, 0, 0, 0]
-        )  # bottom left
-        wb_cb.extend(
-            [0, 0, 0, 0, 0, 0, 0, 0, wbb, wbb, wbb, 1, wbb, wbb, wbb, 1]
-        )  # bottom
-        wb_cb.extend(
-            [
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                wbb,
-                wbb,
-                wbb,
-                1,
-                0,
-                0,
-                0,
-                0,
-            ]
-        )  # bottom right
-        wb_cb.extend(
-            [wbb, wbb, wbb, 1, 0, 0, 0, 0, 0, 0, 0, 0, wbb, wbb, wbb, 1]
-        )  # right
-        wb_cb.extend(
-            [wbb, wbb, wbb, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-        )  # top right
-        wb_cb.extend(
-            [wbb, wbb, wbb, 1, wbb, wbb, wbb, 1, 0, 0, 0, 0, 0, 0, 0, 0]
-        )  # top
-        wb_cb.extend([0, 0, 0, 0, 0, 0, 0, 0, wbb, wbb, wbb, 1, 0, 0, 0, 0])  # top left
-        wb_cb.extend(
-            [0, 0, 0, 0, wbb, wbb, wbb, 1, wbb, wbb, wbb, 1, 0, 0, 0, 0]
-        )  # left
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.__overlay_box_white_color_buffer)
-        gl.glBufferData(
-            gl.GL_ARRAY_BUFFER,
-            np.array(
-                wb_cb,
-                dtype="float32",
-            ),
-            gl.GL_STATIC_DRAW,
+        self.__upload_overlay_buffer(
+            self.__overlay_box_black_color_buffer,
+            overlay_box_colors(OVERLAY_BOX_BLACK_ALPHA_TEMPLATE, None),
         )
-        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
-        cb_cb = []
-        cb_cb.extend(
-            [wbb, wbb, wbb, 1, wbb, wbb, wbb, 1, wbb, wbb, wbb, 1, wbb, wbb, wbb, 1]
-        )  # horizontal
-        cb_cb.extend(
-            [wbb, wbb, wbb, 1, wbb, wbb, wbb, 1, wbb, wbb, wbb, 1, wbb, wbb, wbb, 1]
-        )  # vertical
-        gl.glBindBuffer(
-            gl.GL_ARRAY_BUFFER, self.__overlay_box_calibration_reticule_color_buffer
+        self.__upload_overlay_buffer(
+            self.__overlay_box_white_color_buffer,
+            overlay_box_colors(OVERLAY_BOX_WHITE_ALPHA_TEMPLATE, wbb),
         )
-        gl.glBufferData(
-            gl.GL_ARRAY_BUFFER,
-            np.array(
-                cb_cb,
-                dtype="float32",
-            ),
-            gl.GL_STATIC_DRAW,
+        self.__upload_overlay_buffer(
+            self.__overlay_box_calibration_reticule_color_buffer,
+            overlay_box_colors(OVERLAY_BOX_RETICULE_ALPHA_TEMPLATE, wbb),
         )
+
+    def __upload_overlay_buffer(self, buffer, data):
+        # cached geometry is immutable so the same array object means the buffer already holds it
+        if self.__overlay_buffer_contents.get(buffer) is data:
+            return
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, buffer)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, data, gl.GL_STATIC_DRAW)
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        self.__overlay_buffer_contents[buffer] = data
 
-    def __generate_text_surface_with_shadow(self, font_set, text_line):
+    def __generate_text_texture_with_shadow(self, font_set, text_line):
         rendered_surface_temp = font_set.render(
             text_line, True, (170, 170, 170, 255)
         ).convert_alpha()
-        rendered_surface_shadow_temp = self.__subtitle_font_set.render(
+        rendered_surface_shadow_temp = font_set.render(
             text_line, True, (0, 0, 0, 255)
         ).convert_alpha()
-        return {
-            "rendered_surface": rendered_surface_temp,
-            "rendered_surface_shadow": rendered_surface_shadow_temp,
-            "rendered_data": pg.image.tostring(rendered_surface_temp, "RGBA", True),
-            "rendered_data_shadow": pg.image.tostring(
-                rendered_surface_shadow_temp, "RGBA", True
-            ),
-        }
+        width, height = rendered_surface_temp.get_size()
+        # the shadow is drawn under the text once at each diagonal offset so every line is a single textured quad when drawn
+        rendered_surface_combined = pg.Surface(
+            (width + 2 * TEXT_SHADOW_OFFSET, height + 2 * TEXT_SHADOW_OFFSET),
+            pg.SRCALPHA,
+        )
+        for shift_x in (0, 2 * TEXT_SHADOW_OFFSET):
+            for shift_y in (0, 2 * TEXT_SHADOW_OFFSET):
+                rendered_surface_combined.blit(
+                    rendered_surface_shadow_temp, (shift_x, shift_y)
+                )
+        rendered_surface_combined.blit(
+            rendered_surface_temp, (TEXT_SHADOW_OFFSET, TEXT_SHADOW_OFFSET)
+        )
+        return TextTexture(
+            pg.image.tostring(rendered_surface_combined, "RGBA", True),
+            width,
+            height,
+            self.__released_text_textures,
+        )
 
     def __update_subtitle_surface_and_data(self):
-        if self.__latest_subtitle_data:
+        if self.__latest_subtitles:
             for latest_subtitle in self.__latest_subtitles:
                 if "lines" not in latest_subtitle:
-                    cache_key = latest_subtitle.get("use_surface_cache_key", None)
-                    if (
-                        cache_key is not None
-                        and cache_key in self.__subtitle_surface_cache
-                    ):
-                        subtitle_lines = self.__subtitle_surface_cache[cache_key]
-                    else:
-                        subtitle_lines = []
-                        latest_subtitle_text_lines = latest_subtitle[
-                            "text"
-                        ].splitlines()
-                        for latest_subtitle_text_line in latest_subtitle_text_lines:
-                            subtitle_lines.append(
-                                self.__generate_text_surface_with_shadow(
-                                    self.__subtitle_font_set, latest_subtitle_text_line
-                                )
-                            )
-                        if cache_key is not None:
-                            self.__subtitle_surface_cache[cache_key] = subtitle_lines
-                    # TODO: these should be in a mutex to ensure we aren't trying to read these as they are changing
-                    latest_subtitle["lines"] = subtitle_lines
+                    latest_subtitle["lines"] = self.__get_subtitle_text_textures(
+                        latest_subtitle["text"]
+                    )
+
+    def __subtitle_texture_cache_key(self, text):
+        return (
+            text,
+            self.__subtitle_font,
+            self.__subtitle_size,
+            self.__window_size_scale_factor,
+        )
+
+    def __get_subtitle_text_textures(self, text):
+        cache_key = self.__subtitle_texture_cache_key(text)
+        with self.__subtitle_texture_cache_lock:
+            text_textures = self.__subtitle_texture_cache.get(cache_key)
+            if text_textures is not None:
+                self.__subtitle_texture_cache.move_to_end(cache_key)
+                return text_textures
+        text_textures = [
+            self.__generate_text_texture_with_shadow(self.__subtitle_font_set, line)
+            for line in text.splitlines()
+        ]
+        self.__cache_subtitle_text_textures(cache_key, text_textures)
+        return text_textures
+
+    def __cache_subtitle_text_textures(self, cache_key, text_textures):
+        with self.__subtitle_texture_cache_lock:
+            self.__subtitle_texture_cache[cache_key] = text_textures
+            self.__subtitle_texture_cache.move_to_end(cache_key)
+            # evicted textures are released by their finalizers once no visible subtitle uses them
+            while len(self.__subtitle_texture_cache) > SUBTITLE_TEXTURE_CACHE_SIZE:
+                self.__subtitle_texture_cache.popitem(last=False)
+
+    def __prerender_subtitles(self):
+        # runs on its own thread with its own font object because pygame fonts can't be used from two threads at once
+        prerender_font_key = None
+        prerender_font_set = None
+        while True:
+            self.__subtitle_prerender_wake.wait(SUBTITLE_PRERENDER_INTERVAL)
+            self.__subtitle_prerender_wake.clear()
+            if not self.__subtitle_prerender_running:
+                return
+            subtitle_prerender_cues, subtitle_prerender_starts = (
+                self.__subtitle_prerender_track
+            )
+            in_image_play_timestamp = self.__in_image_play_timestamp
+            if not subtitle_prerender_cues or in_image_play_timestamp is None:
+                # nothing to prerender until the first frame gives a play position
+                continue
+            try:
+                font_key = (
+                    self.__subtitle_font,
+                    self.__subtitle_size,
+                    self.__window_size_scale_factor,
+                )
+                if font_key != prerender_font_key:
+                    prerender_font_set = pg.font.SysFont(
+                        font_key[0], int(font_key[1] * font_key[2])
+                    )
+                    prerender_font_key = font_key
+                # cue times are unshifted so the play position is moved back by the subtitle offset instead
+                play_timestamp = in_image_play_timestamp - self.__subtitle_offset_ns
+                prerender_until = play_timestamp + int(
+                    float(self.__subtitle_prerender_seconds) * Gst.SECOND
+                )
+                # start one cue early so a cue that is already showing is cached too
+                for start, end, text in subtitle_prerender_cues[
+                    max(bisect.bisect_left(subtitle_prerender_starts, play_timestamp) - 1, 0) :
+                ]:
+                    if start > prerender_until or not self.__subtitle_prerender_running:
+                        break
+                    if end < play_timestamp:
+                        continue
+                    cache_key = (text, *font_key)
+                    with self.__subtitle_texture_cache_lock:
+                        if cache_key in self.__subtitle_texture_cache:
+                            continue
+                    text_textures = [
+                        self.__generate_text_texture_with_shadow(prerender_font_set, line)
+                        for line in text.splitlines()
+                    ]
+                    self.__cache_subtitle_text_textures(cache_key, text_textures)
+                    for text_texture in text_textures:
+                        self.__prerendered_text_textures.put(text_texture)
+            except Exception as e:
+                traceback.print_exc()
+                logging.error(e)
+
+    def __receive_pending_subtitles(self):
+        subtitle_offset_ns = self.__subtitle_offset_ns
+        if subtitle_offset_ns != self.__applied_subtitle_offset_ns:
+            # retimes the subtitles already received so a new offset applies to what is on screen right away
+            offset_change_ns = subtitle_offset_ns - self.__applied_subtitle_offset_ns
+            for subtitle in self.__latest_subtitles:
+                if subtitle["special_type"] is None:
+                    subtitle["start"] += offset_change_ns
+                    subtitle["end"] += offset_change_ns
+            self.__applied_subtitle_offset_ns = subtitle_offset_ns
+        received_subtitles = False
+        while True:
+            try:
+                start, duration, text, special_type = (
+                    self.__pending_subtitles.get_nowait()
+                )
+            except queue.Empty:
+                break
+            subtitle = {
+                "start": (
+                    self.__in_image_play_timestamp
+                    if start == Gst.CLOCK_TIME_NONE
+                    else (start + subtitle_offset_ns if not special_type else start)
+                ),
+                "duration": duration,
+                "text": text,
+                "special_type": special_type or None,
+            }
+            subtitle["end"] = subtitle["start"] + subtitle["duration"]
+            if special_type == "duplicate":
+                if self.__display_duplicate_frame_mode == DISPLAY_DUPLICATE_FRAME_MODE_OFF:
+                    continue
+                self.__latest_subtitles = collections.deque(
+                    filter(
+                        lambda d: not d["special_type"] == "duplicate",
+                        self.__latest_subtitles,
+                    )
+                )
+                if self.__display_duplicate_frame_mode == DISPLAY_DUPLICATE_FRAME_MODE_ON:
+                    subtitle["text"] = "\nduplicate frame"
+            if special_type == "setting":
+                self.__latest_subtitles = collections.deque(
+                    filter(
+                        lambda d: not d["special_type"] == "setting",
+                        self.__latest_subtitles,
+                    )
+                )
+            self.__latest_subtitles.append(subtitle)
+            while len(self.__latest_subtitles) > 5:
+                self.__latest_subtitles.popleft()
+            received_subtitles = True
+        if received_subtitles:
+            self.__update_subtitle_surface_and_data()
 
     def __update_osd_texts(self):
-        self.__help_text = self.__generate_text_surface_with_shadow(
+        self.__help_text = self.__generate_text_texture_with_shadow(
             self.__subtitle_font_set, "Press (h) for help"
         )
 
@@ -983,7 +2119,7 @@ class PageflipGLWindow(threading.Thread):
             int(self.__subtitle_size * self.__window_size_scale_factor),
         )
         self.__update_subtitle_surface_and_data()
-        self.__subtitle_surface_cache = dict()
+        self.__subtitle_prerender_wake.set()
 
     def __update_window_scale_factor(self):
         if self.fullscreen:
@@ -1020,16 +2156,7 @@ class PageflipGLWindow(threading.Thread):
                     else:
                         if self.__fullscreen:
                             self.__sdl2_window.focus()
-                    self.__requests = ",".join(
-                        self.__requests.split(",")
-                        + [
-                            (
-                                "set_menu_on_top_true"
-                                if set_menu_on_top_true
-                                else "set_menu_on_top_false"
-                            )
-                        ]
-                    )
+                    self.__post_request(REQUEST_SET_MENU_ON_TOP, set_menu_on_top_true)
 
                 set_video_on_top_true = (
                     True if time.time() - self.__last_mouse_moved_at > 2.05 else False
@@ -1078,7 +2205,7 @@ class PageflipGLWindow(threading.Thread):
                             self.__latest_overlay_timestamp_time_str = (
                                 new_overlay_timestamp_time_str
                             )
-                            self.__latest_overlay_timestamp = self.__generate_text_surface_with_shadow(
+                            self.__latest_overlay_timestamp = self.__generate_text_texture_with_shadow(
                                 self.__subtitle_font_set,
                                 (
                                     f"{self.__latest_overlay_timestamp_time_str} of {self.__video_duration_str}"
@@ -1100,7 +2227,7 @@ class PageflipGLWindow(threading.Thread):
                 self.__last_mouse_moved_at = time.time()
             for event in pg.event.get():
                 if event.type == pg.QUIT:
-                    self.__requests = ",".join(self.__requests.split(",") + ["close"])
+                    self.__post_request(REQUEST_CLOSE)
                 elif event.type == pg.VIDEORESIZE:
                     self.__actual_window_width, self.__actual_window_height = event.size
                     if not self.__fullscreen:
@@ -1121,6 +2248,12 @@ class PageflipGLWindow(threading.Thread):
                 elif event.type == pg.KEYUP:
                     # print(f"Keydown {event.key}")
                     del self.__keys_pressed[event.key]
+                    if (
+                        event.key in (pg.K_LEFT, pg.K_RIGHT)
+                        or pg.K_0 <= event.key <= pg.K_9
+                    ):
+                        # the player scrubs with fast seeks while the key is held and seeks accurately once it goes up
+                        self.__post_request(REQUEST_SEEK, "seek_release")
 
                 for key_pressed, key_details in self.__keys_pressed.items():
                     (
@@ -1134,20 +2267,41 @@ class PageflipGLWindow(threading.Thread):
                     # print(f"Keyheld {key_pressed}")
 
                     if key_pressed == pg.K_ESCAPE:
-                        self.__requests = ",".join(
-                            self.__requests.split(",") + ["close"]
-                        )
+                        self.__post_request(REQUEST_CLOSE)
                     elif key_pressed == pg.K_h:
                         self.__show_help_instruction_image = (
                             not self.__show_help_instruction_image
                         )
+                    elif (
+                        key_pressed == pg.K_LEFTBRACKET
+                        or key_pressed == pg.K_RIGHTBRACKET
+                    ):
+                        subtitle_offset_step = SUBTITLE_OFFSET_STEP * (
+                            10 if key_modifiers & pg.KMOD_SHIFT else 1
+                        )
+                        self.subtitle_offset = str(
+                            round(
+                                float(self.__subtitle_offset)
+                                + (
+                                    subtitle_offset_step
+                                    if key_pressed == pg.K_RIGHTBRACKET
+                                    else -subtitle_offset_step
+                                ),
+                                3,
+                            )
+                        )
+                        self.__post_request(
+                            REQUEST_SUBTITLE_OFFSET, self.__subtitle_offset
+                        )
+                        self.__add_new_osd_subtitle(
+                            f"subtitle_offset {self.__subtitle_offset}"
+                        )
+                        key_details[1] = time.time() + 0.2
                     elif key_pressed == pg.K_c:
                         self.calibration_mode = not self.calibration_mode
-                        self.__requests = ",".join(
-                            self.__requests.split(",")
-                            + [
-                                f"calibration-calibration_mode-set-{'true' if self.__calibration_mode else 'false'}"
-                            ]
+                        self.__post_request(
+                            REQUEST_CALIBRATION,
+                            ("calibration_mode", "set", self.__calibration_mode),
                         )
                     elif key_pressed == pg.K_v:
                         if (
@@ -1172,22 +2326,18 @@ class PageflipGLWindow(threading.Thread):
                                 DISPLAY_DUPLICATE_FRAME_MODE_OFF
                             )
                     elif key_pressed == pg.K_SPACE:
-                        self.__requests = ",".join(
-                            self.__requests.split(",") + ["toggle_paused"]
-                        )
+                        self.__post_request(REQUEST_TOGGLE_PAUSED)
                     elif key_pressed >= pg.K_0 and key_pressed <= pg.K_9:
-                        self.__requests = ",".join(
-                            self.__requests.split(",")
-                            + [f"seek_percent_{key_pressed - pg.K_0}"]
+                        self.__post_request(
+                            REQUEST_SEEK, f"seek_percent_{key_pressed - pg.K_0}"
                         )
                     elif key_pressed == pg.K_RIGHT or key_pressed == pg.K_LEFT:
                         seek_direction = (
                             "forward" if key_pressed == pg.K_RIGHT else "backward"
                         )
                         seek_size = "big" if key_modifiers & pg.KMOD_SHIFT else "small"
-                        self.__requests = ",".join(
-                            self.__requests.split(",")
-                            + [f"seek_{seek_direction}_{seek_size}"]
+                        self.__post_request(
+                            REQUEST_SEEK, f"seek_{seek_direction}_{seek_size}"
                         )
                     # The following 3 are used for testing and visualizing glasses resync speed after a dropped frame
                     elif key_pressed == pg.K_F1:
@@ -1197,9 +2347,7 @@ class PageflipGLWindow(threading.Thread):
                     elif key_pressed == pg.K_F3:
                         self.__skip_n_page_flips = 3
                     elif key_pressed == pg.K_F8 and self.__calibration_mode:
-                        self.__requests = ",".join(
-                            self.__requests.split(",") + [f"toggle_sensor_logging"]
-                        )
+                        self.__post_request(REQUEST_TOGGLE_SENSOR_LOGGING)
                     elif key_pressed == pg.K_F9:
                         if USE_LINE_PROFILER:
                             if not line_profiler_obj.global_enable:
@@ -1328,11 +2476,13 @@ class PageflipGLWindow(threading.Thread):
                             calibration_adjustment_amount = 200 if shift_down else 10
                             key_details[1] = time.time() + 0.1
                         if calibration_target_field:
-                            self.__requests = ",".join(
-                                self.__requests.split(",")
-                                + [
-                                    f"calibration-{calibration_target_field}-{calibration_decrease_or_increase}-{calibration_adjustment_amount}"
-                                ]
+                            self.__post_request(
+                                REQUEST_CALIBRATION,
+                                (
+                                    calibration_target_field,
+                                    calibration_decrease_or_increase,
+                                    calibration_adjustment_amount,
+                                ),
                             )
 
                     if USE_VIEWSONIC_XG2431_CALIBRATION:
@@ -1397,7 +2547,6 @@ class PageflipGLWindow(threading.Thread):
                         if subtitle_text is not None:
                             self.__add_new_osd_subtitle(subtitle_text)
 
-                    # print(f"Requests: {self.__requests}")
 
             # this hack is necessary because for some reason if we don't do this in this loop the fullscreen from the menu button doesn't actually change the video size only the window size
             if self.__do_fullscreen is not None:
@@ -1408,32 +2557,50 @@ class PageflipGLWindow(threading.Thread):
                 self.__update_overlay_boxes()
                 self.__invalidate_overlay_boxes = False
 
+            if (
+                self.__video_layout is None
+                and not self.__in_image_updated
+                and not self.__gl_memory_frames
+            ):
+                # started early to share the gl context and nothing has arrived to draw yet
+                time.sleep(0.001)
+                return
+
+            is_bfi_frame = False
+            if self.__frame_pacer.active:
+                # wait for the next slot before uploading so the newest due frame is the one drawn
+                self.__left_or_bottom_page, is_bfi_frame = (
+                    self.__frame_pacer.slot_eye_and_bfi(
+                        self.__frame_pacer.wait_for_next_slot()
+                    )
+                )
+            self.__draw_start = time.perf_counter()
+
             in_width, in_height = self.__in_image_width, self.__in_image_height
 
             gl.glClearColor(0, 0, 0, 1)
             gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
 
-            gl.glEnable(gl.GL_TEXTURE_2D)
-            gl.glColor3fv((1, 1, 1))
-            gl.glBindTexture(gl.GL_TEXTURE_2D, self.__video_texture_id)
-            gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
-            gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
-            # gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1) # may be necessary for non 32 bit aligned pixel formats https://stackoverflow.com/questions/66221801/glteximage2d-data-not-filled-as-expected
+            uploaded = False
+            if self.__use_frame_queue:
+                uploaded = self.__upload_due_frame()
+            if self.__gl_memory_context is not None:
+                uploaded = self.__display_due_gl_memory_frame() or uploaded
             if self.__in_image_updated:
+                # direct upload path used for the first frame and after caps changes
                 in_image_bytes = self.__in_image
-                gl.glTexImage2D(
-                    gl.GL_TEXTURE_2D,
-                    0,
-                    gl.GL_RGBA,  # https://www.khronos.org/opengl/wiki/Image_Format GL_ALPHA RL_RGBA
-                    in_width,
-                    in_height,
-                    0,
-                    gl.GL_RGBA,  # https://www.khronos.org/opengl/wiki/Image_Format GL_ALPHA RL_RGBA
-                    gl.GL_UNSIGNED_BYTE,
-                    in_image_bytes,
-                )
+                in_image_video_layout = self.__in_image_video_layout
+                if in_image_video_layout != self.__video_layout:
+                    self.__destroy_frame_queue()
+                    self.__destroy_video_planes()
+                    self.__prepare_video_planes(in_image_video_layout)
+                    self.__prepare_frame_queue()
+                self.__upload_video_planes(in_image_bytes, False)
+                self.__gl_memory_frame = None
                 self.__finish_buffer_copy_event.set()
                 self.__in_image_updated = False
+                uploaded = True
+            self.__bind_video_planes()
 
             if self.__frame_packing == FRAME_PACKING_SIDE_BY_SIDE_HALF:
                 in_single_width, in_single_height = in_width, in_height
@@ -1454,149 +2621,51 @@ class PageflipGLWindow(threading.Thread):
             else:  # side borders
                 video_scale_factor = self.__display_resolution_height / in_single_height
             video_scale_factor = video_scale_factor * self.__display_zoom_factor / 100
-            video_width = in_width * video_scale_factor
-            video_height = in_height * video_scale_factor
             video_single_width = in_single_width * video_scale_factor
             video_single_height = in_single_height * video_scale_factor
 
-            is_bfi_frame = False
-            if self.__target_frametime is not None:
-                time_delta = time.perf_counter() - self.__time_started
-                frame_type_modulus = (time_delta / self.__target_frametime) % 2
-                if frame_type_modulus <= 1.0:
-                    self.__left_or_bottom_page = True
-                else:
-                    self.__left_or_bottom_page = False
-
-                is_bfi_frame = False
-                if self.__add_n_bfi_frames_every_frame > 0:
-                    if frame_type_modulus % 1 >= (
-                        1.0 / (self.__add_n_bfi_frames_every_frame + 1)
-                    ):
-                        is_bfi_frame = True
-
             if is_bfi_frame:
-                pg.display.flip()
+                self.__flip(uploaded, True)
             else:
-                # https://community.khronos.org/t/gltexcoord2f-simple-questions/63784
-                if self.__frame_packing == FRAME_PACKING_SIDE_BY_SIDE_HALF:
-                    crop_pos_x = (
-                        self.__display_resolution_width - video_single_width
-                    ) / 2
-                    crop_pos_y = (
-                        self.__display_resolution_height - video_single_height
-                    ) / 2
-                    texture_pos_x = 0
-                    texture_pos_y = 0
-                    if self.__left_or_bottom_page:
-                        texture_coord_x_low = 0
-                        texture_coord_x_high = 0.5
-                    else:
-                        texture_coord_x_low = 0.5
-                        texture_coord_x_high = 1.0
-                    texture_coord_y_low = 0.0
-                    texture_coord_y_high = 1.0
-                elif self.__frame_packing == FRAME_PACKING_SIDE_BY_SIDE_FULL:
-                    crop_pos_x = (
-                        self.__display_resolution_width - video_single_width
-                    ) / 2
-                    crop_pos_y = (
-                        self.__display_resolution_height - video_single_height
-                    ) / 2
-                    if self.__left_or_bottom_page:
-                        texture_pos_x = 0
-                    else:
-                        texture_pos_x = video_width / 2
-                    texture_pos_y = 0
-                    texture_coord_x_low = 0.0
-                    texture_coord_x_high = 1.0
-                    texture_coord_y_low = 0.0
-                    texture_coord_y_high = 1.0
-                elif self.__frame_packing == FRAME_PACKING_OVER_AND_UNDER_HALF:
-                    crop_pos_x = (
-                        self.__display_resolution_width - video_single_width
-                    ) / 2
-                    crop_pos_y = (
-                        self.__display_resolution_height - video_single_height
-                    ) / 2
-                    texture_pos_x = 0
-                    texture_pos_y = 0
-                    texture_coord_x_low = 0.0
-                    texture_coord_x_high = 1.0
-                    if self.__left_or_bottom_page:
-                        texture_coord_y_low = 0.0
-                        texture_coord_y_high = 0.5
-                    else:
-                        texture_coord_y_low = 0.5
-                        texture_coord_y_high = 1.0
-                else:
-                    assert self.__frame_packing == FRAME_PACKING_OVER_AND_UNDER_FULL
-                    crop_pos_x = (
-                        self.__display_resolution_width - video_single_width
-                    ) / 2
-                    crop_pos_y = (
-                        self.__display_resolution_height - video_single_height
-                    ) / 2
-                    texture_pos_x = 0
-                    if self.__left_or_bottom_page:
-                        texture_pos_y = 0
-                    else:
-                        texture_pos_y = video_height / 2
-                    texture_coord_x_low = 0.0
-                    texture_coord_x_high = 1.0
-                    texture_coord_y_low = 0.0
-                    texture_coord_y_high = 1.0
-
-                # gl.glColor(0, 0, 0, 1)
-                gl.glPushMatrix()
-                gl.glTranslate(
-                    crop_pos_x - texture_pos_x,
-                    video_height + crop_pos_y - texture_pos_y,
-                    0,
-                )
-                gl.glPushMatrix()
-                gl.glBegin(gl.GL_QUADS)
-                gl.glTexCoord2f(texture_coord_x_low, texture_coord_y_high)
-                gl.glVertex(0, -video_height)
-                gl.glTexCoord2f(texture_coord_x_low, texture_coord_y_low)
-                gl.glVertex(0, 0)
-                gl.glTexCoord2f(texture_coord_x_high, texture_coord_y_low)
-                gl.glVertex(video_width, 0)
-                gl.glTexCoord2f(texture_coord_x_high, texture_coord_y_high)
-                gl.glVertex(video_width, -video_height)
-                gl.glEnd()
-
-                gl.glPopMatrix()
-                gl.glPopMatrix()
-
-                gl.glDisable(gl.GL_TEXTURE_2D)
-
-                # black bars around video resolution to pad to display resolution
-                gl.glColor3fv((0, 0, 0))
-                gl.glRectf(0, 0, crop_pos_x, self.__display_resolution_height)
-                gl.glColor3fv((0, 0, 0))
-                gl.glRectf(
-                    self.__display_resolution_width - crop_pos_x,
-                    0,
-                    self.__display_resolution_width,
-                    self.__display_resolution_height,
+                # only the half of the texture for the current eye is drawn so the black clear at the start of the frame provides the letterbox bars
+                crop_pos_x = (self.__display_resolution_width - video_single_width) / 2
+                crop_pos_y = (
+                    self.__display_resolution_height - video_single_height
+                ) / 2
+                eye_axis, left_or_bottom_page_eye = FRAME_PACKING_EYE_HALVES[
+                    self.__frame_packing
+                ]
+                video_uniform_locations = self.__video_uniform_locations[
+                    self.__video_program
+                ]
+                gl.glUseProgram(self.__video_program)
+                gl.glUniform4f(
+                    video_uniform_locations["video_rect"],
+                    crop_pos_x,
+                    crop_pos_y,
+                    video_single_width,
+                    video_single_height,
                 )
-                gl.glColor3fv((0, 0, 0))
-                gl.glRectf(0, 0, self.__display_resolution_width, crop_pos_y)
-                gl.glColor3fv((0, 0, 0))
-                gl.glRectf(
-                    0,
-                    self.__display_resolution_height - crop_pos_y,
-                    self.__display_resolution_width,
-                    self.__display_resolution_height,
+                gl.glUniform2f(video_uniform_locations["eye_axis"], *eye_axis)
+                gl.glUniform1f(
+                    video_uniform_locations["eye"],
+                    (
+                        left_or_bottom_page_eye
+                        if self.__left_or_bottom_page
+                        else 1 - left_or_bottom_page_eye
+                    ),
                 )
+                gl.glBindVertexArray(self.__video_vao)
+                gl.glDrawArrays(gl.GL_TRIANGLE_STRIP, 0, 4)
+                gl.glBindVertexArray(0)
+                gl.glUseProgram(0)
 
                 # add black and white boxes then subtitles
                 if (
                     self.__fullscreen_psuedo
                     and self.__disable_3d_on_mouse_move_under_windows
                 ):
-                    overlay_box_white_vertex_buffer = None
+                    overlay_box_white_vao = None
                     if self.__left_or_bottom_page:
                         subtitle_depth_shift = (
                             0 if self.__calibration_mode else self.__subtitle_depth
@@ -1609,16 +2678,16 @@ class PageflipGLWindow(threading.Thread):
                     if self.__right_eye in ("right", "top"):
                         if self.__left_or_bottom_page:
                             # whitebox_offset = whitebox_horizontal_offset_1
-                            overlay_box_white_vertex_buffer = (
-                                self.__overlay_box_white_left_vertex_buffer
+                            overlay_box_white_vao = (
+                                self.__overlay_box_white_left_vao
                             )
                             subtitle_depth_shift = (
                                 0 if self.__calibration_mode else self.__subtitle_depth
                             )
                         else:
                             # whitebox_offset = whitebox_horizontal_offset_2
-                            overlay_box_white_vertex_buffer = (
-                                self.__overlay_box_white_right_vertex_buffer
+                            overlay_box_white_vao = (
+                                self.__overlay_box_white_right_vao
                             )
                             subtitle_depth_shift = (
                                 0 if self.__calibration_mode else -self.__subtitle_depth
@@ -1627,72 +2696,47 @@ class PageflipGLWindow(threading.Thread):
                         assert self.__right_eye in ("left", "bottom")
                         if self.__left_or_bottom_page:
                             # whitebox_offset = whitebox_horizontal_offset_2
-                            overlay_box_white_vertex_buffer = (
-                                self.__overlay_box_white_right_vertex_buffer
+                            overlay_box_white_vao = (
+                                self.__overlay_box_white_right_vao
                             )
                             subtitle_depth_shift = (
                                 0 if self.__calibration_mode else -self.__subtitle_depth
                             )
                         else:
                             # whitebox_offset = whitebox_horizontal_offset_1
-                            overlay_box_white_vertex_buffer = (
-                                self.__overlay_box_white_left_vertex_buffer
+                            overlay_box_white_vao = (
+                                self.__overlay_box_white_left_vao
                             )
                             subtitle_depth_shift = (
                                 0 if self.__calibration_mode else self.__subtitle_depth
                             )
 
+                self.__pg_clock.tick()  # just update the frame time for fps calculations and such
+
+                self.__delete_released_text_textures()
+                for _ in range(SUBTITLE_PRERENDER_UPLOADS_PER_FLIP):
+                    try:
+                        self.__prerendered_text_textures.get_nowait().bind()
+                    except queue.Empty:
+                        break
+                gl.glUseProgram(self.__text_program)
+                gl.glBindVertexArray(self.__video_vao)
+                gl.glActiveTexture(gl.GL_TEXTURE0)
                 if (
                     self.__calibration_mode
                     and self.__show_calibration_instruction_image
                 ):
-                    (
-                        calibration_instruction_image_height,
-                        calibration_instruction_image_width,
-                        _,
-                    ) = self.__calibration_instruction_image.shape
-                    gl.glWindowPos2d(
-                        (
-                            self.__actual_window_width
-                            - calibration_instruction_image_width
-                        )
-                        // 2,
-                        (
-                            self.__actual_window_height
-                            - calibration_instruction_image_height
+                    if self.__calibration_instruction_image is None:
+                        self.__calibration_instruction_image = (
+                            self.__get_local_image_texture("calibration_message.png")
                         )
-                        // 2,
-                    )
-                    gl.glDrawPixels(
-                        calibration_instruction_image_width,
-                        calibration_instruction_image_height,
-                        gl.GL_RGBA,
-                        gl.GL_UNSIGNED_BYTE,
-                        self.__calibration_instruction_image,
-                    )
-
+                    self.__draw_centered_image(self.__calibration_instruction_image)
                 if self.__show_help_instruction_image:
-                    (
-                        help_instruction_image_height,
-                        help_instruction_image_width,
-                        _,
-                    ) = self.__help_instruction_image.shape
-                    gl.glWindowPos2d(
-                        (self.__actual_window_width - help_instruction_image_width)
-                        // 2,
-                        (self.__actual_window_height - help_instruction_image_height)
-                        // 2,
-                    )
-                    gl.glDrawPixels(
-                        help_instruction_image_width,
-                        help_instruction_image_height,
-                        gl.GL_RGBA,
-                        gl.GL_UNSIGNED_BYTE,
-                        self.__help_instruction_image,
-                    )
-
-                self.__pg_clock.tick()  # just update the frame time for fps calculations and such
-
+                    if self.__help_instruction_image is None:
+                        self.__help_instruction_image = self.__get_local_image_texture(
+                            "help_message.png"
+                        )
+                    self.__draw_centered_image(self.__help_instruction_image)
                 if self.__subtitle_font_set:
                     if self.__show_help_text:
                         self.__draw_centered_osd_text(
@@ -1701,7 +2745,7 @@ class PageflipGLWindow(threading.Thread):
                                 * self.__window_size_scale_factor
                             )
                             - overlay_timestamp_vertical_offset
-                            - 2 * self.__help_text["rendered_surface"].get_height(),
+                            - 2 * self.__help_text.height,
                             self.__help_text,
                             0,
                         )
@@ -1712,15 +2756,13 @@ class PageflipGLWindow(threading.Thread):
                                 * self.__window_size_scale_factor
                             )
                             - overlay_timestamp_vertical_offset
-                            - self.__latest_overlay_timestamp[
-                                "rendered_surface"
-                            ].get_height(),
+                            - self.__latest_overlay_timestamp.height,
                             self.__latest_overlay_timestamp,
                             0,
                         )
 
-                if self.__latest_subtitle_data:
-                    self.__latest_subtitles_event.clear()
+                self.__receive_pending_subtitles()
+                if self.__latest_subtitles:
                     for latest_subtitle in self.__latest_subtitles:
                         if (
                             latest_subtitle["start"] <= self.__in_image_play_timestamp
@@ -1736,52 +2778,32 @@ class PageflipGLWindow(threading.Thread):
                                     latest_subtitle_line,
                                     subtitle_depth_shift,
                                 )
-                                current_vertical_position += latest_subtitle_line[
-                                    "rendered_surface"
-                                ].get_height()
-                    self.__latest_subtitles_event.set()
+                                current_vertical_position += (
+                                    latest_subtitle_line.height
+                                )
+                gl.glBindVertexArray(0)
+                gl.glUseProgram(0)
 
                 # trigger boxes
-                gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
-                gl.glEnableClientState(gl.GL_COLOR_ARRAY)
-                gl.glBindBuffer(
-                    gl.GL_ARRAY_BUFFER, self.__overlay_box_black_vertex_buffer
-                )
-                gl.glVertexPointer(2, gl.GL_FLOAT, 0, None)
-                gl.glBindBuffer(
-                    gl.GL_ARRAY_BUFFER, self.__overlay_box_black_color_buffer
-                )
-                gl.glColorPointer(4, gl.GL_FLOAT, 0, None)
+                gl.glUseProgram(self.__overlay_program)
+                gl.glBindVertexArray(self.__overlay_box_black_vao)
                 gl.glDrawArrays(gl.GL_QUADS, 0, 36)
-                if overlay_box_white_vertex_buffer is not None:
-                    gl.glBindBuffer(gl.GL_ARRAY_BUFFER, overlay_box_white_vertex_buffer)
-                    gl.glVertexPointer(2, gl.GL_FLOAT, 0, None)
-                    gl.glBindBuffer(
-                        gl.GL_ARRAY_BUFFER, self.__overlay_box_white_color_buffer
-                    )
-                    gl.glColorPointer(4, gl.GL_FLOAT, 0, None)
+                if overlay_box_white_vao is not None:
+                    gl.glBindVertexArray(overlay_box_white_vao)
                     gl.glDrawArrays(gl.GL_QUADS, 0, 36)
                 if self.__calibration_mode:
-                    gl.glBindBuffer(
-                        gl.GL_ARRAY_BUFFER,
-                        self.__overlay_box_calibration_reticule_vertex_buffer,
-                    )
-                    gl.glVertexPointer(2, gl.GL_FLOAT, 0, None)
-                    gl.glBindBuffer(
-                        gl.GL_ARRAY_BUFFER,
-                        self.__overlay_box_calibration_reticule_color_buffer,
-                    )
-                    gl.glColorPointer(4, gl.GL_FLOAT, 0, None)
+                    gl.glBindVertexArray(self.__overlay_box_calibration_reticule_vao)
                     gl.glDrawArrays(gl.GL_QUADS, 0, 8)
-                gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+                gl.glBindVertexArray(0)
+                gl.glUseProgram(0)
 
-                # loop_time_millis = self.__pg_clock.get_time()
-                # loop_time = loop_time_millis / 1000
-                # if loop_time_millis not in self.__debug_loop_times:
-                #     self.__debug_loop_times[loop_time_millis] = 0
-                # self.__debug_loop_times[loop_time_millis] += 1
+                if self.__offscreen_context is not None:
+                    self.__read_back_trigger_boxes(overlay_box_white_vao)
 
-                pg.display.flip()
+                self.__flip(uploaded, False)
+                if COUNT_GL_CALLS:
+                    self.__gl_calls_per_flip = gl.call_count
+                    gl.call_count = 0
                 new_sync_value = (
                     SYNC_SIGNAL_LEFT
                     if self.__left_or_bottom_page
@@ -1802,51 +2824,131 @@ class PageflipGLWindow(threading.Thread):
             traceback.print_exc()
             logging.error(e)
 
-    def __get_local_image_with_alpha(self, filename):
+    def __get_local_image_texture(self, filename):
         local_image = pg.image.load(os.path.join(os.path.dirname(__file__), filename))
-        local_image_rgb = pg.surfarray.array3d(local_image)
-        local_image_alpha = pg.surfarray.array_alpha(local_image).reshape(
-            (*local_image_rgb.shape[0:2], 1)
+        width, height = local_image.get_size()
+        return ImageTexture(
+            pg.image.tostring(local_image, "RGBA", True),
+            width,
+            height,
+            self.__released_text_textures,
         )
-        local_image_rgba = np.concatenate((local_image_rgb, local_image_alpha), 2)
-        return np.flip(local_image_rgba.transpose((1, 0, 2)), 0)
 
     def __add_new_osd_subtitle(self, subtitle_text):
-        self.latest_subtitle_data = json.dumps(
-            {
-                "show_now": True,
-                "text": subtitle_text,
-                "duration": 1000000000,
-                "special_type": "setting",
-            }
-        )
+        self.push_subtitle(Gst.CLOCK_TIME_NONE, Gst.SECOND, subtitle_text, "setting")
+
+    def push_subtitle(self, start, duration, text, special_type):
+        # start of Gst.CLOCK_TIME_NONE shows the subtitle from the frame currently on screen
+        self.__pending_subtitles.put((start, duration, text, special_type))
 
-    def __draw_centered_osd_text(self, vertical_position, text_data, depth_shift):
+    def __draw_centered_osd_text(self, vertical_position, text_texture, depth_shift):
+        # expects the text program and the unit square vertex array to be bound
         current_horizontal_position = (
             (self.__display_resolution_width * self.__window_size_scale_factor)
-            - text_data["rendered_surface"].get_width()
+            - text_texture.width
         ) / 2 + depth_shift
-        # print(f'current_horizontal_position {current_horizontal_position} scale_factor {self.__window_size_scale_factor} sub_width {latest_subtitle["rendered_surface"][subtitle_line].get_width()}')
-        for shift_x in range(-1, 2, 2):
-            for shift_y in range(-1, 2, 2):
-                gl.glWindowPos2d(
-                    current_horizontal_position + shift_x,
-                    vertical_position + shift_y,
-                )
-                gl.glDrawPixels(
-                    text_data["rendered_surface_shadow"].get_width(),
-                    text_data["rendered_surface_shadow"].get_height(),
-                    gl.GL_RGBA,
-                    gl.GL_UNSIGNED_BYTE,
-                    text_data["rendered_data_shadow"],
-                )
-        gl.glWindowPos2d(current_horizontal_position, vertical_position)
-        gl.glDrawPixels(
-            text_data["rendered_surface"].get_width(),
-            text_data["rendered_surface"].get_height(),
-            gl.GL_RGBA,
-            gl.GL_UNSIGNED_BYTE,
-            text_data["rendered_data"],
+        text_texture.bind()
+        gl.glUniform4f(
+            self.__text_rect_location,
+            current_horizontal_position - TEXT_SHADOW_OFFSET,
+            vertical_position - TEXT_SHADOW_OFFSET,
+            text_texture.width + 2 * TEXT_SHADOW_OFFSET,
+            text_texture.height + 2 * TEXT_SHADOW_OFFSET,
+        )
+        gl.glDrawArrays(gl.GL_TRIANGLE_STRIP, 0, 4)
+
+    def __draw_centered_image(self, image_texture):
+        # expects the text program and the unit square vertex array to be bound
+        image_texture.bind()
+        gl.glUniform4f(
+            self.__text_rect_location,
+            (self.__actual_window_width - image_texture.width) // 2,
+            (self.__actual_window_height - image_texture.height) // 2,
+            image_texture.width,
+            image_texture.height,
+        )
+        gl.glDrawArrays(gl.GL_TRIANGLE_STRIP, 0, 4)
+
+    def __post_request(self, action, value=None):
+        self.__gst_pageflip_gl_sink.post_request(action, value)
+
+    def __flip(self, uploaded, is_bfi_frame):
+        flip_start = time.perf_counter()
+        self.__present()
+        flip_end = time.perf_counter()
+        self.__frame_pacer.flip_completed(flip_start, flip_end)
+        if self.__refresh_rate_detector.calibrating:
+            detected_refresh_rate = self.__refresh_rate_detector.add_flip(flip_end)
+            if not self.__refresh_rate_detector.calibrating:
+                self.__apply_detected_refresh_rate(detected_refresh_rate)
+        missed_vblanks = 0
+        if self.__frame_pacer.active or (
+            self.__offscreen_context is not None
+            and self.__offscreen_vsync_period is None
+        ):
+            # paced flips and flips without vsync don't take one vblank each so intervals say nothing about misses
+            self.__missed_flip_detector.reset()
+        else:
+            missed_vblanks = self.__missed_flip_detector.flip_completed(flip_end)
+            if missed_vblanks > 0:
+                self.__handle_missed_flip(missed_vblanks)
+        self.__flip_telemetry.record(
+            flip_start,
+            flip_end,
+            SYNC_SIGNAL_LEFT if self.__left_or_bottom_page else SYNC_SIGNAL_RIGHT,
+            self.__in_image_play_timestamp,
+            uploaded,
+            is_bfi_frame,
+            missed_vblanks,
+            self.__draw_start,
+        )
+
+    def __handle_missed_flip(self, missed_vblanks):
+        # the previous frame stayed on screen for the missed vblanks, an odd count leaves the eyes out of phase with the glasses
+        # so not swapping eyes after this flip puts them back in phase on the next vblank instead of waiting for a duplicate
+        # frame report from the emitter
+        corrected = self.__missed_flip_correction and missed_vblanks % 2 == 1
+        if corrected:
+            self.__skip_n_page_flips += 1
+        self.__gst_pageflip_gl_sink.emit("missed-flip", missed_vblanks, corrected)
+
+    def __apply_detected_refresh_rate(self, detected_refresh_rate):
+        if detected_refresh_rate is None:
+            print(
+                "PageflipGLSink refresh rate detection failed, eyes will be swapped every flip"
+            )
+            return
+        self.__detected_refresh_rate = detected_refresh_rate
+        self.__missed_flip_detector.set_refresh_interval(
+            1.0 / detected_refresh_rate["refresh_rate"]
+        )
+        print(
+            f"PageflipGLSink detected refresh rate {detected_refresh_rate['refresh_rate']:.3f}hz "
+            f"(standard error {detected_refresh_rate['stderr_hz']:.4f}hz confidence {detected_refresh_rate['confidence']:.2f})"
+        )
+        self.__update_target_frametime()
+        self.__gst_pageflip_gl_sink.emit(
+            "refresh-rate-detected",
+            detected_refresh_rate["refresh_rate"],
+            detected_refresh_rate["confidence"],
+        )
+
+    def __update_target_frametime(self):
+        if self.__target_framerate == TARGET_FRAMERATE_AUTO:
+            # one slot per refresh so each eye lasts one refresh plus one per bfi frame
+            self.__target_frametime = (
+                None
+                if self.__detected_refresh_rate is None
+                else (1 + self.__add_n_bfi_frames_every_frame)
+                / self.__detected_refresh_rate["refresh_rate"]
+            )
+        else:
+            target_framerate = float(self.__target_framerate)
+            self.__target_frametime = (
+                1.0 / target_framerate if target_framerate > 0 else None
+            )
+        self.__frame_pacer.configure(
+            self.__target_frametime, self.__add_n_bfi_frames_every_frame
         )
 
     @line_profiler_obj
@@ -1859,12 +2961,7 @@ class PageflipGLWindow(threading.Thread):
         while not self.__do_stop:
             if self.__started:
                 self.__update()
-                # self.__debug_loop_count += 1
-                # if self.__debug_loop_count % 120 == 0:
-                #  print(self.__pg_clock.get_fps())
         self.__stop()
-        # for loop_time in range(min(max(self.__debug_loop_times.keys()),50)+1):
-        #  print(f'{loop_time},{self.__debug_loop_times[loop_time] if loop_time in self.__debug_loop_times else 0}')
 
     def stop(self):
         self.__do_stop = True
@@ -1880,9 +2977,7 @@ class PageflipGLWindow(threading.Thread):
     #         self.__pg_window.get_flags() & pg_locals.FULLSCREEN != 0
     #     ) != self.__fullscreen:
     #         pg.display.toggle_fullscreen()
-    #         self.__requests = ",".join(
-    #             self.__requests.split(",") + ["set_menu_on_top_true"]
-    #         )
+    #         self.__post_request(REQUEST_SET_MENU_ON_TOP, True)
     #         if not self.__fullscreen:
     #             pg.mouse.set_visible(True)
     #             self.__set_menu_on_top_true = True
@@ -1892,6 +2987,9 @@ class PageflipGLWindow(threading.Thread):
 
     @fullscreen.setter
     def fullscreen(self, value):
+        if self.__offscreen_context is not None:
+            self.__fullscreen = value
+            return
         if value != self.__fullscreen:
             if os.name == WINDOWS_OS_NAME:
                 if value:
@@ -1937,9 +3035,7 @@ class PageflipGLWindow(threading.Thread):
 
             self.__fullscreen = value
 
-            self.__requests = ",".join(
-                self.__requests.split(",") + ["set_menu_on_top_true"]
-            )
+            self.__post_request(REQUEST_SET_MENU_ON_TOP, True)
 
             # self.__sdl2_window.focus()
             self.__update_window_scale_factor()
@@ -1996,7 +3092,15 @@ class PageflipGLWindow(threading.Thread):
     def target_framerate(self, value):
         if value != self.__target_framerate:
             self.__target_framerate = value
-            self.__target_frametime = 1.0 / float(value) if float(value) > 0 else None
+            if value == TARGET_FRAMERATE_AUTO:
+                # eyes are swapped every vsync blocked flip while they are measured then paced at the detected rate
+                self.__detected_refresh_rate = None
+                self.__refresh_rate_detector.start(
+                    int(self.__refresh_rate_calibration_flips)
+                )
+            else:
+                self.__refresh_rate_detector.cancel()
+            self.__update_target_frametime()
 
     @property
     def add_n_bfi_frames_every_frame(self):
@@ -2007,6 +3111,30 @@ class PageflipGLWindow(threading.Thread):
         int_value = int(value)
         if int_value != self.__add_n_bfi_frames_every_frame:
             self.__add_n_bfi_frames_every_frame = int_value
+            self.__update_target_frametime()
+
+    @property
+    def refresh_rate_calibration_flips(self):
+        return self.__refresh_rate_calibration_flips
+
+    @refresh_rate_calibration_flips.setter
+    def refresh_rate_calibration_flips(self, value):
+        if value != self.__refresh_rate_calibration_flips:
+            self.__refresh_rate_calibration_flips = value
+            if self.__refresh_rate_detector.calibrating:
+                self.__refresh_rate_detector.start(int(value))
+
+    @property
+    def missed_flip_correction(self):
+        return self.__missed_flip_correction
+
+    @missed_flip_correction.setter
+    def missed_flip_correction(self, value):
+        self.__missed_flip_correction = value
+
+    @property
+    def detected_refresh_rate(self):
+        return json.dumps(self.__detected_refresh_rate or {})
 
     @property
     def display_resolution(self):
@@ -2151,63 +3279,44 @@ class PageflipGLWindow(threading.Thread):
         return self.__started
 
     @property
-    def requests(self):
-        return self.__requests
+    def subtitle_offset(self):
+        return self.__subtitle_offset
 
-    @requests.setter
-    def requests(self, value):
-        if value == "":
-            self.__requests = ""
+    @subtitle_offset.setter
+    def subtitle_offset(self, value):
+        if value != self.__subtitle_offset:
+            self.__subtitle_offset = value
+            # picked up by the render thread before the next subtitles are drawn
+            self.__subtitle_offset_ns = int(float(value) * Gst.SECOND)
+            self.__subtitle_prerender_wake.set()
 
     @property
-    def latest_subtitle_data(self):
-        return self.__latest_subtitle_data
-
-    @latest_subtitle_data.setter
-    def latest_subtitle_data(self, value):
-        if value != self.__latest_subtitle_data:
-            self.__latest_subtitle_data = value
-            # print(value)
-            parsed_data = json.loads(value)
-            if self.__latest_subtitles_event.wait(
-                0.2
-            ):  # if we don't get a signal within 200ms just drop the subtitle and carry on
-                if "show_now" in parsed_data:
-                    parsed_data["start"] = self.__in_image_play_timestamp
-                parsed_data["end"] = parsed_data["start"] + parsed_data["duration"]
-                special_type = parsed_data.get("special_type", None)
-                if special_type == "duplicate":
-                    if (
-                        self.__display_duplicate_frame_mode
-                        == DISPLAY_DUPLICATE_FRAME_MODE_OFF
-                    ):
-                        return
-                    else:
-                        self.__latest_subtitles = collections.deque(
-                            filter(
-                                lambda d: not d.get("special_type", None)
-                                == "duplicate",
-                                self.__latest_subtitles,
-                            )
-                        )
-                        if (
-                            self.__display_duplicate_frame_mode
-                            == DISPLAY_DUPLICATE_FRAME_MODE_ON
-                        ):
-                            parsed_data["text"] = "\nduplicate frame"
-                            parsed_data["use_surface_cache_key"] = "duplicate"
-                if special_type == "setting":
-                    self.__latest_subtitles = collections.deque(
-                        filter(
-                            lambda d: not d.get("special_type", None) == "setting",
-                            self.__latest_subtitles,
-                        )
-                    )
-                self.__latest_subtitles.append(parsed_data)
-                while len(self.__latest_subtitles) > 5:
-                    self.__latest_subtitles.popleft()
-                self.__update_subtitle_surface_and_data()
-            # print(f"pts:{self.__in_image_play_timestamp} b:{self.__latest_subtitles[-1]['start']} e:{self.__latest_subtitles[-1]['end']} {self.__latest_subtitles[-1]['text']}")
+    def subtitle_prerender_cues(self):
+        return self.__subtitle_prerender_track[0]
+
+    @subtitle_prerender_cues.setter
+    def subtitle_prerender_cues(self, value):
+        # (start, end, text) tuples in nanoseconds, sorted so the prerender thread can find the play position with a bisect
+        subtitle_prerender_cues = sorted(value) if value else None
+        self.__subtitle_prerender_track = (
+            subtitle_prerender_cues,
+            (
+                [start for start, _, _ in subtitle_prerender_cues]
+                if subtitle_prerender_cues
+                else []
+            ),
+        )
+        self.__subtitle_prerender_wake.set()
+
+    @property
+    def subtitle_prerender_seconds(self):
+        return self.__subtitle_prerender_seconds
+
+    @subtitle_prerender_seconds.setter
+    def subtitle_prerender_seconds(self, value):
+        if value != self.__subtitle_prerender_seconds:
+            self.__subtitle_prerender_seconds = value
+            self.__subtitle_prerender_wake.set()
 
     @property
     def subtitle_font(self):
@@ -2298,11 +3407,182 @@ class PageflipGLWindow(threading.Thread):
             self.__synced_signal_left_or_right = int_value
             self.__synced_signal_left_or_right_str = str(int_value)
 
-    def update_image(self, play_timestamp, in_image, in_image_width, in_image_height):
+    @property
+    def render_backend(self):
+        return self.__render_backend
+
+    @render_backend.setter
+    def render_backend(self, value):
+        # only used when the window starts
+        self.__render_backend = value
+
+    @property
+    def offscreen_refresh_rate(self):
+        return self.__offscreen_refresh_rate
+
+    @offscreen_refresh_rate.setter
+    def offscreen_refresh_rate(self, value):
+        if value != self.__offscreen_refresh_rate:
+            self.__offscreen_refresh_rate = value
+            self.__offscreen_vsync_period = (
+                1.0 / float(value) if float(value) > 0 else None
+            )
+            self.__offscreen_next_vsync = None
+
+    @property
+    def trigger_box_readback(self):
+        return json.dumps(self.__trigger_box_readback)
+
+    @property
+    def flip_telemetry_dump(self):
+        return self.__flip_telemetry_dump
+
+    @flip_telemetry_dump.setter
+    def flip_telemetry_dump(self, value):
+        # setting a file path writes the recorded flips to it as a numpy .npy file
+        self.__flip_telemetry_dump = value
+        if value:
+            flip_count = self.__flip_telemetry.dump(value)
+            print(f"PageflipGLSink dumped {flip_count} flip telemetry records to {value}")
+
+    @property
+    def flip_telemetry_summary(self):
+        return json.dumps(self.__flip_telemetry.summary())
+
+    @property
+    def frame_pacer_summary(self):
+        return json.dumps(self.__frame_pacer.summary())
+
+    @property
+    def gl_calls_per_flip(self):
+        return str(self.__gl_calls_per_flip)
+
+    @property
+    def frame_queue_depth(self):
+        return str(self.__frame_queue_depth)
+
+    @frame_queue_depth.setter
+    def frame_queue_depth(self, value):
+        # only applied the next time the frame queue is allocated (on start or when the video resolution changes)
+        int_value = max(1, int(value))
+        if int_value != self.__frame_queue_depth:
+            self.__frame_queue_depth = int_value
+
+    @property
+    def frame_queue_policy(self):
+        return self.__frame_queue_policy
+
+    @frame_queue_policy.setter
+    def frame_queue_policy(self, value):
+        if value not in (FRAME_QUEUE_POLICY_DROP, FRAME_QUEUE_POLICY_HOLD):
+            value = FRAME_QUEUE_POLICY_DROP
+        with self.__frame_slots_condition:
+            self.__frame_queue_policy = value
+            self.__frame_slots_condition.notify_all()
+
+    @property
+    def enable_gl_memory(self):
+        return self.__enable_gl_memory
+
+    @enable_gl_memory.setter
+    def enable_gl_memory(self, value):
+        # only used when the window starts
+        self.__enable_gl_memory = value
+
+    def set_frame_queue_flushing(self, flushing):
+        # releases a streaming thread waiting on a full queue so the sink can unlock for flushes and state changes
+        with self.__frame_slots_condition:
+            self.__frame_queue_flushing = flushing
+            self.__frame_slots_condition.notify_all()
+
+    def flush_frame_queue(self):
+        with self.__frame_slots_condition:
+            for frame_slot in self.__frame_slots:
+                if frame_slot["state"] == FRAME_SLOT_FILLED:
+                    frame_slot["state"] = FRAME_SLOT_FREE
+            self.__released_gl_memory_fences.extend(
+                gl_memory_frame["fence"] for gl_memory_frame in self.__gl_memory_frames
+            )
+            self.__gl_memory_frames.clear()
+            self.__frame_slots_condition.notify_all()
+
+    def gl_memory_context(self, timeout):
+        # called while gstreamer negotiates, starts the window before the first frame so there is a context to share
+        if not self.__enable_gl_memory or GstGL is None:
+            return None, None
+        if not self.__started:
+            self.__do_start = True
+        if not self.__gl_memory_context_ready.wait(timeout=timeout):
+            return None, None
+        return self.__gl_memory_display, self.__gl_memory_context
+
+    def wait_for_gl_memory_frame(self):
+        # runs on the streaming thread, returns False if the frame must be dropped because the display is behind or flushing
+        with self.__frame_slots_condition:
+            if self.__frame_queue_policy == FRAME_QUEUE_POLICY_HOLD:
+                wait_timeout = None
+            else:
+                wait_timeout = FINISH_BUFFER_COPY_EVENT_TIMEOUT
+            return (
+                self.__frame_slots_condition.wait_for(
+                    lambda: self.__gl_memory_context is None
+                    or self.__frame_queue_flushing
+                    or len(self.__gl_memory_frames) < self.__frame_queue_depth,
+                    timeout=wait_timeout,
+                )
+                and self.__gl_memory_context is not None
+                and not self.__frame_queue_flushing
+            )
+
+    def queue_gl_memory_frame(
+        self,
+        play_timestamp,
+        running_time,
+        buffer,
+        texture_ids,
+        fence,
+        in_image_width,
+        in_image_height,
+        video_layout,
+    ):
+        # buffer must stay referenced until the frame is replaced on screen so upstream doesn't reuse its textures
+        with self.__frame_slots_condition:
+            self.__in_image_width = in_image_width
+            self.__in_image_height = in_image_height
+            self.__gl_memory_frames.append(
+                {
+                    "buffer": buffer,
+                    "texture_ids": texture_ids,
+                    "fence": fence,
+                    "play_timestamp": play_timestamp,
+                    "running_time": running_time,
+                    "video_layout": video_layout,
+                }
+            )
+            self.__frame_slots_condition.notify_all()
+
+    def record_frame_render(self, render_start, render_end):
+        self.__flip_telemetry.record_render(render_start, render_end)
+
+    def update_image(
+        self,
+        play_timestamp,
+        in_image,
+        in_image_width,
+        in_image_height,
+        running_time=None,
+        video_layout=None,
+    ):
+        if video_layout is None:
+            video_layout = rgba_video_layout(in_image_width, in_image_height)
+        if self.__queue_frame(play_timestamp, running_time, in_image, video_layout):
+            return
+
         self.__in_image = in_image
         # self.__in_image = in_image.tobytes()
         self.__in_image_width = in_image_width
         self.__in_image_height = in_image_height
+        self.__in_image_video_layout = video_layout
         self.__in_image_updated = True
         self.__in_image_play_timestamp = play_timestamp
 
@@ -2330,7 +3610,26 @@ class GstPageflipGLSink(GstBase.BaseSink):
         "sink", Gst.PadDirection.SINK, Gst.PadPresence.ALWAYS, IN_CAPS
     )
 
-    __gsignals__ = {"synced-flip": (GObject.SIGNAL_RUN_FIRST, None, (int,))}
+    __gsignals__ = {
+        "synced-flip": (GObject.SIGNAL_RUN_FIRST, None, (int,)),
+        # emitted from the render thread with the refresh rate in hz and confidence (0 to 1) once target_framerate auto has measured it
+        "refresh-rate-detected": (GObject.SIGNAL_RUN_FIRST, None, (float, float)),
+        # emitted from the render thread with the vblanks missed before a flip and whether the eye order was corrected for it
+        "missed-flip": (GObject.SIGNAL_RUN_FIRST, None, (int, bool)),
+        # emitted from the render thread after a PlayerRequest is put on the request queue
+        "request-queued": (GObject.SIGNAL_RUN_FIRST, None, ()),
+        # action signal taking start, duration, text and special type ("" for regular subtitles), a start of Gst.CLOCK_TIME_NONE shows it immediately
+        "push-subtitle": (
+            GObject.SignalFlags.RUN_LAST | GObject.SignalFlags.ACTION,
+            None,
+            (
+                GObject.TYPE_UINT64,
+                GObject.TYPE_UINT64,
+                GObject.TYPE_STRING,
+                GObject.TYPE_STRING,
+            ),
+        ),
+    }
 
     __gproperties__ = {
         "fullscreen": (
@@ -2364,10 +3663,31 @@ class GstPageflipGLSink(GstBase.BaseSink):
         "target_framerate": (
             GObject.TYPE_STRING,
             "Target Framerate",
-            "If any positive float number this is the framerate used to swap eyes at, if 0 then swap every frame irregarless.",
+            "If any positive float number this is the framerate used to swap eyes at, if 0 then swap every frame irregarless, if auto the display refresh rate is measured and used.",
             "0",  # default
             GObject.ParamFlags.READWRITE,
         ),
+        "refresh_rate_calibration_flips": (
+            GObject.TYPE_STRING,
+            "Refresh Rate Calibration Flips",
+            "Number of flips measured to detect the display refresh rate when target_framerate is auto",
+            str(pageflip_timing.DEFAULT_REFRESH_RATE_CALIBRATION_FLIPS),  # default
+            GObject.ParamFlags.READWRITE,
+        ),
+        "missed_flip_correction": (
+            GObject.TYPE_BOOLEAN,
+            "Missed Flip Correction",
+            "When eyes are swapped every flip and a flip returns after an odd number of missed vsyncs skip the next eye swap to put the eyes back in phase with the glasses",
+            True,  # default
+            GObject.ParamFlags.READWRITE,
+        ),
+        "detected_refresh_rate": (
+            GObject.TYPE_STRING,
+            "Detected Refresh Rate",
+            "JSON result of the refresh rate detection run when target_framerate is auto, including refresh_rate, stderr_hz and confidence",
+            "{}",  # default
+            GObject.ParamFlags.READABLE,
+        ),
         "add_n_bfi_frames_every_frame": (
             GObject.TYPE_STRING,
             "Add N BFI Frames Every Frame",
@@ -2480,25 +3800,37 @@ class GstPageflipGLSink(GstBase.BaseSink):
             False,  # default
             GObject.ParamFlags.READABLE,
         ),
-        "requests": (
+        "request_queue": (
+            GObject.TYPE_PYOBJECT,
+            "Request Queue",
+            "queue.SimpleQueue of PlayerRequest tuples from the player window to the parent app, drain it when request-queued is emitted",
+            GObject.ParamFlags.READABLE,
+        ),
+        "subtitle_font": (
             GObject.TYPE_STRING,
-            "Requests",
-            "Request from filter to parent app as csv list (can only be used after starting)",
-            "",  # default
+            "Subtitle Font",
+            "Font to render subtitles if present",
+            "arial",  # default
             GObject.ParamFlags.READWRITE,
         ),
-        "latest_subtitle_data": (
+        "subtitle_offset": (
             GObject.TYPE_STRING,
-            "Latest Subtitle Data",
-            "Latest subtitle data as json object (can only be used after starting)",
-            "",  # default
+            "Subtitle Offset",
+            "Seconds subtitles are shown later (or earlier if negative) than their timestamps, set ts-offset on the subtitle sink to the same value so cues arrive in time",
+            DEFAULT_SUBTITLE_OFFSET,  # default
             GObject.ParamFlags.READWRITE,
         ),
-        "subtitle_font": (
+        "subtitle_prerender_cues": (
+            GObject.TYPE_PYOBJECT,
+            "Subtitle Prerender Cues",
+            "List of (start, end, text) subtitle cues in nanoseconds that are rendered in the background ahead of the play position",
+            GObject.ParamFlags.READWRITE,
+        ),
+        "subtitle_prerender_seconds": (
             GObject.TYPE_STRING,
-            "Subtitle Font",
-            "Font to render subtitles if present",
-            "arial",  # default
+            "Subtitle Prerender Seconds",
+            "How many seconds of subtitle cues ahead of the play position are kept rendered",
+            DEFAULT_SUBTITLE_PRERENDER_SECONDS,  # default
             GObject.ParamFlags.READWRITE,
         ),
         "subtitle_size": (
@@ -2529,6 +3861,76 @@ class GstPageflipGLSink(GstBase.BaseSink):
             "0",  # default
             GObject.ParamFlags.READWRITE,
         ),
+        "frame_queue_depth": (
+            GObject.TYPE_STRING,
+            "Frame Queue Depth",
+            "Number of decoded frames that can be queued ahead of the display, the sink renders this many frames early so decode jitter is absorbed (applied when the window starts or the video resolution changes)",
+            str(DEFAULT_FRAME_QUEUE_DEPTH),  # default
+            GObject.ParamFlags.READWRITE,
+        ),
+        "frame_queue_policy": (
+            GObject.TYPE_STRING,
+            "Frame Queue Policy",
+            f"What to do when the frame queue is full, {FRAME_QUEUE_POLICY_DROP} overwrites the oldest queued frame and {FRAME_QUEUE_POLICY_HOLD} blocks the streaming thread until a queued frame is displayed",
+            FRAME_QUEUE_POLICY_DROP,  # default
+            GObject.ParamFlags.READWRITE,
+        ),
+        "enable_gl_memory": (
+            GObject.TYPE_BOOLEAN,
+            "Enable GL Memory",
+            "Accept GLMemory frames from glupload or gl capable decoders by sharing the render thread's gl context with them so frames are never copied through system memory (the window then starts before the first frame)",
+            False,  # default
+            GObject.ParamFlags.READWRITE,
+        ),
+        "render_backend": (
+            GObject.TYPE_STRING,
+            "Render Backend",
+            f"{RENDER_BACKEND_WINDOW} renders to a vsync window, {RENDER_BACKEND_EGL} or {RENDER_BACKEND_OSMESA} render offscreen for headless benchmarks (offscreen backends also need {RENDER_BACKEND_ENV_VAR} set before the plugin is loaded, which also sets the default)",
+            DEFAULT_RENDER_BACKEND,  # default
+            GObject.ParamFlags.READWRITE,
+        ),
+        "offscreen_refresh_rate": (
+            GObject.TYPE_STRING,
+            "Offscreen Refresh Rate",
+            "Simulated vsync rate in hz used by the offscreen render backends (0 renders as fast as possible)",
+            DEFAULT_OFFSCREEN_REFRESH_RATE,  # default
+            GObject.ParamFlags.READWRITE,
+        ),
+        "trigger_box_readback": (
+            GObject.TYPE_STRING,
+            "Trigger Box Readback",
+            "JSON with the white trigger box levels read back after the last flip and how many flips didn't light only the expected box (offscreen render backends only)",
+            "{}",  # default
+            GObject.ParamFlags.READABLE,
+        ),
+        "flip_telemetry_dump": (
+            GObject.TYPE_STRING,
+            "Flip Telemetry Dump",
+            f"Setting a file path writes the timings of the last {pageflip_timing.DEFAULT_FLIP_TELEMETRY_CAPACITY} page flips to it as a numpy .npy file (can only be used after starting)",
+            "",  # default
+            GObject.ParamFlags.READWRITE,
+        ),
+        "flip_telemetry_summary": (
+            GObject.TYPE_STRING,
+            "Flip Telemetry Summary",
+            "JSON summary of the recorded page flip timings including interval jitter, missed vsyncs and repeated eyes",
+            "{}",  # default
+            GObject.ParamFlags.READABLE,
+        ),
+        "frame_pacer_summary": (
+            GObject.TYPE_STRING,
+            "Frame Pacer Summary",
+            "JSON statistics of the frame pacer used when target_framerate is set including slot phase error, wake overshoot and late slots",
+            "{}",  # default
+            GObject.ParamFlags.READABLE,
+        ),
+        "gl_calls_per_flip": (
+            GObject.TYPE_STRING,
+            "GL Calls Per Flip",
+            f"Number of gl calls made to render the last page flip, only counted when the {COUNT_GL_CALLS_ENV_VAR} environment variable is 1",
+            "0",  # default
+            GObject.ParamFlags.READABLE,
+        ),
         "calibration_mode": (
             GObject.TYPE_BOOLEAN,
             "Calibration Mode",
@@ -2562,6 +3964,10 @@ class GstPageflipGLSink(GstBase.BaseSink):
             "right-eye": "right",
             "target-framerate": "0",
             "add-n-bfi-frames-every-frame": "0",
+            "refresh-rate-calibration-flips": str(
+                pageflip_timing.DEFAULT_REFRESH_RATE_CALIBRATION_FLIPS
+            ),
+            "missed-flip-correction": True,
             "display-resolution": "1920x1080",
             "display-zoom-factor": "100",
             "display-size": "55",
@@ -2576,23 +3982,45 @@ class GstPageflipGLSink(GstBase.BaseSink):
             "display-osd-timestamp": False,
             "disable-3d-on-mouse-move-under-windows": True,
             "enable-windows-always-on-top-hack": False,
-            "requests": "",
-            "latest-subtitle-data": "",
             "subtitle-font": "arial",
+            "subtitle-offset": DEFAULT_SUBTITLE_OFFSET,
+            "subtitle-prerender-cues": None,
+            "subtitle-prerender-seconds": DEFAULT_SUBTITLE_PRERENDER_SECONDS,
             "subtitle-size": "30",
             "subtitle-depth": "0",
             "subtitle-vertical-offset": "150",
             "skip-n-page-flips": "0",
+            "frame-queue-depth": str(DEFAULT_FRAME_QUEUE_DEPTH),
+            "frame-queue-policy": FRAME_QUEUE_POLICY_DROP,
+            "enable-gl-memory": False,
+            "flip-telemetry-dump": "",
+            "render-backend": DEFAULT_RENDER_BACKEND,
+            "offscreen-refresh-rate": DEFAULT_OFFSCREEN_REFRESH_RATE,
             "calibration-mode": False,
             "video-duration": "0",
             "synced-signal-left-or-right": "0",
         }
-        self.__readonly_parameters = set(("started",))
+        self.__readonly_parameters = set(
+            (
+                "started",
+                "gl-calls-per-flip",
+                "flip-telemetry-summary",
+                "frame-pacer-summary",
+                "detected-refresh-rate",
+                "trigger-box-readback",
+            )
+        )
+        self.__request_queue = queue.SimpleQueue()
+        self.__segment = None
+        self.__video_layout = None
+        self.__gl_memory_upstream_context = None
 
     def do_get_property(self, prop: GObject.GParamSpec):
+        if prop.name == "request-queue":
+            return self.__request_queue
         if prop.name in self.__parameters or prop.name in self.__readonly_parameters:
             if not self.__started:
-                return self.__parameters[prop.name]
+                return self.__parameters.get(prop.name, prop.default_value)
             else:
                 prop_name_fixed = prop.name.replace("-", "_")
                 return getattr(
@@ -2643,6 +4071,7 @@ class GstPageflipGLSink(GstBase.BaseSink):
     def do_render(self, inbuffer: Gst.Buffer) -> Gst.FlowReturn:
         "https://gstreamer.freedesktop.org/documentation/base/gstbasesink.html?gi-language=python#GstBaseSinkClass::render"
 
+        render_start = time.perf_counter()
         try:
             # print((inbuffer.get_size(), outbuffer.get_size()))
             # in_struct = self.sinkpad.get_current_caps().get_structure(0)
@@ -2653,12 +4082,30 @@ class GstPageflipGLSink(GstBase.BaseSink):
             # convert Gst.Buffer to np.ndarray
             # self.__pageflip_gl_window.update_image(inbuffer.pts, gstreamer_utils.gst_buffer_with_caps_to_ndarray(inbuffer, self.sinkpad.get_current_caps())) # we may need to clone it so we don't lock the Gst.Buffer
             # convert Gst.Buffer to bytes and get dimensions
-            with gstreamer_utils.gst_buffer_with_caps_to_bytes_and_size(
-                inbuffer, self.sinkpad.get_current_caps()
-            ) as (in_image, in_image_width, in_image_height):
-                self.__pageflip_gl_window.update_image(
-                    inbuffer.pts, in_image, in_image_width, in_image_height
-                )  # we may need to clone it so we don't lock the Gst.Buffer
+            running_time = None
+            if self.__segment is not None and inbuffer.pts != Gst.CLOCK_TIME_NONE:
+                running_time = self.__segment.to_running_time(
+                    Gst.Format.TIME, inbuffer.pts
+                )
+                if running_time == Gst.CLOCK_TIME_NONE:
+                    running_time = None
+            if self.__video_layout is not None and self.__video_layout["gl_memory"]:
+                self.__queue_gl_memory_buffer(inbuffer, running_time)
+            else:
+                with gstreamer_utils.gst_buffer_with_caps_to_bytes_and_size(
+                    inbuffer, self.sinkpad.get_current_caps()
+                ) as (in_image, in_image_width, in_image_height):
+                    self.__pageflip_gl_window.update_image(
+                        inbuffer.pts,
+                        in_image,
+                        in_image_width,
+                        in_image_height,
+                        running_time,
+                        self.__video_layout,
+                    )  # frames are copied into the frame queue so the Gst.Buffer is released as soon as this returns
+            self.__pageflip_gl_window.record_frame_render(
+                render_start, time.perf_counter()
+            )
 
         except Exception as e:
             traceback.print_exc()
@@ -2666,14 +4113,140 @@ class GstPageflipGLSink(GstBase.BaseSink):
 
         return Gst.FlowReturn.OK
 
+    def __queue_gl_memory_buffer(self, inbuffer, running_time):
+        if not self.__pageflip_gl_window.wait_for_gl_memory_frame():
+            return  # the display is behind or we are flushing so drop this frame
+        # mapping for gl makes upstream finish any pending upload into the textures in its own context
+        texture_ids = gstreamer_utils.gst_gl_buffer_texture_ids(
+            inbuffer, Gst.MapFlags.READ | GstGL.MAP_GL
+        )
+        if self.__gl_memory_upstream_context is None:
+            self.__gl_memory_upstream_context = self.__query_upstream_gl_context()
+        fence = None
+        if self.__gl_memory_upstream_context is not None:
+            fences = []
+
+            def create_fence(gl_context, data):
+                # sync objects are shared with the render thread's context, without them wait for the upload on this side
+                if gl.glFenceSync:
+                    fences.append(gl.glFenceSync(gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0))
+                    gl.glFlush()
+                else:
+                    gl.glFinish()
+
+            self.__gl_memory_upstream_context.thread_add(create_fence, None)
+            fence = fences[0] if fences else None
+        # a shallow copy keeps the textures alive while displayed and since its memory isn't exclusive the pool won't recycle it underneath us
+        self.__pageflip_gl_window.queue_gl_memory_frame(
+            inbuffer.pts,
+            running_time,
+            inbuffer.copy(),
+            texture_ids,
+            fence,
+            self.__in_width,
+            self.__in_height,
+            self.__video_layout,
+        )
+
+    def __query_upstream_gl_context(self):
+        # the context upstream writes the textures in, used to queue a fence behind its uploads
+        query = Gst.Query.new_context("gst.gl.local_context")
+        if not self.sinkpad.peer_query(query):
+            print(
+                "PageflipGLSink upstream didn't share its gl context, frames are drawn without waiting for upstream to finish writing them"
+            )
+            return None
+        return query.parse_context().get_structure().get_value("context")
+
+    def do_get_caps(self, filter: Gst.Caps) -> Gst.Caps:
+        caps = IN_CAPS
+        if GstGL is not None and (
+            not self.get_property("enable_gl_memory")
+            or (
+                self.__started
+                and self.__pageflip_gl_window.gl_memory_context(
+                    GL_MEMORY_CONTEXT_TIMEOUT
+                )[1]
+                is None
+            )
+        ):
+            caps = SYSTEM_MEMORY_IN_CAPS
+        if filter is not None:
+            caps = filter.intersect_full(caps, Gst.CapsIntersectMode.FIRST)
+        return caps
+
+    def do_query(self, query: Gst.Query) -> bool:
+        if query.type == Gst.QueryType.CONTEXT and GstGL is not None and self.__started:
+            success, context_type = query.parse_context_type()
+            if success and context_type.startswith("gst.gl."):
+                gl_display, gl_context = self.__pageflip_gl_window.gl_memory_context(
+                    GL_MEMORY_CONTEXT_TIMEOUT
+                )
+                # upstream gets our display and our context as the one to share with and creates its own context from them
+                if gl_context is not None and GstGL.gl_handle_context_query(
+                    self, query, gl_display, None, gl_context
+                ):
+                    return True
+        return GstBase.BaseSink.do_query(self, query)
+
     def do_set_caps(self, caps: Gst.Caps) -> bool:
 
         self.__in_width, self.__in_height = [
             caps.get_structure(0).get_value(v) for v in ["width", "height"]
         ]
+        self.__video_layout = gstreamer_utils.gst_caps_to_video_layout(caps)
+        self.__gl_memory_upstream_context = None
+
+        # hand frames to the render thread early enough that the frame queue can absorb decode jitter
+        success, framerate_num, framerate_denom = caps.get_structure(
+            0
+        ).get_fraction("framerate")
+        if success and framerate_num > 0:
+            frame_duration = Gst.SECOND * framerate_denom // framerate_num
+            frame_queue_depth = int(self.get_property("frame_queue_depth"))
+            self.set_render_delay((frame_queue_depth - 1) * frame_duration)
+
+        return True
+
+    def do_event(self, event: Gst.Event) -> bool:
+        if event.type == Gst.EventType.SEGMENT:
+            self.__segment = event.parse_segment()
+        elif event.type == Gst.EventType.FLUSH_STOP and self.__started:
+            self.__pageflip_gl_window.flush_frame_queue()
+        return GstBase.BaseSink.do_event(self, event)
+
+    def do_unlock(self) -> bool:
+        if self.__started:
+            self.__pageflip_gl_window.set_frame_queue_flushing(True)
+        return True
 
+    def do_unlock_stop(self) -> bool:
+        if self.__started:
+            self.__pageflip_gl_window.set_frame_queue_flushing(False)
         return True
 
+    def do_push_subtitle(self, start, duration, text, special_type):
+        if self.__started:
+            self.__pageflip_gl_window.push_subtitle(
+                start, duration, text, special_type
+            )
+
+    def post_request(self, action, value=None):
+        self.__request_queue.put(PlayerRequest(action, value))
+        self.emit("request-queued")
+
+    def get_current_display_running_time(self):
+        # the running time of the frame that should be on screen right now, frames are synced against running time plus latency
+        clock = self.get_clock()
+        if clock is None:
+            return None
+        return (
+            clock.get_time()
+            - self.get_base_time()
+            - self.get_latency()
+            - self.get_ts_offset()
+        )
+
 
 # Register plugin to use it from command line
 GObject.type_register(GstPageflipGLSink)
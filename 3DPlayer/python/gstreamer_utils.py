@@ -21,11 +21,13 @@ from gi.repository import Gst, GObject, GLib, GstBase, GstVideo  # noqa:F401,F40
 
 import numpy as np
 import math
+import sys
 import ctypes  # @UnusedImport
 from contextlib import contextmanager
 from typing import Tuple
 
 BITS_PER_BYTE = 8
+GL_MEMORY_CAPS_FEATURE = "memory:GLMemory"
 
 _ALL_VIDEO_FORMATS = [
     GstVideo.VideoFormat.from_string(f.strip())
@@ -234,3 +236,63 @@ def gst_buffer_with_caps_to_bytes_and_size(
 
     with map_gst_buffer(buffer, Gst.MapFlags.READ) as mapped:
         yield mapped, width, height
+
+
+def gst_gl_buffer_texture_ids(buffer: Gst.Buffer, flags: Gst.MapFlags) -> list:
+    """
+    Maps every memory of a GLMemory buffer with flags (which should include GstGL.MAP_GL) and returns the texture id of each plane
+
+    Mapping for gl makes sure the texture contents are up to date in the context that owns the memory, which may queue an upload there
+    """
+    texture_ids = []
+    for i in range(buffer.n_memory()):
+        memory = buffer.peek_memory(i)
+        success, mapping = memory.map(flags)
+        if not success:
+            raise RuntimeError("Couldn't map gl memory")
+        try:
+            # a gl mapping points at the guint texture id instead of the pixels
+            texture_ids.append(
+                int.from_bytes(bytes(memoryview(mapping.data)[:4]), sys.byteorder)
+            )
+        finally:
+            memory.unmap(mapping)
+    return texture_ids
+
+
+_YUV_MATRIX_NAMES = {
+    GstVideo.VideoColorMatrix.BT601: "bt601",
+    GstVideo.VideoColorMatrix.BT709: "bt709",
+    GstVideo.VideoColorMatrix.BT2020: "bt2020",
+}
+
+
+def gst_caps_to_video_layout(caps: Gst.Caps) -> dict:
+    """
+    Reads the frame layout described by raw video caps so planes can be uploaded straight out of a mapped buffer
+
+    Returns a dict with the format name, width, height, size (bytes per frame), offsets and strides (per plane),
+    yuv_matrix (bt601, bt709, bt2020 or None for rgb formats), full_range and gl_memory (planes are gl textures instead of bytes)
+    """
+    video_info = GstVideo.VideoInfo.new_from_caps(caps)
+    n_planes = video_info.finfo.n_planes
+
+    yuv_matrix = None
+    if video_info.finfo.flags & GstVideo.VideoFormatFlags.YUV:
+        yuv_matrix = _YUV_MATRIX_NAMES.get(video_info.colorimetry.matrix)
+        if yuv_matrix is None:
+            # unknown matrix so fall back to the usual sd/hd convention
+            yuv_matrix = "bt709" if video_info.height >= 720 else "bt601"
+
+    return {
+        "format": video_info.finfo.name,
+        "width": video_info.width,
+        "height": video_info.height,
+        "size": video_info.size,
+        "offsets": list(video_info.offset)[:n_planes],
+        "strides": list(video_info.stride)[:n_planes],
+        "yuv_matrix": yuv_matrix,
+        "full_range": video_info.colorimetry.range
+        == GstVideo.VideoColorRange.RANGE_0_255,
+        "gl_memory": caps.get_features(0).contains(GL_MEMORY_CAPS_FEATURE),
+    }
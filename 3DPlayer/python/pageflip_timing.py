@@ -0,0 +1,540 @@
+#!/usr/bin/env python
+
+# Open3DOLED is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit http://creativecommons.org/licenses/by-nc-sa/4.0/
+
+"""
+Timing helpers for the page flip render loop in gstpageflipglsink.py
+
+FlipTelemetry keeps a fixed size ring buffer of per flip timings so flip jitter, missed vsyncs and eye order errors
+can be measured under load without the line profiler. Records can be dumped to a .npy file and loaded for analysis with
+    records = numpy.load("flip_telemetry.npy")
+
+FramePacer paces flips when a target framerate is set, sleeping then spinning until each slot boundary and phase locking
+the slot grid to measured flip timestamps.
+
+MissedFlipDetector compares consecutive flip return times against the refresh interval so missed vsyncs can be corrected
+on the host without waiting for the emitter's optical sensor to report a duplicate frame.
+
+RefreshRateDetector measures the real vblank interval from vsync blocked flips so the target framerate can be set to
+"auto" instead of assuming the nominal refresh rate (eg 119.88hz panels sold as 120hz).
+"""
+
+import math
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_FLIP_TELEMETRY_CAPACITY = 120 * 60  # one minute of flips at 120hz
+PTS_NONE = np.iinfo(np.uint64).max  # same value as Gst.CLOCK_TIME_NONE
+MISSED_VSYNC_INTERVAL_FACTOR = 1.5  # a flip interval longer than this many median intervals counts as a missed vsync
+
+DEFAULT_FRAME_PACER_SPIN_SECONDS = 0.002  # the last part of each wait is spun because sleeps routinely overshoot by a millisecond or more
+FRAME_PACER_MAX_SPIN_SECONDS = 0.004  # upper limit of the spin time when sleeps are found to overshoot more than the default allows for
+FRAME_PACER_FLIP_MARGIN_SECONDS = 0.001  # extra time allowed between rendering finishing and the slot boundary
+FRAME_PACER_VSYNC_BLOCK_SECONDS = 0.0005  # a flip that blocks at least this long is taken to be waiting for vsync
+FRAME_PACER_PHASE_GAIN = 0.05  # fraction of each measured flip phase error the slot grid is moved by
+FRAME_PACER_RENDER_TIME_DECAY = 0.02  # how quickly the render time estimate falls back after a slow frame, it rises immediately
+FRAME_PACER_STATS_WINDOW = 120 * 10  # recent slots the pacer statistics are calculated over
+
+DEFAULT_REFRESH_RATE_CALIBRATION_FLIPS = 240  # vsync blocked flips measured to detect the refresh rate
+REFRESH_RATE_CALIBRATION_WARMUP_FLIPS = 30  # flips ignored first while the window settles into fullscreen
+REFRESH_RATE_OUTLIER_DEVIATIONS = 4.0  # flips further than this many robust standard deviations from the fit are rejected
+REFRESH_RATE_TARGET_STDERR_HZ = 0.01  # standard error at which the detected rate is fully trusted, 12 sigma between 119.88hz and 120hz
+REFRESH_RATE_MIN_CONFIDENCE = 0.8  # detections less confident than this are measured again
+REFRESH_RATE_CALIBRATION_ATTEMPTS = 3  # measurements made before detection gives up if none was confident enough
+REFRESH_RATE_MIN_HZ = 23.0  # detected rates outside this range come from flips that didn't block on vsync
+REFRESH_RATE_MAX_HZ = 500.0
+
+MISSED_FLIP_INTERVAL_WINDOW = 120  # recent regular flip intervals the refresh interval is estimated from when it hasn't been measured
+MISSED_FLIP_MIN_INTERVALS = 30  # regular flip intervals needed before misses are judged against the estimate
+
+FLIP_TELEMETRY_DTYPE = np.dtype(
+    [
+        ("flip_start", np.float64),  # time.perf_counter() before pg.display.flip()
+        ("flip_end", np.float64),  # time.perf_counter() after pg.display.flip() returns
+        ("eye", np.uint8),  # SYNC_SIGNAL_LEFT or SYNC_SIGNAL_RIGHT
+        ("pts", np.uint64),  # pts of the frame on screen or PTS_NONE
+        ("uploaded", np.bool_),  # a new frame was uploaded to the video texture for this flip
+        ("bfi", np.bool_),  # black frame insertion flip
+        ("missed_vblanks", np.uint8),  # vblanks missed before this flip according to MissedFlipDetector
+        ("draw_start", np.float64),  # time.perf_counter() before uploading and drawing
+    ]
+)
+
+
+class FlipTelemetry:
+    def __init__(self, capacity=DEFAULT_FLIP_TELEMETRY_CAPACITY):
+        self.__records = np.zeros(capacity, dtype=FLIP_TELEMETRY_DTYPE)
+        self.__capacity = capacity
+        self.__count = 0
+        # render time of each frame on the streaming thread, independent of the flips since frames repeat or are dropped
+        self.__render_durations = np.zeros(capacity, dtype=np.float64)
+        self.__render_count = 0
+        self.__lock = threading.Lock()
+
+    def record(
+        self,
+        flip_start,
+        flip_end,
+        eye,
+        pts,
+        uploaded,
+        bfi,
+        missed_vblanks=0,
+        draw_start=None,
+    ):
+        # called once per flip on the render thread so it only writes one preallocated row
+        with self.__lock:
+            self.__records[self.__count % self.__capacity] = (
+                flip_start,
+                flip_end,
+                eye,
+                PTS_NONE if pts is None else pts,
+                uploaded,
+                bfi,
+                min(missed_vblanks, 255),
+                flip_start if draw_start is None else draw_start,
+            )
+            self.__count += 1
+
+    def record_render(self, render_start, render_end):
+        "Called once per frame by the streaming thread with the time it spent handing the frame to the render thread"
+        with self.__lock:
+            self.__render_durations[self.__render_count % self.__capacity] = (
+                render_end - render_start
+            )
+            self.__render_count += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__count = 0
+            self.__render_count = 0
+
+    @property
+    def count(self):
+        return self.__count
+
+    def snapshot(self):
+        "Copy of the recorded flips in chronological order"
+        with self.__lock:
+            if self.__count <= self.__capacity:
+                return self.__records[: self.__count].copy()
+            return np.roll(self.__records, -(self.__count % self.__capacity))
+
+    def dump(self, path):
+        records = self.snapshot()
+        np.save(path, records)
+        return len(records)
+
+    def summary(self):
+        records = self.snapshot()
+        with self.__lock:
+            render_durations = self.__render_durations[
+                : min(self.__render_count, self.__capacity)
+            ].copy()
+        result = {
+            "flips": int(self.__count),
+            "recorded": len(records),
+            "uploads": int(np.count_nonzero(records["uploaded"])),
+            "bfi_flips": int(np.count_nonzero(records["bfi"])),
+            "missed_flips_detected": int(np.count_nonzero(records["missed_vblanks"])),
+            "missed_vblanks_detected": int(np.sum(records["missed_vblanks"])),
+            "renders": int(self.__render_count),
+        }
+        if len(render_durations) > 0:
+            result.update(
+                {
+                    "render_duration_mean_ms": float(np.mean(render_durations)) * 1000,
+                    "render_duration_p95_ms": float(np.percentile(render_durations, 95))
+                    * 1000,
+                    "render_duration_max_ms": float(np.max(render_durations)) * 1000,
+                }
+            )
+        if len(records) < 2:
+            return result
+        flip_intervals = np.diff(records["flip_end"])
+        flip_durations = records["flip_end"] - records["flip_start"]
+        draw_durations = records["flip_start"] - records["draw_start"]
+        median_interval = float(np.median(flip_intervals))
+        # flips that aren't black frames should alternate eyes, two in a row with the same eye show the wrong eye to one side
+        eyes = records["eye"][~records["bfi"]]
+        result.update(
+            {
+                "interval_mean_ms": float(np.mean(flip_intervals)) * 1000,
+                "interval_median_ms": median_interval * 1000,
+                "interval_std_ms": float(np.std(flip_intervals)) * 1000,
+                "interval_min_ms": float(np.min(flip_intervals)) * 1000,
+                "interval_max_ms": float(np.max(flip_intervals)) * 1000,
+                "flip_duration_mean_ms": float(np.mean(flip_durations)) * 1000,
+                "flip_duration_max_ms": float(np.max(flip_durations)) * 1000,
+                "draw_duration_mean_ms": float(np.mean(draw_durations)) * 1000,
+                "draw_duration_p95_ms": float(np.percentile(draw_durations, 95)) * 1000,
+                "draw_duration_max_ms": float(np.max(draw_durations)) * 1000,
+                "missed_vsyncs": int(
+                    np.count_nonzero(
+                        flip_intervals > MISSED_VSYNC_INTERVAL_FACTOR * median_interval
+                    )
+                ),
+                "eye_repeats": int(np.count_nonzero(eyes[1:] == eyes[:-1])),
+            }
+        )
+        return result
+
+
+class FramePacer:
+    """
+    Paces flips to a fixed grid of slots, each target frame time is split into 1 + bfi frames slots.
+
+    wait_for_next_slot sleeps with time.sleep until shortly before the next slot boundary (less the time rendering is
+    expected to take) and spins for the remainder, then returns the slot number so the eye and black frame insertion can
+    be derived from the slot instead of from a time modulus that jitters around slot boundaries.
+    flip_completed feeds back when the flip was called and when it returned. Flips that block are waiting for vsync so
+    the grid is nudged towards them, locking the boundaries to vsyncs instead of drifting across them. Flips that don't
+    block leave the grid running freely at the target frame time.
+    """
+
+    def __init__(self):
+        self.__slot_time = None
+        self.__slots_per_frame = 1
+        self.__origin = None
+        self.__slot = None
+        self.__deadline = None
+        self.__wake_time = None
+        self.__render_time = 0.0
+        self.__lead = FRAME_PACER_FLIP_MARGIN_SECONDS
+        self.__spin_seconds = DEFAULT_FRAME_PACER_SPIN_SECONDS
+        self.__phase_errors = np.zeros(FRAME_PACER_STATS_WINDOW, dtype=np.float64)
+        self.__overshoots = np.zeros(FRAME_PACER_STATS_WINDOW, dtype=np.float64)
+        self.__sleep_seconds = np.zeros(FRAME_PACER_STATS_WINDOW, dtype=np.float64)
+        self.__count = 0
+        self.__flip_count = 0
+        self.__vsync_locked_flips = 0
+        self.__late_slots = 0
+        self.__skipped_slots = 0
+        self.__lock = threading.Lock()
+
+    def configure(self, frametime, bfi_frames=0):
+        "frametime of each eye in seconds or None to stop pacing"
+        slots_per_frame = 1 + max(int(bfi_frames), 0)
+        slot_time = None if frametime is None else frametime / slots_per_frame
+        if (slot_time, slots_per_frame) != (self.__slot_time, self.__slots_per_frame):
+            self.__slot_time = slot_time
+            self.__slots_per_frame = slots_per_frame
+            self.__origin = None
+
+    @property
+    def active(self):
+        return self.__slot_time is not None
+
+    def reset(self, origin=None):
+        with self.__lock:
+            self.__origin = origin
+            self.__slot = None
+            self.__deadline = None
+            self.__count = 0
+            self.__flip_count = 0
+            self.__vsync_locked_flips = 0
+            self.__late_slots = 0
+            self.__skipped_slots = 0
+
+    def slot_eye_and_bfi(self, slot):
+        "(left or bottom page, is black frame) for a slot, eyes alternate every slots_per_frame slots starting with the left eye"
+        return (
+            (slot // self.__slots_per_frame) % 2 == 0,
+            slot % self.__slots_per_frame != 0,
+        )
+
+    def wait_for_next_slot(self):
+        slot_time = self.__slot_time
+        now = time.perf_counter()
+        if self.__origin is None:
+            self.__origin = now
+            self.__slot = None
+        # the earliest slot that can still be rendered and flipped before its boundary
+        slot = math.ceil((now + self.__lead - self.__origin) / slot_time)
+        if self.__slot is not None:
+            if slot <= self.__slot:
+                slot = self.__slot + 1
+            elif slot > self.__slot + 1:
+                self.__late_slots += 1
+                self.__skipped_slots += slot - self.__slot - 1
+        deadline = self.__origin + slot * slot_time
+        wake_time = deadline - self.__lead
+        sleep_seconds = wake_time - now - self.__spin_seconds
+        if sleep_seconds > 0:
+            time.sleep(sleep_seconds)
+            # grow the spin time when the os sleeps longer than asked so the spin still ends on time
+            sleep_overshoot = time.perf_counter() - (now + sleep_seconds)
+            self.__spin_seconds = min(
+                max(
+                    self.__spin_seconds * (1 - FRAME_PACER_RENDER_TIME_DECAY)
+                    + 2 * sleep_overshoot * FRAME_PACER_RENDER_TIME_DECAY,
+                    DEFAULT_FRAME_PACER_SPIN_SECONDS,
+                ),
+                FRAME_PACER_MAX_SPIN_SECONDS,
+            )
+        else:
+            sleep_seconds = 0.0
+        while time.perf_counter() < wake_time:
+            pass
+        woke_at = time.perf_counter()
+        with self.__lock:
+            index = self.__count % FRAME_PACER_STATS_WINDOW
+            self.__overshoots[index] = woke_at - wake_time
+            self.__sleep_seconds[index] = sleep_seconds
+            self.__count += 1
+        self.__slot = slot
+        self.__deadline = deadline
+        self.__wake_time = woke_at
+        return slot
+
+    def flip_completed(self, flip_start, flip_end):
+        if self.__deadline is None or self.__slot_time is None:
+            return
+        slot_time = self.__slot_time
+        # rendering must finish before the boundary every slot so the estimate follows the slowest recent frames
+        render_time = flip_start - self.__wake_time
+        if render_time > self.__render_time:
+            self.__render_time = render_time
+        else:
+            self.__render_time += (
+                render_time - self.__render_time
+            ) * FRAME_PACER_RENDER_TIME_DECAY
+        self.__lead = min(
+            self.__render_time + FRAME_PACER_FLIP_MARGIN_SECONDS, slot_time * 0.9
+        )
+        # wrapped so a flip that lands just before the next boundary reads as early rather than a whole slot late
+        phase_error = (
+            flip_end - self.__deadline + slot_time / 2
+        ) % slot_time - slot_time / 2
+        vsync_locked = flip_end - flip_start >= FRAME_PACER_VSYNC_BLOCK_SECONDS
+        if vsync_locked:
+            self.__origin += phase_error * FRAME_PACER_PHASE_GAIN
+        with self.__lock:
+            self.__phase_errors[self.__flip_count % FRAME_PACER_STATS_WINDOW] = (
+                phase_error
+            )
+            self.__flip_count += 1
+            if vsync_locked:
+                self.__vsync_locked_flips += 1
+        self.__deadline = None
+
+    def summary(self):
+        with self.__lock:
+            count = min(self.__count, FRAME_PACER_STATS_WINDOW)
+            flip_count = min(self.__flip_count, FRAME_PACER_STATS_WINDOW)
+            overshoots = self.__overshoots[:count].copy()
+            sleep_seconds = self.__sleep_seconds[:count].copy()
+            phase_errors = self.__phase_errors[:flip_count].copy()
+        result = {
+            "active": self.active,
+            "slots": int(self.__count),
+            "late_slots": int(self.__late_slots),
+            "skipped_slots": int(self.__skipped_slots),
+            "vsync_locked_flips": int(self.__vsync_locked_flips),
+            "slot_time_ms": (
+                None if self.__slot_time is None else self.__slot_time * 1000
+            ),
+            "lead_ms": self.__lead * 1000,
+            "spin_ms": self.__spin_seconds * 1000,
+        }
+        if count > 0:
+            result.update(
+                {
+                    "overshoot_mean_ms": float(np.mean(overshoots)) * 1000,
+                    "overshoot_max_ms": float(np.max(overshoots)) * 1000,
+                    "sleep_mean_ms": float(np.mean(sleep_seconds)) * 1000,
+                }
+            )
+        if flip_count > 0:
+            result.update(
+                {
+                    "phase_error_mean_ms": float(np.mean(phase_errors)) * 1000,
+                    "phase_error_abs_max_ms": float(np.max(np.abs(phase_errors)))
+                    * 1000,
+                    "phase_error_std_ms": float(np.std(phase_errors)) * 1000,
+                }
+            )
+        return result
+
+
+class MissedFlipDetector:
+    """
+    Detects vsyncs missed between consecutive flips that each should take one vblank, ie with eyes swapped every flip.
+
+    An interval of MISSED_VSYNC_INTERVAL_FACTOR or more refresh intervals means the previous frame stayed on screen for
+    round(interval / refresh interval) vblanks. The refresh interval is the measured one when set with
+    set_refresh_interval, otherwise the median of recent regular intervals.
+    """
+
+    def __init__(self):
+        self.__intervals = np.zeros(MISSED_FLIP_INTERVAL_WINDOW, dtype=np.float64)
+        self.__interval_count = 0
+        self.__refresh_interval = None
+        self.__last_flip_end = None
+        self.missed_flips = 0
+        self.missed_vblanks = 0
+
+    def set_refresh_interval(self, refresh_interval):
+        self.__refresh_interval = refresh_interval
+
+    def reset(self):
+        "Forget the last flip, used whenever flips stop being one per vblank"
+        self.__last_flip_end = None
+
+    def flip_completed(self, flip_end):
+        "Returns how many vblanks were missed before this flip"
+        last_flip_end = self.__last_flip_end
+        self.__last_flip_end = flip_end
+        if last_flip_end is None:
+            return 0
+        interval = flip_end - last_flip_end
+        refresh_interval = self.__refresh_interval
+        if refresh_interval is None:
+            if self.__interval_count >= MISSED_FLIP_MIN_INTERVALS:
+                refresh_interval = float(
+                    np.median(
+                        self.__intervals[
+                            : min(self.__interval_count, MISSED_FLIP_INTERVAL_WINDOW)
+                        ]
+                    )
+                )
+        missed_vblanks = 0
+        if (
+            refresh_interval
+            and interval >= MISSED_VSYNC_INTERVAL_FACTOR * refresh_interval
+        ):
+            missed_vblanks = int(round(interval / refresh_interval)) - 1
+            self.missed_flips += 1
+            self.missed_vblanks += missed_vblanks
+        else:
+            # only regular intervals go into the estimate so a burst of misses can't stretch it
+            self.__intervals[self.__interval_count % MISSED_FLIP_INTERVAL_WINDOW] = (
+                interval
+            )
+            self.__interval_count += 1
+        return missed_vblanks
+
+
+def estimate_refresh_rate(flip_times):
+    """
+    Robust refresh rate estimate from the completion times of consecutive vsync blocked flips.
+
+    Each flip is assigned a vblank number using the median flip interval so missed vsyncs count as several vblanks, then the
+    vblank period is the slope of a least squares fit of flip time against vblank number. Flips with residuals beyond
+    REFRESH_RATE_OUTLIER_DEVIATIONS median absolute deviations are rejected and the fit repeated. Fitting the timestamps
+    rather than averaging intervals keeps the jitter of individual flips from accumulating.
+    """
+    flip_times = np.asarray(flip_times, dtype=np.float64)
+    if len(flip_times) < 3:
+        return None
+    intervals = np.diff(flip_times)
+    median_interval = float(np.median(intervals))
+    if median_interval <= 0:
+        return None
+    vblanks = np.concatenate(
+        ([0], np.cumsum(np.maximum(np.rint(intervals / median_interval), 1)))
+    )
+    inliers = np.ones(len(flip_times), dtype=np.bool_)
+    for _ in range(2):
+        period, offset = np.polyfit(vblanks[inliers], flip_times[inliers], 1)
+        residuals = flip_times - (offset + period * vblanks)
+        # 1.4826 scales the median absolute deviation to a standard deviation for normally distributed jitter
+        robust_deviation = 1.4826 * float(
+            np.median(np.abs(residuals[inliers] - np.median(residuals[inliers])))
+        )
+        if robust_deviation == 0:
+            break
+        inliers = (
+            np.abs(residuals) <= REFRESH_RATE_OUTLIER_DEVIATIONS * robust_deviation
+        )
+        if np.count_nonzero(inliers) < 3:
+            return None
+    period, offset = np.polyfit(vblanks[inliers], flip_times[inliers], 1)
+    residuals = flip_times[inliers] - (offset + period * vblanks[inliers])
+    inlier_count = int(np.count_nonzero(inliers))
+    vblank_spread = float(np.sum((vblanks[inliers] - np.mean(vblanks[inliers])) ** 2))
+    period_stderr = math.sqrt(
+        float(np.sum(residuals**2)) / max(inlier_count - 2, 1) / vblank_spread
+    )
+    period = float(period)
+    refresh_rate = 1.0 / period
+    refresh_rate_stderr = period_stderr / period**2
+    inlier_fraction = inlier_count / len(flip_times)
+    return {
+        "refresh_rate": refresh_rate,
+        "period_ms": period * 1000,
+        "stderr_hz": refresh_rate_stderr,
+        "confidence": inlier_fraction
+        * min(1.0, REFRESH_RATE_TARGET_STDERR_HZ / max(refresh_rate_stderr, 1e-12)),
+        "flips": len(flip_times),
+        "inliers": inlier_count,
+        "missed_vblanks": int(vblanks[-1]) - (len(flip_times) - 1),
+    }
+
+
+class RefreshRateDetector:
+    """
+    Collects flip completion times over a calibration run and estimates the refresh rate with estimate_refresh_rate,
+    measuring again up to REFRESH_RATE_CALIBRATION_ATTEMPTS times when the detection isn't confident enough. The
+    result is None unless a detection reached REFRESH_RATE_MIN_CONFIDENCE with a rate between REFRESH_RATE_MIN_HZ and
+    REFRESH_RATE_MAX_HZ. Only flips that block on vsync should be added, ie with the eye swapped every flip rather than
+    paced.
+    """
+
+    def __init__(self):
+        self.__flip_times = []
+        self.__flips = DEFAULT_REFRESH_RATE_CALIBRATION_FLIPS
+        self.__warmup = 0
+        self.__attempts = 0
+        self.__best = None
+        self.calibrating = False
+        self.result = None
+
+    def start(self, flips=DEFAULT_REFRESH_RATE_CALIBRATION_FLIPS):
+        self.__flip_times = []
+        self.__flips = max(int(flips), 3)
+        self.__warmup = REFRESH_RATE_CALIBRATION_WARMUP_FLIPS
+        self.__attempts = 0
+        self.__best = None
+        self.result = None
+        self.calibrating = True
+
+    def cancel(self):
+        self.calibrating = False
+
+    def add_flip(self, flip_end):
+        "Returns the detection once calibration finishes, otherwise None"
+        if not self.calibrating:
+            return None
+        if self.__warmup > 0:
+            self.__warmup -= 1
+            return None
+        self.__flip_times.append(flip_end)
+        if len(self.__flip_times) <= self.__flips:
+            return None
+        detection = estimate_refresh_rate(self.__flip_times)
+        self.__flip_times = []
+        self.__attempts += 1
+        if (
+            detection is not None
+            and REFRESH_RATE_MIN_HZ <= detection["refresh_rate"] <= REFRESH_RATE_MAX_HZ
+            and (
+                self.__best is None
+                or detection["confidence"] > self.__best["confidence"]
+            )
+        ):
+            self.__best = detection
+        confident = (
+            self.__best is not None
+            and self.__best["confidence"] >= REFRESH_RATE_MIN_CONFIDENCE
+        )
+        if confident or self.__attempts >= REFRESH_RATE_CALIBRATION_ATTEMPTS:
+            self.calibrating = False
+            # a detection that never got confident would drive the frame pacer and serial sync from a wrong rate
+            self.result = self.__best if confident else None
+            if self.result is not None:
+                self.result["attempts"] = self.__attempts
+            return self.result
+        return None
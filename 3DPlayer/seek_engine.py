@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+
+# Open3DOLED is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit http://creativecommons.org/licenses/by-nc-sa/4.0/
+
+"""
+Seeking for the player in 3d_player.py
+
+SeekEngine coalesces bursts of seek requests from held keys or the seek bar into key unit seeks that snap to the nearest
+keyframe, then finishes with a single accurate seek once the requests stop. The keyframe times of each video are found
+by a demux only scan in the background and cached on disk, keyed by the file's path, size and modification time, so
+the engine can tell when the key unit seek already landed on the target and the accurate seek can be skipped.
+"""
+
+import os
+import json
+import bisect
+import hashlib
+import threading
+import time
+import traceback
+
+# gstreamer is imported where it is used because 3d_player.py has to set GST_PLUGIN_PATH before gi loads it
+
+KEYFRAME_INDEX_CACHE_VERSION = 1
+KEYFRAME_INDEX_SCAN_POLL_SECONDS = 0.1  # how often the keyframe scan checks if it was cancelled
+KEYFRAME_TOLERANCE_NS = 1000000  # a target this close to a keyframe is shown exactly by a key unit seek so no accurate seek is needed
+SEEK_SETTLE_SECONDS = 0.3  # an accurate seek follows once no seek has been requested for this long
+SEEK_RELEASE_TIMEOUT_SECONDS = 1.5  # settle delay for held keys in case their release never arrives, longer than the key repeat interval
+SEEK_IN_FLIGHT_TIMEOUT_SECONDS = 1.0  # a seek whose async done never arrived stops holding back newer seeks after this long
+
+
+def keyframe_index_cache_file(cache_path, file_path):
+    # keyed by path, size and modification time so an edited or replaced file is scanned again
+    file_stat = os.stat(file_path)
+    cache_key = (
+        f"{os.path.realpath(file_path)}|{file_stat.st_size}|{file_stat.st_mtime_ns}"
+    )
+    return (
+        os.path.join(
+            cache_path, hashlib.sha1(cache_key.encode()).hexdigest() + ".json"
+        ),
+        file_stat,
+    )
+
+
+def load_keyframe_index(cache_path, file_path):
+    "Returns the cached keyframe stream times in nanoseconds for file_path or None if it hasn't been indexed"
+    try:
+        cache_file, file_stat = keyframe_index_cache_file(cache_path, file_path)
+        with open(cache_file, "r") as f:
+            keyframe_index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (
+        keyframe_index.get("version") != KEYFRAME_INDEX_CACHE_VERSION
+        or keyframe_index.get("path") != os.path.realpath(file_path)
+        or keyframe_index.get("size") != file_stat.st_size
+        or keyframe_index.get("mtime_ns") != file_stat.st_mtime_ns
+    ):
+        return None
+    return keyframe_index["keyframes"]
+
+
+def save_keyframe_index(cache_path, file_path, keyframes):
+    os.makedirs(cache_path, exist_ok=True)
+    cache_file, file_stat = keyframe_index_cache_file(cache_path, file_path)
+    # written to a temporary file first so a player killed mid write never leaves a truncated index behind
+    with open(cache_file + ".tmp", "w") as f:
+        json.dump(
+            {
+                "version": KEYFRAME_INDEX_CACHE_VERSION,
+                "path": os.path.realpath(file_path),
+                "size": file_stat.st_size,
+                "mtime_ns": file_stat.st_mtime_ns,
+                "keyframes": keyframes,
+            },
+            f,
+        )
+    os.replace(cache_file + ".tmp", cache_file)
+
+
+def scan_keyframes(file_path, stop_event):
+    """
+    Demuxes file_path without decoding and returns the sorted stream times in nanoseconds of the keyframes in its first video stream
+
+    Returns None if stop_event is set before the scan finishes and raises RuntimeError if gstreamer reports an error
+    """
+    from gi.repository import Gst
+
+    pipeline = Gst.Pipeline.new("KeyframeIndex")
+    filesrc = Gst.ElementFactory.make("filesrc", "FileSrc")
+    filesrc.set_property("location", file_path)
+    parsebin = Gst.ElementFactory.make("parsebin", "ParseBin")
+    pipeline.add(filesrc)
+    pipeline.add(parsebin)
+    filesrc.link(parsebin)
+
+    keyframes = []
+    segment = [None]
+    indexed_pad = [None]
+    indexed_pad_lock = threading.Lock()
+
+    def on_video_data(pad, info):  # @UnusedVariable
+        if info.type & Gst.PadProbeType.BUFFER:
+            buffer = info.get_buffer()
+            if (
+                not buffer.has_flags(Gst.BufferFlags.DELTA_UNIT)
+                and buffer.pts != Gst.CLOCK_TIME_NONE
+            ):
+                stream_time = buffer.pts
+                if segment[0] is not None:
+                    # playbin seeks in stream time which only matches pts for containers starting at zero
+                    stream_time = segment[0].to_stream_time(Gst.Format.TIME, buffer.pts)
+                if stream_time != Gst.CLOCK_TIME_NONE:
+                    keyframes.append(stream_time)
+        else:
+            event = info.get_event()
+            if event.type == Gst.EventType.SEGMENT:
+                segment[0] = event.parse_segment()
+        return Gst.PadProbeReturn.OK
+
+    def on_pad_added(element, pad):  # @UnusedVariable
+        # every stream goes to a fakesink so the demuxer never stops on a not linked pad, only the first video stream is indexed
+        caps = pad.get_current_caps() or pad.query_caps(None)
+        fakesink = Gst.ElementFactory.make("fakesink", None)
+        fakesink.set_property("sync", False)
+        pipeline.add(fakesink)
+        fakesink.sync_state_with_parent()
+        with indexed_pad_lock:
+            index_this_pad = indexed_pad[0] is None and caps.get_structure(
+                0
+            ).get_name().startswith("video/")
+            if index_this_pad:
+                indexed_pad[0] = pad
+        if index_this_pad:
+            fakesink.get_static_pad("sink").add_probe(
+                Gst.PadProbeType.BUFFER | Gst.PadProbeType.EVENT_DOWNSTREAM,
+                on_video_data,
+            )
+        pad.link(fakesink.get_static_pad("sink"))
+
+    parsebin.connect("pad-added", on_pad_added)
+
+    bus = pipeline.get_bus()
+    pipeline.set_state(Gst.State.PLAYING)
+    try:
+        while not stop_event.is_set():
+            message = bus.timed_pop_filtered(
+                int(KEYFRAME_INDEX_SCAN_POLL_SECONDS * Gst.SECOND),
+                Gst.MessageType.EOS | Gst.MessageType.ERROR,
+            )
+            if message is None:
+                continue
+            if message.type == Gst.MessageType.ERROR:
+                error, debug = message.parse_error()
+                raise RuntimeError(f"{error.message} {debug}")
+            return sorted(set(keyframes))
+        return None
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+
+
+class SeekEngine:
+    """
+    Seeks the player for 3d_player.py, bursts of seek requests are coalesced into key unit seeks that snap to the nearest
+    keyframe so scrubbing stays responsive, and once requests stop (or the key doing them is released) one accurate seek
+    lands on the exact target unless the keyframe index shows the key unit seek already did
+
+    All methods except the keyframe index thread run on the tkinter main loop, seek_done must be called when the player
+    posts async done for a seek
+    """
+
+    def __init__(self, player, file_path, cache_path, window):
+        self.__player = player
+        self.__file_path = file_path
+        self.__cache_path = cache_path
+        self.__window = window
+        self.__keyframes = None  # sorted keyframe stream times, replaced in one assignment by the index thread
+        self.__index_thread = None
+        self.__index_stop_event = threading.Event()
+        self.__target = None  # newest requested position that hasn't been settled yet
+        self.__settle_due = False
+        self.__settle_after_id = None
+        self.__busy_after_id = None
+        self.__fast_seek_target = None  # target the last key unit seek was issued for
+        self.__fast_seek_position = None  # keyframe the last key unit seek went to, None if it was left to the demuxer
+        self.__seek_in_flight_since = None
+        self.__seek_in_flight_position = None
+
+    def start(self):
+        self.__index_thread = threading.Thread(target=self.__build_keyframe_index)
+        self.__index_thread.daemon = True
+        self.__index_thread.name = "keyframe-index"
+        self.__index_thread.start()
+
+    def stop(self):
+        self.__index_stop_event.set()
+        for after_id in (self.__settle_after_id, self.__busy_after_id):
+            if after_id is not None:
+                self.__window.after_cancel(after_id)
+        self.__settle_after_id = None
+        self.__busy_after_id = None
+        self.__target = None
+
+    @property
+    def keyframes(self):
+        return self.__keyframes
+
+    def nearest_keyframe(self, position):
+        keyframes = self.__keyframes
+        if not keyframes:
+            return None
+        i = bisect.bisect_left(keyframes, position)
+        return min(
+            keyframes[max(i - 1, 0) : i + 1],
+            key=lambda keyframe: abs(keyframe - position),
+        )
+
+    def position(self):
+        "Position relative seeks start from, this is the pending target while scrubbing since the player lags behind it"
+        if self.__target is not None:
+            return self.__target
+        if self.__seek_busy():
+            return self.__seek_in_flight_position
+        from gi.repository import Gst
+
+        success, position = self.__player.query_position(Gst.Format.TIME)
+        return position if success else 0
+
+    def seek(self, target, wait_for_release=False):
+        "Requests a seek to target nanoseconds, with wait_for_release the accurate seek waits for release() instead of a pause in requests"
+        from gi.repository import Gst
+
+        success, duration = self.__player.query_duration(Gst.Format.TIME)
+        if success and duration > 0:
+            target = min(target, duration)
+        self.__target = max(int(target), 0)
+        self.__settle_due = False
+        self.__schedule_settle(
+            SEEK_RELEASE_TIMEOUT_SECONDS if wait_for_release else SEEK_SETTLE_SECONDS
+        )
+        self.__advance()
+
+    def release(self):
+        if self.__target is not None:
+            self.__schedule_settle(0)
+
+    def seek_done(self):
+        self.__seek_in_flight_since = None
+        self.__advance()
+
+    def __build_keyframe_index(self):
+        keyframes = load_keyframe_index(self.__cache_path, self.__file_path)
+        if keyframes is None:
+            started_at = time.perf_counter()
+            try:
+                keyframes = scan_keyframes(self.__file_path, self.__index_stop_event)
+                if keyframes is None:
+                    return
+                save_keyframe_index(self.__cache_path, self.__file_path, keyframes)
+            except Exception:
+                traceback.print_exc()
+                return
+            print(
+                f"Keyframe index built with {len(keyframes)} keyframes in {time.perf_counter() - started_at:.1f}s for {self.__file_path}"
+            )
+        self.__keyframes = keyframes
+
+    def __schedule_settle(self, delay):
+        if self.__settle_after_id is not None:
+            self.__window.after_cancel(self.__settle_after_id)
+        self.__settle_after_id = self.__window.after(
+            int(delay * 1000), self.__on_settle
+        )
+
+    def __on_settle(self):
+        self.__settle_after_id = None
+        self.__settle_due = True
+        self.__advance()
+
+    def __on_busy_timeout(self):
+        self.__busy_after_id = None
+        self.__advance()
+
+    def __seek_busy(self):
+        return (
+            self.__seek_in_flight_since is not None
+            and time.perf_counter() - self.__seek_in_flight_since
+            < SEEK_IN_FLIGHT_TIMEOUT_SECONDS
+        )
+
+    def __issue_seek(self, position, flags):
+        from gi.repository import Gst
+
+        # https://gstreamer.freedesktop.org/documentation/gstreamer/gstsegment.html?gi-language=python#GstSeekFlags
+        self.__player.seek_simple(
+            Gst.Format.TIME, Gst.SeekFlags.FLUSH | flags, position
+        )
+        self.__seek_in_flight_since = time.perf_counter()
+        self.__seek_in_flight_position = position
+        if self.__busy_after_id is not None:
+            self.__window.after_cancel(self.__busy_after_id)
+        self.__busy_after_id = self.__window.after(
+            int(SEEK_IN_FLIGHT_TIMEOUT_SECONDS * 1000), self.__on_busy_timeout
+        )
+
+    def __advance(self):
+        # issues what the newest request still needs once the player has finished the previous seek, requests made meanwhile are coalesced
+        from gi.repository import Gst
+
+        if self.__target is None or self.__seek_busy():
+            return
+        if self.__target != self.__fast_seek_target:
+            self.__fast_seek_target = self.__target
+            self.__fast_seek_position = self.nearest_keyframe(self.__target)
+            self.__issue_seek(
+                (
+                    self.__fast_seek_position
+                    if self.__fast_seek_position is not None
+                    else self.__target
+                ),
+                Gst.SeekFlags.KEY_UNIT | Gst.SeekFlags.SNAP_NEAREST,
+            )
+            return
+        if not self.__settle_due:
+            return
+        target = self.__target
+        self.__target = None
+        self.__settle_due = False
+        self.__fast_seek_target = None
+        if (
+            self.__fast_seek_position is not None
+            and abs(self.__fast_seek_position - target) <= KEYFRAME_TOLERANCE_NS
+        ):
+            return
+        self.__issue_seek(target, Gst.SeekFlags.ACCURATE)
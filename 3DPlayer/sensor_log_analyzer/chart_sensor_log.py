@@ -1,9 +1,29 @@
+import os
+import sys
+
 import plotly.graph_objects as go
 
 import pandas as pd
 
-# Load data
-df = pd.read_csv("./2024-08-19_180919_debug_opt_stream_readings.csv")
+sensor_log_analyzer_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(sensor_log_analyzer_path))
+
+import opt_sensor_log  # @UnresolvedImport
+
+# Load data, binary sensor logs are memory mapped, csv logs from before the binary format are still read
+log_path = (
+    sys.argv[1]
+    if len(sys.argv) > 1
+    else "./2024-08-19_180919_debug_opt_stream_readings.optlog"
+)
+if log_path.endswith(".csv"):
+    df = pd.read_csv(log_path)
+else:
+    opt_sensor_log_reader = opt_sensor_log.OptSensorLogReader(log_path)
+    print(
+        f"emitter firmware version {opt_sensor_log_reader.emitter_firmware_version} settings {opt_sensor_log_reader.settings}"
+    )
+    df = pd.DataFrame(opt_sensor_log_reader.columns())
 # df = df.iloc[100000:200000]  # or use the condition method above
 
 # Create figure
@@ -0,0 +1,26 @@
+import argparse
+import os
+import sys
+
+sensor_log_analyzer_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(sensor_log_analyzer_path))
+
+import opt_sensor_log  # @UnresolvedImport
+
+# Exports a binary optical sensor log to csv or parquet, eg
+#   python export_sensor_log.py 2024-08-19_180919_debug_opt_stream_readings.optlog
+#   python export_sensor_log.py 2024-08-19_180919_debug_opt_stream_readings.optlog readings.parquet
+parser = argparse.ArgumentParser(
+    description="Exports a binary optical sensor log to csv or parquet (needs pandas and pyarrow)"
+)
+parser.add_argument("log_path")
+parser.add_argument(
+    "output_path",
+    nargs="?",
+    help="csv or .parquet file, the log path with a .csv extension by default",
+)
+args = parser.parse_args()
+
+output_path = args.output_path or os.path.splitext(args.log_path)[0] + ".csv"
+opt_sensor_log.export_opt_sensor_log(args.log_path, output_path)
+print(f"exported {args.log_path} to {output_path}")
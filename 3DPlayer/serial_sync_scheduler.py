@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+# Open3DOLED is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit http://creativecommons.org/licenses/by-nc-sa/4.0/
+
+"""
+Deadline scheduling for the serial sync drive mode eye commands sent by 3d_player.py
+
+SerialSyncScheduler sends each eye command from its own thread at an absolute deadline on the time.monotonic clock,
+sleeping with clock_nanosleep on linux (time.sleep elsewhere) and spinning for the last few hundred microseconds, so
+commands leave at a steady phase relative to the page flips instead of whenever a polling loop next wakes up. The
+achieved send times are kept so their error against the deadlines can be reported with percentiles_us.
+"""
+
+import sys
+import time
+import ctypes
+import ctypes.util
+import collections
+import threading
+import traceback
+
+SERIAL_SYNC_SPIN_SECONDS = 0.0003  # the last part of each wait is spun so the command goes out within microseconds of its deadline
+SERIAL_SYNC_IDLE_SECONDS = 0.1  # how long the scheduler thread sleeps between checks while there is no schedule
+SERIAL_SYNC_SEND_LOG_CAPACITY = 4096  # most recent sends kept for achieved versus target statistics
+SERIAL_SYNC_TIMER_SLACK_NS = 1  # linux otherwise lets a thread's timers fire up to 50us late to batch wakeups
+
+# (anchor time on the time.monotonic clock, period in seconds, eye sent at the anchor), eyes alternate every period after it
+SerialSyncSchedule = collections.namedtuple(
+    "SerialSyncSchedule", ("anchor", "period", "eye")
+)
+# target deadline, time the write started and time it returned, on the time.monotonic clock, and the eye sent
+SerialSyncSend = collections.namedtuple(
+    "SerialSyncSend", ("target", "write_start", "write_end", "eye")
+)
+
+_CLOCK_MONOTONIC = 1
+_TIMER_ABSTIME = 1
+_PR_SET_TIMERSLACK = 29
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+_libc = None
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        _libc.clock_nanosleep.argtypes = (
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.POINTER(_Timespec),
+            ctypes.POINTER(_Timespec),
+        )
+    except (OSError, AttributeError):
+        _libc = None
+
+
+def sleep_until(deadline, spin_seconds=SERIAL_SYNC_SPIN_SECONDS):
+    """
+    Blocks until time.monotonic() reaches deadline
+
+    On linux the coarse part sleeps to an absolute CLOCK_MONOTONIC deadline (the clock time.monotonic reads) so time
+    spent being woken or rescheduled isn't added on top of a relative sleep, elsewhere it falls back to time.sleep
+    """
+    sleep_deadline = deadline - spin_seconds
+    if _libc is not None:
+        if sleep_deadline > time.monotonic():
+            sleep_timespec = _Timespec(
+                int(sleep_deadline), int((sleep_deadline % 1) * 1000000000)
+            )
+            # returns EINTR if a signal arrived, the spin below covers whatever is left
+            _libc.clock_nanosleep(
+                _CLOCK_MONOTONIC, _TIMER_ABSTIME, ctypes.byref(sleep_timespec), None
+            )
+    else:
+        remaining = sleep_deadline - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+    while time.monotonic() < deadline:
+        pass
+
+
+def percentiles_us(samples):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples) * 1000000,
+        "p50": samples[len(samples) // 2] * 1000000,
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000000,
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000000,
+        "min": samples[0] * 1000000,
+        "max": samples[-1] * 1000000,
+    }
+
+
+class SerialSyncScheduler:
+    """
+    Sends the serial drive mode eye commands at absolute deadlines from its own thread
+
+    The flip callback hands over a new SerialSyncSchedule with set_schedule, which is a single attribute assignment so
+    the flip thread never waits on the scheduler and the scheduler never takes a lock. send_eye(eye) is called at each
+    deadline and returns False if nothing was sent, deadlines that are already more than half a period late are skipped
+    instead of being sent in a burst.
+    """
+
+    def __init__(self, send_eye, spin_seconds=SERIAL_SYNC_SPIN_SECONDS):
+        self.__send_eye = send_eye
+        self.__spin_seconds = spin_seconds
+        self.__schedule = None
+        # only used to wake the thread while there is no schedule
+        self.__schedule_set = threading.Event()
+        self.__running = False
+        self.__thread = None
+        self.__sends = collections.deque(maxlen=SERIAL_SYNC_SEND_LOG_CAPACITY)
+        self.__skipped_deadlines = 0
+
+    def start(self):
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.name = "serial-sync"
+        self.__thread.start()
+
+    def stop(self):
+        self.__running = False
+        self.__schedule_set.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def set_schedule(self, schedule):
+        "Replaces the schedule, None stops sending until the next schedule"
+        idle = self.__schedule is None
+        self.__schedule = schedule
+        if idle and schedule is not None:
+            self.__schedule_set.set()
+
+    @property
+    def schedule(self):
+        return self.__schedule
+
+    def sends(self):
+        "Snapshot of the most recent SerialSyncSend records, oldest first"
+        return list(self.__sends)
+
+    def summary(self):
+        sends = self.sends()
+        return {
+            "sends": len(sends),
+            "skipped_deadlines": self.__skipped_deadlines,
+            "send_error_us": percentiles_us(
+                [send.write_start - send.target for send in sends]
+            ),
+            "write_duration_us": percentiles_us(
+                [send.write_end - send.write_start for send in sends]
+            ),
+        }
+
+    def __run(self):
+        if _libc is not None:
+            try:
+                _libc.prctl(_PR_SET_TIMERSLACK, SERIAL_SYNC_TIMER_SLACK_NS, 0, 0, 0)
+            except AttributeError:
+                pass
+        schedule = None
+        index = 0  # deadline of the current schedule the thread is waiting for
+        last_target = None
+        while self.__running:
+            latest_schedule = self.__schedule
+            if latest_schedule is None:
+                schedule = None
+                self.__schedule_set.wait(SERIAL_SYNC_IDLE_SECONDS)
+                self.__schedule_set.clear()
+                continue
+            if latest_schedule is not schedule:
+                # continue from the first deadline of the new schedule that isn't the one just sent again
+                schedule = latest_schedule
+                earliest = (
+                    schedule.anchor
+                    if last_target is None
+                    else last_target + schedule.period / 2
+                )
+                index = max(0, -int(-(earliest - schedule.anchor) // schedule.period))
+            target = schedule.anchor + index * schedule.period
+            now = time.monotonic()
+            if now - target > schedule.period / 2:
+                skipped = int((now - target) / schedule.period + 0.5)
+                self.__skipped_deadlines += skipped
+                index += skipped
+                continue
+            sleep_until(target, self.__spin_seconds)
+            if self.__schedule is not schedule:
+                continue  # replaced while sleeping so this deadline may have moved
+            eye = schedule.eye if index % 2 == 0 else 3 - schedule.eye
+            write_start = time.monotonic()
+            try:
+                sent = self.__send_eye(eye)
+            except Exception:
+                traceback.print_exc()
+                sent = False
+            if sent:
+                self.__sends.append(
+                    SerialSyncSend(target, write_start, time.monotonic(), eye)
+                )
+            last_target = target
+            index += 1